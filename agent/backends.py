@@ -0,0 +1,105 @@
+"""
+Storage backends for the tool functions.
+
+A backend answers the tool questions (get_revenue_vs_budget, get_opex_breakdown,
+...) for one dataset version, without the caller passing frames around. The
+planner asks get_backend() for the backend of DATA_FILE:
+
+- PandasBackend, the reference: the dataset is loaded with tools.load_data()
+  (workbook, snapshot or database file) and the pandas tools do the work.
+- sql_backend.SQLiteBackend when DATA_FILE is a SQLite file (.sqlite,
+  .sqlite3 or .db): every question is a query against the file, and nothing
+  but the answer is held in memory.
+"""
+import threading
+import pandas as pd
+from . import runway, sql_backend, timeseries, tools, variance
+
+_SQL_BACKENDS = {}  # absolute path -> (dataset version, SQLiteBackend)
+_SQL_BACKENDS_LOCK = threading.Lock()
+
+
+class PandasBackend:
+    """Runs the pandas tool functions on frames returned by tools.load_data()."""
+
+    def __init__(self, frames):
+        self.actuals_df, self.budget_df, self.cash_df, self.fx_df = frames
+
+    @classmethod
+    def load(cls, path: str = None) -> 'PandasBackend':
+        return cls(tools.load_data(path))
+
+    def latest_year(self):
+        if self.actuals_df.empty:
+            return None
+        return pd.to_datetime(self.actuals_df['month']).dt.year.max()
+
+    def latest_period(self):
+        if self.actuals_df.empty:
+            return None
+        return tools._as_periods(self.actuals_df['month_period']).max()
+
+    def get_revenue_vs_budget(self, month_name: str, year: int):
+        return tools.get_revenue_vs_budget(self.actuals_df, self.budget_df, self.fx_df, month_name, year)
+
+    def get_financial_metric_trend(self, metric: str, last_n_months: int):
+        return tools.get_financial_metric_trend(self.actuals_df, self.fx_df, metric, last_n_months)
+
+    def get_opex_breakdown(self, month_name: str, year: int):
+        return tools.get_opex_breakdown(self.actuals_df, self.fx_df, month_name, year)
+
+    def get_cash_runway(self):
+        return tools.get_cash_runway(self.actuals_df, self.cash_df, self.fx_df)
+
+    def get_cash_trend(self, last_n_months: int):
+        return tools.get_cash_trend(self.cash_df, last_n_months)
+
+    def get_range_total(self, metric: str, start, end):
+        return timeseries.get_range_total(self.actuals_df, self.budget_df, self.fx_df, metric, start, end)
+
+    def get_rolling_metric(self, metric: str, window: int, last_n_months: int):
+        return timeseries.get_rolling_metric(self.actuals_df, self.fx_df, metric, window, last_n_months)
+
+    def get_opex_breakdown_range(self, start, end):
+        return timeseries.get_opex_breakdown_range(self.actuals_df, self.fx_df, start, end)
+
+    def get_variance_report(self, start=None, end=None, top_n: int = variance.DEFAULT_TOP_N):
+        return variance.get_variance_report(self.actuals_df, self.budget_df, self.fx_df, start, end, top_n)
+
+    def get_runway_scenarios(self, scenario: runway.Scenario = None, **options):
+        return runway.simulate_runway(self.actuals_df, self.cash_df, self.fx_df, scenario, **options)
+
+    def missing_fx_rates(self) -> pd.DataFrame:
+        """Lists the (month_period, currency) pairs of either ledger that were converted without a rate."""
+        missing = pd.concat([tools.missing_fx_rates(df, self.fx_df) for df in (self.actuals_df, self.budget_df)])
+        return missing.drop_duplicates().sort_values(['month_period', 'currency'], ignore_index=True)
+
+    def preload(self):
+        """Builds the shared monthly cubes."""
+        tools._ledger_cube(self.actuals_df, self.fx_df)
+        tools._ledger_cube(self.budget_df, self.fx_df)
+
+
+def get_backend(path: str = None):
+    """Returns the backend serving the dataset at path (default: DATA_FILE)."""
+    path = path or tools.DATA_FILE
+    if not sql_backend.is_database(path):
+        return PandasBackend.load(path)
+
+    version = tools.dataset_version(path)
+    with _SQL_BACKENDS_LOCK:
+        entry = _SQL_BACKENDS.get(path)
+        if entry is None or entry[0] != version:
+            # A rewritten file is a new inode: open fresh connections to it. Each
+            # thread closes its connection to the old backend once it moves on.
+            entry = (version, sql_backend.SQLiteBackend(path))
+            _SQL_BACKENDS[path] = entry
+    return entry[1]
+
+
+def close_backend(path: str):
+    """Closes the SQLite backend of path and drops its indexes; the next get_backend() opens it again."""
+    with _SQL_BACKENDS_LOCK:
+        entry = _SQL_BACKENDS.pop(path, None)
+    if entry is not None:
+        entry[1].close()
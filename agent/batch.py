@@ -0,0 +1,107 @@
+"""
+Batch query API: answer many questions against one loaded dataset.
+
+route_queries() loads the data and builds the shared monthly P&L cubes once,
+answers each distinct Intent once (repeated or differently worded questions
+share the answer), and returns results in input order. iter_route_queries()
+yields them one by one, so a long batch can stream progress.
+
+Usage:
+    python -m agent.batch questions.txt [--charts] [--output answers.jsonl] [--tenant ID]
+
+questions.txt holds one question per line; blank lines and lines starting
+with '#' are skipped. Each answer is written as one JSON line.
+"""
+import argparse
+import json
+import sys
+import time
+from dataclasses import asdict
+from . import planner, tenants
+from .parser import parse_query
+
+
+def iter_route_queries(queries, include_charts: bool = False, tenant: str = None):
+    """
+    Yields (query, result) for each query, in input order. Each result has the
+    same shape as planner.route_query() plus the parsed 'intent'. All queries
+    are answered from the tenant's dataset (see agent.tenants).
+    """
+    queries = list(queries)
+    intents = [parse_query(q) for q in queries]
+
+    backend = version = error = None
+    if not all(intent.is_fallback for intent in intents):
+        try:
+            version = tenants.dataset_version(tenant)
+            backend = tenants.get_backend(tenant)
+            # Warm the shared monthly aggregates once for the whole batch.
+            backend.preload()
+        except Exception as e:
+            error = {"text": f"Error loading data: {e}", "chart": None}
+
+    answers = {}  # Intent -> result, so each distinct intent is computed once
+    for query, intent in zip(queries, intents):
+        if intent not in answers:
+            answers[intent] = _answer_intent(intent, backend, version, error, include_charts, tenant)
+        yield query, {**answers[intent], "intent": intent}
+
+
+def route_queries(queries, include_charts: bool = False, tenant: str = None) -> list:
+    """Answers a list of questions against one loaded dataset; results keep input order."""
+    return [result for _, result in iter_route_queries(queries, include_charts, tenant)]
+
+
+def _answer_intent(intent, backend, version, error, include_charts, tenant=None):
+    if intent.is_fallback:
+        return {"text": planner.FALLBACK_TEXT, "chart": None}
+    if error is not None:
+        return error
+
+    cached = planner._cached_answer(intent, version, include_charts, tenant)
+    if cached is not None:
+        return cached
+
+    result = planner._answer(intent, backend, include_chart=include_charts)
+    planner._cache_answer(intent, version, result, include_charts, tenant)
+    return dict(result)
+
+
+def to_json_record(index: int, query: str, result: dict) -> dict:
+    """Converts one batch result into a JSON-serializable record."""
+    chart = result.get("chart")
+    return {
+        "index": index,
+        "query": query,
+        "intent": asdict(result["intent"]),
+        "text": result["text"],
+        "chart": json.loads(chart.to_json()) if chart is not None else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer a file of questions, one JSON line per answer.")
+    parser.add_argument("questions", help="Text file with one question per line")
+    parser.add_argument("--charts", action="store_true", help="Build charts and include them as Plotly JSON")
+    parser.add_argument("--output", default="-", help="Output JSONL file (default: stdout)")
+    parser.add_argument("--tenant", default=None, help="Tenant whose dataset answers the questions (default: DATA_FILE)")
+    args = parser.parse_args(argv)
+
+    with open(args.questions) as f:
+        queries = [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    start = time.perf_counter()
+    try:
+        for index, (query, result) in enumerate(iter_route_queries(queries, include_charts=args.charts, tenant=args.tenant)):
+            out.write(json.dumps(to_json_record(index, query, result)) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print(f"Answered {len(queries)} questions in {elapsed:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
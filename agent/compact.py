@@ -0,0 +1,78 @@
+"""
+Memory-compact dataset layout.
+
+The frames returned by load_data() keep string dimensions as Python strings and
+month_period as Period objects, the worst case for both memory and comparison
+speed. The compact layout stores:
+
+- 'month', 'entity', 'account_category' and 'currency' as categoricals,
+- 'month_period' as int32 month ordinals (months since 1970-01),
+- amounts as int64 when they are whole numbers, float64 otherwise.
+
+Amounts stay in currency units rather than int64 cents so every tool keeps
+summing the same values. Use it with load_data(compact=True), and compare the
+two layouts with:
+
+    python -m agent.compact [fixtures/data.xlsx]
+"""
+import argparse
+import numpy as np
+import pandas as pd
+from . import tools
+
+CATEGORY_COLUMNS = ('month', 'entity', 'account_category', 'currency')
+AMOUNT_COLUMNS = ('amount', 'cash_usd', 'rate_to_usd')
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Returns a copy of one dataset frame in the compact layout."""
+    columns = {}
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            columns[col] = df[col].astype('category')
+    if 'month_period' in df.columns:
+        columns['month_period'] = tools._period_ordinals(df['month_period']).astype(np.int32)
+    for col in AMOUNT_COLUMNS:
+        if col in df.columns:
+            values = df[col].to_numpy(dtype=float)
+            whole = np.isfinite(values).all() and (values == np.round(values)).all()
+            columns[col] = values.astype(np.int64) if whole and col != 'rate_to_usd' else values
+    return df.assign(**columns)
+
+
+def compact_frames(frames):
+    """Applies compact_frame() to each of (actuals_df, budget_df, cash_df, fx_df)."""
+    return tuple(compact_frame(df) for df in frames)
+
+
+def memory_report(path: str = None) -> pd.DataFrame:
+    """
+    Compares the deep memory footprint of the standard and compact layouts,
+    one row per sheet plus a total.
+    """
+    standard = tools.load_data(path)
+    compact = tools.load_data(path, compact=True)
+    rows = []
+    for sheet, std_df, compact_df in zip(tools.SHEETS, standard, compact):
+        rows.append({
+            'sheet': sheet,
+            'rows': len(std_df),
+            'standard_bytes': int(std_df.memory_usage(deep=True).sum()),
+            'compact_bytes': int(compact_df.memory_usage(deep=True).sum()),
+        })
+    report = pd.DataFrame(rows)
+    total = report[['rows', 'standard_bytes', 'compact_bytes']].sum()
+    report.loc[len(report)] = {'sheet': 'total', **total.to_dict()}
+    report['saving_pct'] = (1 - report['compact_bytes'] / report['standard_bytes']) * 100
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare memory use of the standard and compact dataset layouts.")
+    parser.add_argument("source", nargs="?", default=tools.DATA_FILE, help="Path to data.xlsx")
+    args = parser.parse_args(argv)
+    print(memory_report(args.source).to_string(index=False, float_format=lambda v: f"{v:.1f}"))
+
+
+if __name__ == "__main__":
+    main()
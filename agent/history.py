@@ -0,0 +1,114 @@
+"""
+Compact, bounded chat history for the Streamlit app.
+
+Keeping a Plotly Figure in st.session_state for every answer costs tens of
+kilobytes of Python objects per chart, and drawing them all again on each
+rerun makes long sessions slower with every question. ChatHistory stores
+each chart as a serialized figure spec instead: the template is dropped (it
+is applied again when the chart is drawn), traces with more than max_points
+points are downsampled, and the JSON is zlib-compressed, typically to 0.5-2
+KB.
+
+A history keeps at most max_messages messages and max_bytes of text and
+chart specs, dropping the oldest messages first. The limits default to the
+HISTORY_MAX_MESSAGES and HISTORY_MAX_BYTES environment variables.
+"""
+import itertools
+import json
+import os
+import zlib
+import numpy as np
+
+DEFAULT_MAX_MESSAGES = 200
+DEFAULT_MAX_BYTES = 512 * 1024
+DEFAULT_MAX_POINTS = 500
+# Charts of the latest answers are drawn straight away; older ones on request.
+DEFAULT_EAGER_CHARTS = 3
+# Per-point trace attributes, downsampled together.
+_POINT_ARRAYS = ('x', 'y', 'text', 'hovertext', 'customdata')
+
+
+def downsample_indices(n: int, max_points: int) -> np.ndarray:
+    """Returns max_points evenly spaced indices into n points, always keeping the first and last."""
+    if n <= max_points:
+        return np.arange(n)
+    return np.unique(np.linspace(0, n - 1, max_points).round().astype(np.int64))
+
+
+def serialize_chart(fig, max_points: int = DEFAULT_MAX_POINTS) -> bytes:
+    """Returns the compressed JSON spec of a Plotly figure, downsampled to max_points per trace."""
+    import plotly.io as pio  # already loaded by whoever built fig
+    spec = fig.to_plotly_json()
+    spec['layout'].pop('template', None)
+    for trace, trace_spec in zip(fig.data, spec['data']):
+        arrays = {key: getattr(trace, key, None) for key in _POINT_ARRAYS}
+        arrays = {key: value for key, value in arrays.items() if value is not None and not isinstance(value, str)}
+        n = max((len(value) for value in arrays.values()), default=0)
+        if n <= max_points:
+            continue
+        keep = downsample_indices(n, max_points)
+        for key, value in arrays.items():
+            if len(value) == n:
+                trace_spec[key] = np.asarray(value)[keep]
+    return zlib.compress(pio.to_json(spec, validate=False).encode())
+
+
+def load_chart(spec: bytes) -> dict:
+    """Returns the figure dict of a serialized chart, ready for st.plotly_chart()."""
+    return json.loads(zlib.decompress(spec))
+
+
+class ChatHistory:
+    """The messages of one chat session, with charts stored as compact specs."""
+
+    def __init__(self, max_messages: int = None, max_bytes: int = None, max_points: int = DEFAULT_MAX_POINTS):
+        self.max_messages = max_messages or int(os.environ.get('HISTORY_MAX_MESSAGES', DEFAULT_MAX_MESSAGES))
+        self.max_bytes = max_bytes or int(os.environ.get('HISTORY_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.max_points = max_points
+        self.messages = []  # {'id', 'role', 'content', 'chart' (spec bytes or None), 'nbytes'}, oldest first
+        self.nbytes = 0
+        self.dropped = 0
+        self._ids = itertools.count()
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __len__(self):
+        return len(self.messages)
+
+    def append(self, role: str, content: str, chart=None) -> dict:
+        """Adds a message, serializing its Plotly chart if any, then trims the history to its limits."""
+        spec = serialize_chart(chart, self.max_points) if chart is not None else None
+        message = {
+            'id': next(self._ids),
+            'role': role,
+            'content': content,
+            'chart': spec,
+            'nbytes': len(content.encode()) + (len(spec) if spec is not None else 0),
+        }
+        self.messages.append(message)
+        self.nbytes += message['nbytes']
+        self._trim()
+        return message
+
+    def _trim(self):
+        # The latest message is always kept, even when it alone is over max_bytes.
+        while len(self.messages) > 1 and (len(self.messages) > self.max_messages or self.nbytes > self.max_bytes):
+            self.nbytes -= self.messages.pop(0)['nbytes']
+            self.dropped += 1
+
+    def eager_chart_ids(self, n: int = DEFAULT_EAGER_CHARTS) -> set:
+        """Returns the ids of the last n messages with a chart."""
+        chart_ids = [message['id'] for message in self.messages if message['chart'] is not None]
+        return set(chart_ids[-n:]) if n > 0 else set()
+
+    def usage(self) -> dict:
+        """Returns what the history holds against its limits, for the memory gauge."""
+        return {
+            'messages': len(self.messages),
+            'charts': sum(message['chart'] is not None for message in self.messages),
+            'bytes': self.nbytes,
+            'max_messages': self.max_messages,
+            'max_bytes': self.max_bytes,
+            'dropped': self.dropped,
+        }
@@ -0,0 +1,162 @@
+"""
+Append-only ingest of new months.
+
+Each month-end adds one month of actuals, budget, cash and FX. Instead of
+re-parsing the whole history, append_delta() validates the new rows against
+the stored schema, writes them to the snapshot dataset as extra part files
+(see snapshot.append_snapshot) and extends the in-memory dataset and its
+monthly cubes with aggregates of the delta only. Memoized answers about
+earlier months are carried over to the new dataset version.
+
+The dataset must be a snapshot directory; compile a workbook into one with
+`python -m agent.snapshot fixtures/data.xlsx --out data.snapshot` and point
+DATA_FILE at it. A delta is an .xlsx workbook holding any of the four sheets,
+or a directory of <sheet>.csv files. Months already present in a sheet are
+rejected: corrections need a full re-import.
+
+Usage:
+    python -m agent.ingest DELTA [--dataset DIR]
+"""
+import argparse
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from . import planner, snapshot, tools
+
+_INGEST_LOCK = threading.Lock()
+
+
+def read_delta(path: str) -> dict:
+    """Reads a delta file into {sheet name: raw frame} for the sheets it holds."""
+    if os.path.isdir(path):
+        return {sheet: pd.read_csv(os.path.join(path, f"{sheet}.csv")) for sheet in tools.SHEETS
+                if os.path.exists(os.path.join(path, f"{sheet}.csv"))}
+    xls = pd.ExcelFile(path)
+    return {sheet: pd.read_excel(xls, sheet) for sheet in tools.SHEETS if sheet in xls.sheet_names}
+
+
+def validate_delta(delta: dict, frames) -> dict:
+    """
+    Checks new rows against the loaded dataset and returns them standardized
+    like load_data() output, keyed by sheet. Raises ValueError when a sheet is
+    unknown, the columns differ from the stored ones, a value does not parse,
+    a month is already loaded, or a non-USD ledger line has no FX rate.
+    """
+    unknown = set(delta) - set(tools.SHEETS)
+    if unknown:
+        raise ValueError(f"Unknown sheet(s) in delta: {', '.join(sorted(unknown))}")
+    existing = dict(zip(tools.SHEETS, frames))
+    validated = {}
+    for sheet, df in delta.items():
+        if df.empty:
+            continue
+        stored = existing[sheet]
+        columns = [col for col in stored.columns if col != 'month_period']
+        missing, extra = set(columns) - set(df.columns), set(df.columns) - set(columns)
+        if missing or extra:
+            raise ValueError(f"{sheet}: columns do not match the dataset "
+                             f"(missing: {sorted(missing) or '-'}, unexpected: {sorted(extra) or '-'})")
+        df = df[columns].copy()
+        try:
+            tools.standardize_sheet(df, sheet)
+            for col in columns:
+                if pd.api.types.is_numeric_dtype(stored[col].dtype):
+                    df[col] = pd.to_numeric(df[col])
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"{sheet}: {e}")
+        # Keep the stored representation of the month column.
+        if pd.api.types.is_datetime64_any_dtype(stored['month'].dtype):
+            df['month'] = df['month_period'].dt.to_timestamp()
+        else:
+            df['month'] = df['month_period'].dt.strftime('%Y-%m')
+
+        if sheet == 'fx':
+            keys = ['month_period', 'currency']
+            overlap = _months(df[keys].merge(stored[keys].astype({'currency': str}), on=keys))
+        else:
+            months = _months(df)
+            overlap = months[np.isin(months.asi8, pd.unique(tools._period_ordinals(stored['month_period'])))]
+        if len(overlap):
+            raise ValueError(f"{sheet}: {', '.join(map(str, overlap))} already loaded; ingest only appends new months.")
+        validated[sheet] = df
+
+    fx_df = tools.concat_rows([existing['fx'], validated['fx']]) if 'fx' in validated else existing['fx']
+    fx_table = tools.FxTable(fx_df)
+    for sheet in ('actuals', 'budget'):
+        df = validated.get(sheet)
+        if df is None or 'currency' not in df.columns:
+            continue
+        try:
+            fx_table.convert(df['amount'], df['month_period'], df['currency'], on_missing='raise')
+        except ValueError as e:
+            raise ValueError(f"{sheet}: {e}")
+    return validated
+
+
+def _months(df: pd.DataFrame) -> pd.PeriodIndex:
+    return tools._as_periods(np.unique(tools._period_ordinals(df['month_period'])))
+
+
+def _latest_year(actuals_df: pd.DataFrame):
+    if actuals_df.empty:
+        return None
+    latest = tools._period_ordinals(actuals_df['month_period']).max()
+    return tools._as_periods(np.array([latest]))[0].year
+
+
+def append_delta(delta, dataset: str = None) -> dict:
+    """
+    Appends new months to a snapshot dataset. delta is a path (see read_delta)
+    or a {sheet name: frame} dict of raw rows. Returns a summary with the rows
+    and months appended per sheet, the new dataset version and the number of
+    memoized answers that were kept.
+    """
+    start = time.perf_counter()
+    dataset = dataset or tools.DATA_FILE
+    if not os.path.isdir(dataset) or snapshot.read_manifest(dataset) is None:
+        raise ValueError(f"{dataset} is not a snapshot dataset; compile it first with "
+                         f"`python -m agent.snapshot SOURCE --out DIR` and ingest into DIR.")
+    raw = read_delta(delta) if isinstance(delta, (str, os.PathLike)) else delta
+
+    with _INGEST_LOCK:
+        previous_signature = tools._file_signature(dataset)
+        frames = tools.load_data(dataset)
+        validated = validate_delta(raw, frames)
+        if not validated:
+            raise ValueError("The delta holds no rows.")
+        snapshot.append_snapshot(dataset, validated)
+        tools.extend_cached_dataset(dataset, previous_signature, validated)
+
+        old_version = tools._version_from_signature(previous_signature)
+        version = tools.dataset_version(dataset)
+        appended_periods = {p for df in validated.values() for p in _months(df)}
+        kept = 0
+        if os.path.abspath(dataset) == os.path.abspath(tools.DATA_FILE):
+            kept = planner.carry_over_answers(old_version, version, appended_periods,
+                                              _latest_year(frames[0]), _latest_year(tools.load_data(dataset)[0]))
+
+    return {
+        "dataset_version": version,
+        "rows": {sheet: len(df) for sheet, df in validated.items()},
+        "months": {sheet: [str(p) for p in _months(df)] for sheet, df in validated.items()},
+        "answers_kept": kept,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append new months to a snapshot dataset.")
+    parser.add_argument("delta", help="Delta .xlsx workbook or directory of <sheet>.csv files")
+    parser.add_argument("--dataset", default=None, help="Snapshot directory (default: DATA_FILE)")
+    args = parser.parse_args(argv)
+
+    summary = append_delta(args.delta, args.dataset)
+    for sheet, months in summary["months"].items():
+        print(f"{sheet}: {summary['rows'][sheet]} rows for {', '.join(months)}")
+    print(f"Dataset version {summary['dataset_version']} in {summary['seconds'] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
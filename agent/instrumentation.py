@@ -0,0 +1,204 @@
+"""
+Lightweight latency instrumentation.
+
+Spans time named stages (load_data, each tool, each plot, each report stage)
+and feed per-name histograms that can be exported in the Prometheus text
+format. Inside `with trace() as t:` the spans of the current thread are also
+kept in order, with their nesting, and t.to_json() returns them in the Chrome
+trace-event format (open it in chrome://tracing or https://ui.perfetto.dev).
+profile_call() runs one call under cProfile.
+
+Instrumentation is off unless CFO_INSTRUMENTATION=1 is set or enable() is
+called. While off, span() returns a shared no-op context manager and
+@timed functions make one flag check before calling straight through.
+"""
+import cProfile
+import contextlib
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+
+_enabled = os.environ.get('CFO_INSTRUMENTATION', '') not in ('', '0')
+
+# Upper bounds in seconds, as in Prometheus' default latency buckets.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+_NOOP = contextlib.nullcontext()
+_lock = threading.Lock()
+_histograms = {}  # span name -> _Histogram
+_local = threading.local()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+class _Histogram:
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+
+class Trace:
+    """The spans recorded on one thread inside a trace() block."""
+
+    def __init__(self):
+        self.spans = []  # dicts with name, start, duration (seconds), depth, thread
+
+    def to_dict(self) -> dict:
+        """Returns the spans as Chrome trace events (timestamps in microseconds)."""
+        origin = min((s['start'] for s in self.spans), default=0.0)
+        events = [{
+            "name": s['name'],
+            "ph": "X",
+            "ts": round((s['start'] - origin) * 1e6, 1),
+            "dur": round(s['duration'] * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": s['thread'],
+            "args": {"depth": s['depth']},
+        } for s in self.spans]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    def summary(self) -> list:
+        """Returns (name, duration in seconds, depth) for each span in start order."""
+        return [(s['name'], s['duration'], s['depth']) for s in sorted(self.spans, key=lambda s: s['start'])]
+
+
+def record(name: str, seconds: float, start: float = None):
+    """Records a finished span of the given duration (start defaults to now - seconds)."""
+    if not _enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = _Histogram()
+        histogram.observe(seconds)
+    current = getattr(_local, 'trace', None)
+    if current is not None:
+        current.spans.append({
+            "name": name,
+            "start": start if start is not None else time.perf_counter() - seconds,
+            "duration": seconds,
+            "depth": getattr(_local, 'depth', 0),
+            "thread": threading.get_ident(),
+        })
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        _local.depth = getattr(_local, 'depth', 0) + 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        _local.depth -= 1
+        record(self.name, seconds, self.start)
+        return False
+
+
+def span(name: str):
+    """Context manager timing the enclosed block as one span."""
+    return _Span(name) if _enabled else _NOOP
+
+
+def timed(name: str):
+    """Decorator timing every call of the function as a span."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextlib.contextmanager
+def trace():
+    """Collects the spans recorded on this thread into a Trace."""
+    previous = getattr(_local, 'trace', None)
+    _local.trace = current = Trace()
+    try:
+        yield current
+    finally:
+        _local.trace = previous
+
+
+def profile_call(fn, *args, sort: str = 'cumulative', limit: int = 30, **kwargs):
+    """Runs fn(*args, **kwargs) under cProfile; returns (result, report text)."""
+    profiler = cProfile.Profile()
+    result = profiler.runcall(fn, *args, **kwargs)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats(sort).print_stats(limit)
+    return result, out.getvalue()
+
+
+def summary() -> list:
+    """Returns one dict per span name: count, total, mean and max seconds."""
+    with _lock:
+        return [{
+            "span": name,
+            "count": h.count,
+            "total_s": h.total,
+            "mean_s": h.total / h.count if h.count else 0.0,
+            "max_s": h.max,
+        } for name, h in sorted(_histograms.items())]
+
+
+def prometheus_text(metric: str = 'cfo_span_duration_seconds') -> str:
+    """Renders the span histograms in the Prometheus text exposition format."""
+    lines = [f"# HELP {metric} Duration of instrumented stages.", f"# TYPE {metric} histogram"]
+    with _lock:
+        for name, h in sorted(_histograms.items()):
+            label = name.replace('\\', '\\\\').replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(BUCKETS, h.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{metric}_bucket{{span="{label}",le="{le}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{span="{label}"}} {h.total!r}')
+            lines.append(f'{metric}_count{{span="{label}"}} {h.count}')
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Drops every recorded histogram."""
+    with _lock:
+        _histograms.clear()
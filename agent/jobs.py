@@ -0,0 +1,125 @@
+"""
+Background jobs for slow, user-triggered work such as PDF export.
+
+A JobManager runs jobs on a small, bounded thread pool and hands back a Job
+handle straight away, so the caller (a Streamlit session) never blocks.
+Jobs are identified by a key describing the work (e.g. the report's month
+and entity); submitting a key that is already queued or running returns the
+existing Job instead of starting the same work twice. The manager is shared
+process-wide, so de-duplication also spans sessions.
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    """Handle on one submitted job: status, progress and, once done, its result."""
+
+    def __init__(self, job_id: int, key):
+        self.id = job_id
+        self.key = key
+        self.progress = 0.0
+        self.message = "Queued"
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self._future = None
+
+    def report_progress(self, fraction: float, message: str = None):
+        """Called by the running job to publish how far along it is."""
+        self.progress = min(max(fraction, 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+    @property
+    def status(self) -> str:
+        """One of 'queued', 'running', 'done' or 'failed'."""
+        if not self._future.done():
+            return 'running' if self._future.running() else 'queued'
+        return 'failed' if self._future.exception() is not None else 'done'
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    @property
+    def error(self):
+        """The exception the job raised, or None (also while it is still running)."""
+        return self._future.exception() if self._future.done() else None
+
+    def result(self, timeout: float = None):
+        """Waits for the job and returns its result, re-raising its exception."""
+        return self._future.result(timeout)
+
+
+class JobManager:
+    """Bounded thread pool that de-duplicates in-flight jobs by key."""
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 16, keep_finished: int = 32):
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._active = {}  # key -> Job, queued or running
+        self._finished = OrderedDict()  # id -> Job, most recent last
+
+    def submit(self, key, fn, *args, **kwargs) -> Job:
+        """
+        Runs fn(*args, progress=job.report_progress, **kwargs) in the background
+        and returns its Job, or the in-flight Job already submitted under key.
+        Raises RuntimeError when max_pending jobs are already in flight.
+        """
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None:
+                return job
+            if len(self._active) >= self.max_pending:
+                raise RuntimeError("Too many background jobs are running; please try again shortly.")
+            job = Job(next(self._ids), key)
+
+            def run():
+                job.message = "Running"
+                try:
+                    result = fn(*args, progress=job.report_progress, **kwargs)
+                except BaseException as e:
+                    job.message = f"Failed: {e}"
+                    raise
+                else:
+                    job.report_progress(1.0, "Done")
+                    return result
+                finally:
+                    self._finish(job)
+
+            job._future = self._executor.submit(run)
+            self._active[key] = job
+        return job
+
+    def _finish(self, job: Job):
+        job.finished_at = time.time()
+        with self._lock:
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+            self._finished[job.id] = job
+            while len(self._finished) > self.keep_finished:
+                self._finished.popitem(last=False)
+
+    def get(self, job_id: int):
+        """Returns the Job with this id while it is in flight or recently finished, else None."""
+        with self._lock:
+            for job in self._active.values():
+                if job.id == job_id:
+                    return job
+            return self._finished.get(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": len(self._active), "finished": len(self._finished)}
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+# Shared by every Streamlit session in this process.
+REPORT_JOBS = JobManager(max_workers=2)
@@ -0,0 +1,157 @@
+"""
+Streaming aggregation of large ledger exports.
+
+ERP exports of GL lines can be far larger than memory. aggregate_ledger()
+reads a CSV or Parquet export in chunks and folds each chunk into monthly
+totals per entity, account category and currency, which is all the tools
+need: the result has the actuals/budget sheet schema, with one row per
+(month, entity, account_category, currency) instead of one per line, and can
+be passed to any get_* tool in place of the full ledger. Peak memory is one
+chunk plus the running totals.
+
+With fx_df each chunk is converted to USD as it is read and the totals are
+kept in USD only, which makes them smaller still when lines come in many
+currencies.
+
+Usage:
+    python -m agent.ledger_stream EXPORT.csv --out data.snapshot
+        [--sheet actuals] [--base fixtures/data.xlsx] [--chunksize 500000] [--usd]
+"""
+import argparse
+import os
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from . import tools
+
+LEDGER_COLUMNS = ('month', 'entity', 'account_category', 'amount', 'currency')
+REQUIRED_COLUMNS = ('month', 'entity', 'account_category', 'amount')
+DEFAULT_CHUNKSIZE = 500_000
+# Partial totals are re-folded once this many have accumulated.
+_FOLD_EVERY = 16
+
+
+def iter_chunks(path: str, chunksize: int = DEFAULT_CHUNKSIZE):
+    """Yields the ledger columns of a CSV or Parquet file, chunksize rows at a time."""
+    if os.path.splitext(path)[1].lower() in ('.parquet', '.pq'):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        columns = [col for col in LEDGER_COLUMNS if col in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        # Dimensions as categoricals keep each chunk's strings deduplicated.
+        dtype = {'entity': 'category', 'account_category': 'category', 'currency': 'category', 'month': 'category'}
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=lambda col: col in LEDGER_COLUMNS, dtype=dtype)
+
+
+def _month_ordinals(months: pd.Series) -> np.ndarray:
+    """Parses a month column to period ordinals, parsing each distinct value once."""
+    codes, uniques = pd.factorize(months)
+    if (codes < 0).any():
+        raise ValueError("Ledger rows without a month.")
+    return pd.to_datetime(pd.Index(uniques)).to_period('M').asi8[codes]
+
+
+def fold_chunk(chunk: pd.DataFrame, fx_table: tools.FxTable = None) -> pd.Series:
+    """
+    Sums one chunk's amounts per (month ordinal, entity, account_category[, currency]).
+    With fx_table the amounts are converted to USD and currency is dropped.
+    """
+    missing = set(REQUIRED_COLUMNS) - set(chunk.columns)
+    if missing:
+        raise ValueError(f"Ledger export is missing column(s): {', '.join(sorted(missing))}")
+    ordinals = _month_ordinals(chunk['month'])
+    amounts = pd.to_numeric(chunk['amount']).fillna(0).to_numpy(dtype=float)
+    keys = {'month_ordinal': ordinals, 'entity': chunk['entity'], 'account_category': chunk['account_category']}
+    if 'currency' in chunk.columns:
+        if fx_table is not None:
+            amounts, missing_fx = fx_table.convert(amounts, ordinals, chunk['currency'])
+            if missing_fx.any():
+                warnings.warn(f"No FX rate to USD for {int(missing_fx.sum())} ledger line(s); "
+                              "those amounts were converted at 1.0.", RuntimeWarning)
+        else:
+            keys['currency'] = chunk['currency']
+    # Group on the chunk's own (often categorical) values; only the few totals are turned into plain strings.
+    # Lines with a blank entity or currency keep their own (missing) key, as they count in the full ledger's totals.
+    partial = (pd.DataFrame(keys).assign(amount=amounts)
+               .groupby(list(keys), sort=False, observed=True, dropna=False)['amount'].sum())
+    partial.index = pd.MultiIndex.from_arrays(
+        [partial.index.get_level_values(0)] + [partial.index.get_level_values(i).astype(str)
+                                                for i in range(1, partial.index.nlevels)],
+        names=partial.index.names)
+    return partial
+
+
+def _fold(partials) -> pd.Series:
+    combined = pd.concat(partials)
+    return combined.groupby(level=list(range(combined.index.nlevels)), sort=False, dropna=False).sum()
+
+
+def aggregate_ledger(path: str, fx_df: pd.DataFrame = None, chunksize: int = DEFAULT_CHUNKSIZE,
+                     progress=None) -> pd.DataFrame:
+    """
+    Streams a CSV or Parquet ledger export and returns its monthly totals in
+    the actuals/budget sheet schema (month, entity, account_category, amount,
+    currency, month_period), sorted by month. With fx_df the amounts are
+    converted to USD chunk by chunk (missing rates at 1.0, as in the tools)
+    and currency is 'USD' throughout. progress, if given, is called with the
+    number of lines read after every chunk. attrs['source_rows'] holds the
+    number of ledger lines read.
+    """
+    fx_table = tools.FxTable(fx_df) if fx_df is not None else None
+    partials = []
+    rows = 0
+    for chunk in iter_chunks(path, chunksize):
+        partials.append(fold_chunk(chunk, fx_table))
+        rows += len(chunk)
+        if len(partials) >= _FOLD_EVERY:
+            partials = [_fold(partials)]
+        if progress is not None:
+            progress(rows)
+    if not partials:
+        raise ValueError(f"No ledger lines found in {path}.")
+
+    totals = _fold(partials).reset_index()
+    if 'currency' not in totals.columns:
+        totals['currency'] = tools.BASE_CURRENCY
+    totals = totals.sort_values(['month_ordinal', 'entity', 'account_category', 'currency'], ignore_index=True)
+    periods = tools._as_periods(totals['month_ordinal'].to_numpy())
+    result = pd.DataFrame({
+        'month': periods.strftime('%Y-%m'),
+        'entity': totals['entity'],
+        'account_category': totals['account_category'],
+        'amount': totals['amount'],
+        'currency': totals['currency'],
+        'month_period': periods,
+    })
+    result.attrs['source_rows'] = rows
+    return result
+
+
+def main(argv=None):
+    from . import snapshot
+
+    parser = argparse.ArgumentParser(description="Aggregate a large ledger export into a snapshot dataset.")
+    parser.add_argument("export", help="CSV or Parquet file of ledger lines")
+    parser.add_argument("--out", required=True, help="Snapshot directory to write")
+    parser.add_argument("--sheet", choices=["actuals", "budget"], default="actuals", help="Sheet the export replaces")
+    parser.add_argument("--base", default=None, help="Dataset providing the other sheets (default: DATA_FILE)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--usd", action="store_true", help="Convert to USD while streaming")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    frames = list(tools.load_data(args.base))
+    fx_df = frames[tools.SHEETS.index('fx')]
+    ledger = aggregate_ledger(args.export, fx_df if args.usd else None, args.chunksize)
+    frames[tools.SHEETS.index(args.sheet)] = ledger
+    snapshot.write_snapshot(frames, args.out)
+    print(f"Folded {ledger.attrs['source_rows']:,} lines into {len(ledger):,} monthly totals "
+          f"in {time.perf_counter() - start:.1f}s; dataset written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Query parser: turns a free-text question into a typed Intent.
+
+All entities (months and their abbreviations, years, ISO months, quarters,
+"N months" and intent keywords) are matched by one precompiled pattern in a
+single pass over the lower-cased query. The planner only loads data once an
+intent has matched.
+"""
+import re
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from .instrumentation import timed
+
+MONTHS = ['january', 'february', 'march', 'april', 'may', 'june', 'july',
+          'august', 'september', 'october', 'november', 'december']
+_MONTH_NUMBERS = {name: i for i, name in enumerate(MONTHS, start=1)}
+_MONTH_NUMBERS.update({name[:3]: i for i, name in enumerate(MONTHS, start=1)})
+_MONTH_NUMBERS['sept'] = 9
+
+_MONTH_ALTERNATION = '|'.join(sorted(_MONTH_NUMBERS, key=len, reverse=True))
+
+# Every token starts at a word boundary, which lets the scan skip mid-word
+# positions without trying each alternative.
+_TOKEN_RE = re.compile(rf"""
+    \b(?:
+      (?P<iso>(?P<iso_year>\d{{4}})-(?P<iso_month>0[1-9]|1[0-2])\b)
+    | (?P<quarter>q(?P<quarter_num>[1-4])\b(?:\s*(?P<quarter_year>\d{{4}})\b)?)
+    | (?P<n_months>(?P<n>\d+)[\s-]+months?\b)
+    | (?P<month>(?P<month_name>{_MONTH_ALTERNATION})\b\.?(?:,?\s*'?(?P<month_year>\d{{4}})\b)?)
+    | (?P<year>\d{{4}}\b)
+    | (?P<keyword>gross\s+margin|cash\s+runway|runway|scenarios?|simulat(?:e|ions?)|monte\s+carlo|what-if
+                  |year[\s-]+to[\s-]+date|ytd|rolling|(?:vs|versus|compared?)\b|variances?|miss(?:es|ed)?|heatmap
+                  |revenue|budget|ebitda|cogs|trend|opex|breakdown|category)
+    )
+""", re.VERBOSE)
+
+# Wording between two months that makes them a range: "March to June", "Mar-Jun",
+# "between March and June". Two months joined by anything else ("June vs May",
+# "June ... compared to May") are separate mentions.
+_RANGE_JOIN_RE = re.compile(r"\s*(?:to|through|thru|until|till|-|–|—)\s*")
+_BETWEEN_JOIN_RE = re.compile(r"\s*and\s*")
+_BETWEEN_RE = re.compile(r"\bbetween\s*$")
+
+# Spellings of the same keyword.
+_KEYWORD_ALIASES = {'year to date': 'ytd', 'year-to-date': 'ytd', 'versus': 'vs', 'compare': 'vs', 'compared': 'vs',
+                    'variances': 'variance', 'misses': 'miss', 'missed': 'miss'}
+# Metric keywords, most specific first.
+_METRIC_KEYWORDS = (('gross margin', 'Gross Margin'), ('ebitda', 'EBITDA'), ('cogs', 'COGS'),
+                    ('opex', 'Opex'), ('revenue', 'Revenue'))
+_SCENARIO_KEYWORDS = {'scenario', 'scenarios', 'simulate', 'simulation', 'simulations', 'monte carlo', 'what-if'}
+
+# A (year, month) pair; year is None when the query did not say, meaning
+# "the latest year in the data".
+MonthRef = Tuple[Optional[int], int]
+
+
+@dataclass(frozen=True)
+class Intent:
+    """
+    The resolved form of a question. Two questions that parse to the same
+    Intent get the same answer, so it doubles as the planner's memo key.
+    """
+    intent: str
+    metric: Optional[str] = None
+    month: Optional[str] = None  # full month name, e.g. 'June'
+    year: Optional[int] = None
+    num_months: Optional[int] = None
+    start: Optional[MonthRef] = None  # first month of a quarter or date range
+    end: Optional[MonthRef] = None    # last month of a quarter or date range
+    compare_start: Optional[MonthRef] = None  # first month of the range compared against
+    compare_end: Optional[MonthRef] = None    # last month of the range compared against
+
+    @property
+    def is_fallback(self) -> bool:
+        return self.intent == 'fallback'
+
+
+@timed('parser.parse_query')
+def parse_query(query: str) -> Intent:
+    """Parses a question into an Intent; unanswerable questions give intent 'fallback'."""
+    text = query.lower()
+    keywords = set()
+    months = []  # MonthRef for each month mention, in order
+    month_spans = []  # (start, end) of each month mention in text
+    quarters = []  # (year or None, quarter number) for each quarter mention, in order
+    year = None
+    num_months = None
+
+    for match in _TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        if kind == 'keyword':
+            keyword = ' '.join(match.group('keyword').split())
+            keywords.add(_KEYWORD_ALIASES.get(keyword, keyword))
+        elif kind == 'month':
+            month_year = match.group('month_year')
+            months.append((int(month_year) if month_year else None, _MONTH_NUMBERS[match.group('month_name')]))
+            month_spans.append(match.span())
+            if month_year and year is None:
+                year = int(month_year)
+        elif kind == 'iso':
+            months.append((int(match.group('iso_year')), int(match.group('iso_month'))))
+            month_spans.append(match.span())
+            if year is None:
+                year = int(match.group('iso_year'))
+        elif kind == 'quarter':
+            quarter_year = match.group('quarter_year')
+            quarters.append((int(quarter_year) if quarter_year else None, int(match.group('quarter_num'))))
+            if quarter_year and year is None:
+                year = int(quarter_year)
+        elif kind == 'n_months':
+            if num_months is None:
+                num_months = int(match.group('n'))
+        elif kind == 'year' and year is None:
+            year = int(match.group('year'))
+
+    start = end = None
+    if not quarters and len(months) >= 2 and _is_range(text, *month_spans[:2]):
+        start, end = _month_range(months[0], months[1], year)
+    # A month or quarter without its own year takes the query's year.
+    months = [(month_year or year, month) for month_year, month in months]
+    quarters = [((quarter_year or year, 3 * q - 2), (quarter_year or year, 3 * q)) for quarter_year, q in quarters]
+    if quarters:
+        start, end = quarters[0]
+    month = MONTHS[months[0][1] - 1].capitalize() if months else None
+    metric = next((name for keyword, name in _METRIC_KEYWORDS if keyword in keywords), None)
+
+    if 'rolling' in keywords and metric:
+        return Intent('rolling_metric', metric=metric, num_months=num_months or 12)
+
+    if 'ytd' in keywords and metric:
+        return Intent('ytd', metric=metric, month=month, year=year)
+
+    # "Q2 vs Q1", "June 2025 vs May 2025": the first range against the second.
+    if 'vs' in keywords and 'budget' not in keywords:
+        ranges = quarters if quarters else [(m, m) for m in months]
+        if len(ranges) >= 2:
+            (start, end), (compare_start, compare_end) = ranges[0], ranges[1]
+            return Intent('period_compare', metric=metric or 'Revenue', start=start, end=end,
+                          compare_start=compare_start, compare_end=compare_end)
+
+    if 'revenue' in keywords and 'budget' in keywords:
+        return Intent('revenue_vs_budget', month=month, year=year, start=start, end=end)
+
+    # "Budget variance heatmap for 2025", "Where did we miss budget in Q2?"
+    if keywords & {'variance', 'miss', 'heatmap'}:
+        return Intent('variance', month=month, year=year, start=start, end=end)
+
+    if ('gross margin' in keywords or 'ebitda' in keywords) and 'trend' in keywords:
+        return Intent('metric_trend', metric=metric, num_months=num_months or 6)
+
+    if 'opex' in keywords and ('breakdown' in keywords or 'category' in keywords):
+        return Intent('opex_breakdown', month=month, year=year, start=start, end=end)
+
+    if keywords & {'cash runway', 'runway'} and keywords & _SCENARIO_KEYWORDS:
+        return Intent('runway_scenarios', num_months=num_months)
+
+    if 'cash runway' in keywords:
+        return Intent('cash_runway')
+
+    # "EBITDA for Q2 2025", "COGS from March to June 2025"
+    if metric and start is not None:
+        return Intent('range_total', metric=metric, start=start, end=end)
+
+    return Intent('fallback')
+
+
+def _is_range(text: str, first_span, second_span) -> bool:
+    """Whether the words between two month mentions make them a range."""
+    between = text[first_span[1]:second_span[0]]
+    if _RANGE_JOIN_RE.fullmatch(between):
+        return True
+    return bool(_BETWEEN_JOIN_RE.fullmatch(between) and _BETWEEN_RE.search(text[:first_span[0]]))
+
+
+def _month_range(first: MonthRef, last: MonthRef, year: Optional[int]) -> Tuple[MonthRef, MonthRef]:
+    """
+    Resolves the years of a range from first to last. A month without a year
+    takes the year that keeps the range in order: "December 2024 to March"
+    ends in March 2025 and "August to March 2025" starts in August 2024. With
+    neither year given, the query's year (if any) is the end's year.
+    """
+    (first_year, first_month), (last_year, last_month) = first, last
+    if first_year is None and last_year is None:
+        last_year = year
+    if last_year is None and first_year is not None:
+        last_year = first_year + (last_month < first_month)
+    if first_year is None and last_year is not None:
+        first_year = last_year - (first_month > last_month)
+    return (first_year, first_month), (last_year, last_month)
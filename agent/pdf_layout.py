@@ -0,0 +1,41 @@
+"""
+Page layout of the PDF report.
+
+Kept apart from agent.reporting so that fpdf, which is slow to import, is only
+loaded when a report is actually laid out.
+"""
+import io
+from fpdf import FPDF
+
+
+class PDF(FPDF):
+    def __init__(self, subtitle=None, **kwargs):
+        super().__init__(**kwargs)
+        self.subtitle = subtitle
+
+    def header(self):
+        self.set_font('Arial', 'B', 12)
+        title = 'Monthly Financial Report'
+        if self.subtitle:
+            title += f' - {self.subtitle}'
+        self.cell(0, 10, title, 0, 1, 'C')
+        self.ln(10)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
+
+    def chapter_title(self, title):
+        self.set_font('Arial', 'B', 12)
+        self.cell(0, 10, title, 0, 1, 'L')
+        self.ln(5)
+
+    def chapter_body(self, body):
+        self.set_font('Arial', '', 12)
+        self.multi_cell(0, 10, body)
+        self.ln()
+
+    def add_chart(self, png_bytes, width=190):
+        self.image(io.BytesIO(png_bytes), x=-5, w=width)
+        self.ln(5)
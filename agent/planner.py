@@ -1,35 +1,187 @@
-import re
 import pandas as pd
-from . import tools, plotting
+from . import runway, tenants, timeseries, tools, plotting, variance
+from .instrumentation import timed
+from .parser import Intent, parse_query
+from .query_cache import QueryCache
 
-def route_query(query: str) -> dict:
+# Answers are memoized on the parsed Intent plus the dataset version, per tenant.
+QUERY_CACHE = QueryCache(maxsize=256, ttl=3600)
+# Months shown for a rolling metric.
+ROLLING_MONTHS_SHOWN = 12
+# Months covered by a variance question without a period.
+VARIANCE_MONTHS = 12
+
+FALLBACK_TEXT = "Sorry, I can't answer that question. Please try one of the sample questions or ask about: \n- Revenue vs. Budget (for a month, a quarter, a range or year to date) \n- Gross Margin or EBITDA trend (for the last X months, or rolling) \n- Opex breakdown (for a month or a range) \n- One quarter or month vs. another (e.g. Q2 vs Q1 EBITDA) \n- Budget variance by category and entity (heatmap and largest misses) \n- Cash Runway \n- Cash Runway scenarios (simulated ranges)"
+
+
+@timed('planner.route_query')
+def route_query(query: str, include_chart: bool = True, tenant: str = None) -> dict:
     """
     Interprets a user's query and routes it to the appropriate tool and plotting function.
+    Data is only loaded once the query has matched an intent, and answers are
+    memoized per parsed Intent and dataset version (see QUERY_CACHE). With
+    include_chart=False no Plotly figure is built and 'chart' is None; such an
+    answer is memoized too, but a later request with a chart rebuilds it.
+    tenant picks the dataset from the registry (see agent.tenants); None is DATA_FILE.
     """
-    query_lower = query.lower()
+    intent = parse_query(query)
+    if intent.is_fallback:
+        return {"text": FALLBACK_TEXT, "chart": None}
+
+    try:
+        version = tenants.dataset_version(tenant)
+    except Exception as e:
+        return {"text": f"Error loading data: {e}", "chart": None}
+
+    cached = _cached_answer(intent, version, include_chart, tenant)
+    if cached is not None:
+        return cached
 
     # --- Load Data ---
     try:
-        actuals_df, budget_df, cash_df, fx_df = tools.load_data()
+        backend = tenants.get_backend(tenant)
     except Exception as e:
         return {"text": f"Error loading data: {e}", "chart": None}
 
-    # --- Entity Extraction: Date ---
-    month_match = re.search(r'(january|february|march|april|may|june|july|august|september|october|november|december)', query_lower)
-    year_match = re.search(r'(\d{4})', query_lower)
-    
-    month_name = month_match.group(1).capitalize() if month_match else None
+    result = _answer(intent, backend, include_chart=include_chart)
+    _cache_answer(intent, version, result, include_chart, tenant)
+    return dict(result)
+
+
+def _cached_answer(intent: Intent, version: str, include_chart: bool, tenant: str = None):
+    """Returns a copy of the memoized answer if it can serve this request, else None."""
+    entry = QUERY_CACHE.get(intent, version, scope=tenant)
+    if entry is None:
+        return None
+    result, has_chart = entry
+    if include_chart and not has_chart:
+        # Memoized by a chart-less request; the chart still has to be built.
+        return None
+    return dict(result) if include_chart else _without_chart(result)
+
+
+def _cache_answer(intent: Intent, version: str, result: dict, include_chart: bool, tenant: str = None):
+    """Memoizes an answer, remembering whether it was built with its chart."""
+    QUERY_CACHE.put(intent, version, (result, include_chart), scope=tenant)
+
+
+def carry_over_answers(old_version: str, new_version: str, appended_periods, previous_year: int, year: int,
+                       tenant: str = None) -> int:
+    """
+    Keeps the memoized answers that months appended to the dataset cannot
+    change: revenue vs budget and Opex breakdowns of a single month that is not
+    among appended_periods. A question without a year refers to the latest
+    year in the actuals, so those are only kept while it stays the same.
+    Trends and runway always look at the latest months and are dropped.
+    Only the tenant's answers are touched. Returns the number of answers kept.
+    """
+    appended = set(appended_periods)
+
+    def unaffected(intent: Intent) -> bool:
+        if intent.intent not in ('revenue_vs_budget', 'opex_breakdown') or not intent.month:
+            return False
+        if intent.start is not None or intent.end is not None:
+            return False
+        if intent.year is None and year != previous_year:
+            return False
+        return pd.Period(f'{intent.year or previous_year}-{intent.month}', freq='M') not in appended
+
+    return QUERY_CACHE.carry_over(old_version, new_version, unaffected, scope=tenant)
+
+
+def _without_chart(result: dict) -> dict:
+    return {**result, "chart": None}
+
+
+@timed('planner.answer')
+def _answer(intent: Intent, backend, include_chart: bool = True) -> dict:
+    """
+    Runs the tool and plotting function for a parsed intent against a storage
+    backend (see agent.backends). Amounts without an FX rate are converted at
+    1.0; the answer then says so.
+    """
+    result = _route_intent(intent, backend, include_chart)
+    note = _fx_note(backend.missing_fx_rates())
+    return {**result, "text": result["text"] + note} if note else result
+
+
+def _fx_note(missing: pd.DataFrame) -> str:
+    if missing.empty:
+        return ""
+    month, currency = missing.iloc[0]
+    example = f"{'no currency' if pd.isna(currency) else currency} in {month.strftime('%b %Y')}"
+    return (f"\n\n_Note: {len(missing)} month/currency pair(s) in the ledgers have no FX rate to USD "
+            f"(e.g. {example}); those amounts were converted at 1.0._")
+
+
+def _route_intent(intent: Intent, backend, include_chart: bool = True) -> dict:
+    month_name = intent.month
     # Default to the latest year in the data if not specified
-    year = int(year_match.group(1)) if year_match else pd.to_datetime(actuals_df['month']).dt.year.max()
+    year = intent.year or backend.latest_year()
 
     # --- Intent Routing ---
 
+    # Intent: Totals over a range of months (quarters, from-to ranges, year to date)
+    if intent.intent in ('range_total', 'ytd') or (intent.intent == 'revenue_vs_budget' and intent.start is not None):
+        if not year:
+            return {"text": "Please specify a period for this question.", "chart": None}
+        if intent.intent == 'ytd':
+            start, end = _year_to_date(intent, year, backend.latest_period())
+            label = f"{year} year to date ({start.strftime('%b')} – {end.strftime('%b')})"
+        else:
+            start, end = _month_range(intent, year)
+            if start > end:
+                return _reversed_range(start, end)
+            label = timeseries.format_range(start, end)
+        return _range_answer(backend, intent.metric or 'Revenue', start, end, label, include_chart)
+
+    # Intent: One range against another
+    if intent.intent == 'period_compare':
+        if not year:
+            return {"text": "Please specify the periods to compare.", "chart": None}
+        metric = intent.metric
+        start, end = _period(intent.start, year), _period(intent.end, year)
+        compare_start, compare_end = _period(intent.compare_start, year), _period(intent.compare_end, year)
+        label, compare_label = timeseries.format_range(start, end), timeseries.format_range(compare_start, compare_end)
+        current = backend.get_range_total(metric, start, end)
+        previous = backend.get_range_total(metric, compare_start, compare_end)
+        for data, period_label in ((current, label), (previous, compare_label)):
+            if data is None:
+                return {"text": f"No data found for {period_label}.", "chart": None}
+
+        change = current['actual'] - previous['actual']
+        if metric == 'Gross Margin':
+            change_text = f"{change:+.1f} pts"
+        else:
+            relative = f" ({change / abs(previous['actual']):+.1%})" if previous['actual'] else ""
+            change_text = f"{'+' if change >= 0 else '-'}${abs(change) / 1_000_000:.2f}M{relative}"
+        text_response = (
+            f"### {metric}: {label} vs. {compare_label}\n"
+            f"- **{label}:** {_format_metric(current['actual'], metric)}\n"
+            f"- **{compare_label}:** {_format_metric(previous['actual'], metric)}\n"
+            f"- **Change:** {change_text}"
+        )
+        chart = plotting.plot_period_comparison(
+            {label: current['actual'], compare_label: previous['actual']}, _metric_label(metric),
+            f"{metric}: {label} vs. {compare_label}") if include_chart else None
+        return {"text": text_response, "chart": chart}
+
+    # Intent: Rolling metric
+    if intent.intent == 'rolling_metric':
+        metric, window = intent.metric, intent.num_months
+        df_rolling = backend.get_rolling_metric(metric, window, ROLLING_MONTHS_SHOWN)
+        if df_rolling.empty:
+            return {"text": f"Not enough data for a rolling {window}-month {metric}.", "chart": None}
+        chart = plotting.plot_metric_trend(df_rolling, f"Rolling {window}-month {_metric_label(metric)}") if include_chart else None
+        text_response = f"Here is the rolling {window}-month {metric} for the last {len(df_rolling)} months."
+        return {"text": text_response, "chart": chart}
+
     # Intent: Revenue vs Budget
-    if 'revenue' in query_lower and 'budget' in query_lower:
+    if intent.intent == 'revenue_vs_budget':
         if not month_name or not year:
             return {"text": "Please specify a month and year for revenue vs. budget analysis.", "chart": None}
         
-        data = tools.get_revenue_vs_budget(actuals_df, budget_df, fx_df, month_name, year)
+        data = backend.get_revenue_vs_budget(month_name, year)
         if data is None:
             return {"text": f"No revenue data found for {month_name} {year}.", "chart": None}
 
@@ -44,39 +196,73 @@ def route_query(query: str) -> dict:
             f"- **Budgeted Revenue:** ${budget_rev_m:.2f}M\n"
             f"- **Variance:** ${variance_m:.2f}M"
         )
-        chart = plotting.plot_revenue_vs_budget(data['actual'], data['budget'], month_name, year)
+        chart = plotting.plot_revenue_vs_budget(data['actual'], data['budget'], month_name, year) if include_chart else None
         return {"text": text_response, "chart": chart}
 
     # Intent: Gross Margin or EBITDA Trend
-    if ('gross margin' in query_lower or 'ebitda' in query_lower) and 'trend' in query_lower:
-        metric = 'Gross Margin' if 'gross margin' in query_lower else 'EBITDA'
-        num_months_match = re.search(r'(\d+)\s+months', query_lower)
-        num_months = int(num_months_match.group(1)) if num_months_match else 6
+    if intent.intent == 'metric_trend':
+        metric, num_months = intent.metric, intent.num_months
 
-        df_trend = tools.get_financial_metric_trend(actuals_df, fx_df, metric, num_months)
+        df_trend = backend.get_financial_metric_trend(metric, num_months)
         chart_metric_name = f"{metric} %" if metric == 'Gross Margin' else f"{metric} (USD)"
-        chart = plotting.plot_metric_trend(df_trend, chart_metric_name)
+        chart = plotting.plot_metric_trend(df_trend, chart_metric_name) if include_chart else None
         
         text_response = f"Here is the {metric} trend for the last {num_months} months."
         return {"text": text_response, "chart": chart}
 
     # Intent: Opex Breakdown
-    if 'opex' in query_lower and ('breakdown' in query_lower or 'category' in query_lower):
+    if intent.intent == 'opex_breakdown' and intent.start is not None and year:
+        start, end = _month_range(intent, year)
+        if start > end:
+            return _reversed_range(start, end)
+        label = timeseries.format_range(start, end)
+        df_opex = backend.get_opex_breakdown_range(start, end)
+        if df_opex is None or df_opex.empty:
+            return {"text": f"No Opex data found for {label}.", "chart": None}
+
+        total_opex_m = df_opex['Amount (USD)'].sum() / 1_000_000
+        text_response = f"Total Opex for {label} was **${total_opex_m:.2f}M**. Here is the breakdown by category."
+        chart = plotting.plot_opex_breakdown(df_opex, label) if include_chart else None
+        return {"text": text_response, "chart": chart}
+
+    if intent.intent == 'opex_breakdown':
         if not month_name or not year:
             return {"text": "Please specify a month and year for the Opex breakdown.", "chart": None}
 
-        df_opex = tools.get_opex_breakdown(actuals_df, fx_df, month_name, year)
+        df_opex = backend.get_opex_breakdown(month_name, year)
         if df_opex is None or df_opex.empty:
             return {"text": f"No Opex data found for {month_name} {year}.", "chart": None}
 
         total_opex_m = df_opex['Amount (USD)'].sum() / 1_000_000
         text_response = f"Total Opex for {month_name} {year} was **${total_opex_m:.2f}M**. Here is the breakdown by category."
-        chart = plotting.plot_opex_breakdown(df_opex, month_name, year)
+        chart = plotting.plot_opex_breakdown(df_opex, month_name, year) if include_chart else None
+        return {"text": text_response, "chart": chart}
+
+    # Intent: Budget variance of every category and entity
+    if intent.intent == 'variance':
+        start, end = _variance_range(intent, year, backend.latest_period())
+        if start is None:
+            return {"text": "No data available for a variance analysis.", "chart": None}
+        if start > end:
+            return _reversed_range(start, end)
+        label = timeseries.format_range(start, end)
+        data = backend.get_variance_report(start, end)
+        if data is None:
+            return {"text": f"No actual or budget data found for {label}.", "chart": None}
+
+        net = data['net_variance']
+        text_response = (
+            f"### Budget Variance for {label}\n"
+            f"- **Net Variance:** ${abs(net) / 1_000_000:.2f}M {'favorable' if net >= 0 else 'unfavorable'}\n"
+            f"- **Unfavorable:** {data['unfavorable']} of {data['cells']} month × category × entity cells\n\n"
+            f"{_misses_table(data['misses'])}"
+        )
+        chart = plotting.plot_variance_heatmap(data['heatmap'], f"Budget Variance for {label}") if include_chart else None
         return {"text": text_response, "chart": chart}
 
     # Intent: Cash Runway
-    if 'cash runway' in query_lower:
-        data = tools.get_cash_runway(actuals_df, cash_df, fx_df)
+    if intent.intent == 'cash_runway':
+        data = backend.get_cash_runway()
         if "error" in data:
             return {"text": data["error"], "chart": None}
 
@@ -95,8 +281,126 @@ def route_query(query: str) -> dict:
             )
         return {"text": text_response, "chart": None}
 
+    # Intent: Cash Runway Scenarios
+    if intent.intent == 'runway_scenarios':
+        horizon = runway.DEFAULT_HORIZON if intent.num_months is None else intent.num_months
+        if not 1 <= horizon <= runway.MAX_HORIZON:
+            return {"text": f"Please give a runway horizon between 1 and {runway.MAX_HORIZON} months.", "chart": None}
+        data = backend.get_runway_scenarios(horizon=horizon)
+        if "error" in data:
+            return {"text": data["error"], "chart": None}
+
+        def months(value):
+            return f"> {horizon}" if value == float('inf') else f"{value:.1f}"
+
+        bands = " / ".join(months(value) for value in data['runway_percentiles'].values())
+        labels = " / ".join(f"P{p}" for p in data['runway_percentiles'])
+        text_response = (
+            f"### 💰 Cash Runway Scenarios\n"
+            f"- **Current Cash Balance:** ${data['latest_cash']:,.0f} USD\n"
+            f"- **Runway ({labels}):** **{bands} months**\n"
+            f"- **Chance of running out of cash within {horizon} months:** {data['prob_out_of_cash']:.0%}\n\n"
+            f"Based on {data['paths']:,} simulated paths of burn growth, revenue shocks and FX swings."
+        )
+        chart = plotting.plot_runway_fan(data['cash_bands']) if include_chart else None
+        return {"text": text_response, "chart": chart}
+
     # --- Fallback Response ---
-    return {
-        "text": "Sorry, I can't answer that question. Please try one of the sample questions or ask about: \n- Revenue vs. Budget (for a specific month) \n- Gross Margin or EBITDA trend (for the last X months) \n- Opex breakdown (for a specific month) \n- Cash Runway",
-        "chart": None
-    }
\ No newline at end of file
+    return {"text": FALLBACK_TEXT, "chart": None}
+
+
+def _period(ref, default_year: int) -> pd.Period:
+    """Resolves a parser MonthRef, whose year may be None (the latest year), to a Period."""
+    ref_year, month = ref
+    return pd.Period(year=ref_year or default_year, month=month, freq='M')
+
+
+def _month_range(intent: Intent, year: int):
+    """
+    Resolves the (start, end) months of a question's range. A start without a
+    year that would fall after the end is in the year before: with 2025 the
+    latest year, "August to March" runs from August 2024.
+    """
+    start, end = _period(intent.start, year), _period(intent.end, year)
+    if start > end and intent.start[0] is None:
+        start -= 12
+    return start, end
+
+
+def _reversed_range(start, end) -> dict:
+    return {"text": f"The period {start.strftime('%b %Y')} – {end.strftime('%b %Y')} ends before it starts. "
+                    "Please give the earlier month first.", "chart": None}
+
+
+def _year_to_date(intent: Intent, year: int, latest):
+    """Returns (January, end) of a year-to-date question: up to its month, else the latest month of that year."""
+    if intent.month:
+        end = pd.Period(f'{year}-{intent.month}', freq='M')
+    elif latest is not None and latest.year == year:
+        end = latest
+    else:
+        end = pd.Period(year=year, month=12, freq='M')
+    return pd.Period(year=year, month=1, freq='M'), end
+
+
+def _variance_range(intent: Intent, year: int, latest):
+    """
+    Returns the (start, end) months of a variance question: its range, month or
+    year, else the last VARIANCE_MONTHS months. (None, None) without data.
+    """
+    if intent.start is not None:
+        return _month_range(intent, year)
+    if intent.month and year:
+        month = pd.Period(f'{year}-{intent.month}', freq='M')
+        return month, month
+    if intent.year:
+        return pd.Period(year=intent.year, month=1, freq='M'), pd.Period(year=intent.year, month=12, freq='M')
+    if latest is None:
+        return None, None
+    return latest - (VARIANCE_MONTHS - 1), latest
+
+
+def _misses_table(misses: pd.DataFrame) -> str:
+    """Formats the largest misses (unfavorable variances) of a variance report as a markdown table."""
+    if misses.empty:
+        return "No category missed its budget."
+    rows = [
+        f"| {row.month_period.strftime('%b %Y')} | {row.label} | {row.entity} | ${row.actual:,.0f} | ${row.budget:,.0f} "
+        f"| {'+' if row.variance >= 0 else '-'}${abs(row.variance):,.0f} "
+        f"| {'n/a' if pd.isna(row.variance_pct) else f'{row.variance_pct:+.1f}%'} |"
+        for row in misses.itertuples(index=False)
+    ]
+    return "\n".join([
+        f"**Largest {len(misses)} miss{'es' if len(misses) != 1 else ''}:**\n",
+        "| Month | Category | Entity | Actual | Budget | Variance | % |",
+        "|---|---|---|---:|---:|---:|---:|",
+        *rows,
+    ])
+
+
+def _metric_label(metric: str) -> str:
+    return f"{metric} %" if metric == 'Gross Margin' else f"{metric} (USD)"
+
+
+def _format_metric(value: float, metric: str) -> str:
+    return f"{value:.1f}%" if metric == 'Gross Margin' else f"${value / 1_000_000:.2f}M"
+
+
+def _range_answer(backend, metric: str, start, end, label: str, include_chart: bool) -> dict:
+    """Answers a metric's actual vs. budget total over the months [start, end]."""
+    data = backend.get_range_total(metric, start, end)
+    if data is None:
+        return {"text": f"No {metric} data found for {label}.", "chart": None}
+
+    variance = data['actual'] - data['budget']
+    variance_text = f"{variance:+.1f} pts" if metric == 'Gross Margin' else f"${variance / 1_000_000:.2f}M"
+    text_response = (
+        f"### {metric} vs. Budget for {label}:\n"
+        f"- **Actual {metric}:** {_format_metric(data['actual'], metric)}\n"
+        f"- **Budgeted {metric}:** {_format_metric(data['budget'], metric)}\n"
+        f"- **Variance:** {variance_text}"
+    )
+    chart = plotting.plot_period_comparison(
+        {'Actual': data['actual'], 'Budget': data['budget']}, _metric_label(metric),
+        f"{metric} vs. Budget for {label}") if include_chart else None
+    return {"text": text_response, "chart": chart}
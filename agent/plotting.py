@@ -1,8 +1,13 @@
-import plotly.express as px
-import plotly.graph_objects as go
+from .instrumentation import timed
 
+# Plotly is imported by each function on first use: importing plotly.express
+# takes longer than answering most questions, and text-only answers, batch
+# jobs and the API without charts never need it.
+
+@timed('plotting.plot_revenue_vs_budget')
 def plot_revenue_vs_budget(actual, budget, month, year):
     """Generates a bar chart comparing actual vs. budget revenue."""
+    import plotly.graph_objects as go
     fig = go.Figure(data=[
         go.Bar(name='Actual', x=['Revenue'], y=[actual], marker_color='#1f77b4'),
         go.Bar(name='Budget', x=['Revenue'], y=[budget], marker_color='#ff7f0e')
@@ -15,8 +20,27 @@ def plot_revenue_vs_budget(actual, budget, month, year):
     )
     return fig
 
+@timed('plotting.plot_period_comparison')
+def plot_period_comparison(values, metric_name, title):
+    """Generates a bar chart of one metric for several periods or for actual vs. budget ({label: value})."""
+    import plotly.graph_objects as go
+    colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728']
+    fig = go.Figure(data=[
+        go.Bar(name=label, x=[metric_name], y=[value], marker_color=colors[i % len(colors)])
+        for i, (label, value) in enumerate(values.items())
+    ])
+    fig.update_layout(
+        title_text=title,
+        yaxis_title='%' if '%' in metric_name else 'Amount (USD)',
+        title_x=0.5,
+        barmode='group'
+    )
+    return fig
+
+@timed('plotting.plot_metric_trend')
 def plot_metric_trend(df, metric_name):
     """Generates a line chart for a given metric trend."""
+    import plotly.express as px
     fig = px.line(
         df, 
         x='month_str', 
@@ -31,21 +55,25 @@ def plot_metric_trend(df, metric_name):
         fig.update_layout(yaxis_ticksuffix='%')
     return fig
 
-def plot_opex_breakdown(df, month, year):
-    """Generates a pie chart for the Opex breakdown."""
+@timed('plotting.plot_opex_breakdown')
+def plot_opex_breakdown(df, month, year=None):
+    """Generates a pie chart for the Opex breakdown (of a month, or of a range named by month alone)."""
+    import plotly.express as px
     fig = px.pie(
         df,
         values='Amount (USD)', 
         names='Category',
-        title=f'Opex Breakdown for {month} {year}', 
+        title=f'Opex Breakdown for {month} {year}' if year is not None else f'Opex Breakdown for {month}', 
         hole=.3,
         color_discrete_sequence=px.colors.qualitative.Plotly
     )
     fig.update_traces(textposition='inside', textinfo='percent+label')
     return fig
 
+@timed('plotting.plot_cash_trend')
 def plot_cash_trend(df):
     """Generates a line chart for the cash trend."""
+    import plotly.express as px
     fig = px.line(
         df, 
         x='month_str', 
@@ -56,4 +84,61 @@ def plot_cash_trend(df):
     )
     fig.update_traces(line_color='#1f77b4', marker=dict(color='#1f77b4', size=8))
     fig.update_layout(title_x=0.5)
-    return fig
\ No newline at end of file
+    return fig
+
+
+@timed('plotting.plot_runway_fan')
+def plot_runway_fan(bands):
+    """
+    Generates a fan chart of simulated cash balances: one shaded band per pair
+    of outer percentiles around the median line of a runway.simulate_runway()
+    'cash_bands' frame.
+    """
+    import plotly.graph_objects as go
+    columns = list(bands.columns[1:])
+    fig = go.Figure()
+    # Bands from the outermost pair inwards, each filled up to the previous trace.
+    for i in range(len(columns) // 2):
+        low, high = columns[i], columns[-1 - i]
+        shade = f'rgba(31, 119, 180, {0.15 + 0.15 * i:.2f})'
+        fig.add_trace(go.Scatter(x=bands['month_str'], y=bands[low], mode='lines', line=dict(width=0),
+                                 showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=bands['month_str'], y=bands[high], mode='lines', line=dict(width=0),
+                                 fill='tonexty', fillcolor=shade, name=f'{low.upper()}–{high.upper()}'))
+    if len(columns) % 2:
+        median = columns[len(columns) // 2]
+        fig.add_trace(go.Scatter(x=bands['month_str'], y=bands[median], mode='lines',
+                                 line=dict(color='#1f77b4', width=2), name=median.upper()))
+    fig.add_hline(y=0, line_dash='dash', line_color='#d62728')
+    fig.update_layout(
+        title_text='Simulated Cash Balance',
+        xaxis_title='Month',
+        yaxis_title='Cash (USD)',
+        title_x=0.5
+    )
+    return fig
+
+@timed('plotting.plot_variance_heatmap')
+def plot_variance_heatmap(grid, title):
+    """
+    Generates a heatmap of budget variance by category (rows) and month
+    (columns) from a variance report's 'heatmap' frame: green where the
+    variance is favorable, red where it is not.
+    """
+    import plotly.graph_objects as go
+    fig = go.Figure(data=go.Heatmap(
+        z=grid.to_numpy(),
+        x=list(grid.columns),
+        y=list(grid.index),
+        colorscale='RdYlGn',
+        zmid=0,
+        colorbar=dict(title='USD'),
+        hovertemplate='%{y}, %{x}: %{z:$,.0f}<extra></extra>'
+    ))
+    fig.update_layout(
+        title_text=title,
+        xaxis_title='Month',
+        yaxis_title='Category',
+        title_x=0.5
+    )
+    return fig
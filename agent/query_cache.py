@@ -0,0 +1,99 @@
+"""
+Bounded LRU + TTL cache for answered queries.
+
+Entries are stored together with the dataset version they were computed
+against, per scope: the dataset they come from (e.g. a tenant). A lookup with
+a newer version drops every older entry of that scope, so answers never
+outlive the workbook they came from, while other scopes keep theirs.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    """Thread-safe LRU cache with an optional time-to-live and hit/miss counters."""
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (scope, key) -> (expires_at, value)
+        self._versions = {}  # scope -> dataset version of its entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _sync_version(self, scope, version):
+        if version != self._versions.get(scope):
+            stale = [entry_key for entry_key in self._entries if entry_key[0] == scope]
+            if stale:
+                self.invalidations += 1
+            for entry_key in stale:
+                del self._entries[entry_key]
+            self._versions[scope] = version
+
+    def get(self, key, version, scope=None):
+        """Returns the cached value for key at this dataset version of scope, or None."""
+        with self._lock:
+            self._sync_version(scope, version)
+            entry = self._entries.get((scope, key))
+            if entry is not None and (entry[0] is None or entry[0] > self._clock()):
+                self._entries.move_to_end((scope, key))
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[(scope, key)]
+            self.misses += 1
+            return None
+
+    def put(self, key, version, value, scope=None):
+        """Stores value for key, evicting the least recently used entries beyond maxsize."""
+        with self._lock:
+            self._sync_version(scope, version)
+            expires_at = self._clock() + self.ttl if self.ttl else None
+            self._entries[(scope, key)] = (expires_at, value)
+            self._entries.move_to_end((scope, key))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def carry_over(self, old_version, new_version, keep, scope=None) -> int:
+        """
+        Moves the entries of scope cached at old_version to new_version when
+        keep(key) is true and drops the rest. Used when a dataset grows by
+        appended months, which leaves most answers unchanged. Returns the
+        number kept.
+        """
+        with self._lock:
+            if self._versions.get(scope) != old_version:
+                self._sync_version(scope, new_version)
+                return 0
+            dropped = [entry_key for entry_key in self._entries if entry_key[0] == scope and not keep(entry_key[1])]
+            if dropped:
+                self.invalidations += 1
+            for entry_key in dropped:
+                del self._entries[entry_key]
+            self._versions[scope] = new_version
+            return sum(1 for entry_key in self._entries if entry_key[0] == scope)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def stats(self) -> dict:
+        """Returns the cache size and counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,97 @@
+"""
+Static chart rendering for reports.
+
+Starting kaleido's headless Chromium is the slow part of turning a Plotly
+figure into a PNG. ChartRenderer keeps one kaleido instance alive on a
+background event loop for the life of the process and renders a report's
+charts concurrently in its tabs, returning in-memory PNG bytes.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ChartRenderer:
+    """A long-lived kaleido instance that renders several figures at once."""
+
+    def __init__(self, tabs: int = 3, timeout: float = 90):
+        self.tabs = tabs
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._loop = None
+        self._kaleido = None
+        self._start_error = None
+
+    def _start(self):
+        import kaleido
+
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name="chart-renderer", daemon=True).start()
+        try:
+            browser = kaleido.Kaleido(n=self.tabs, timeout=self.timeout)
+            asyncio.run_coroutine_threadsafe(browser.__aenter__(), loop).result(self.timeout)
+        except BaseException:
+            loop.call_soon_threadsafe(loop.stop)
+            raise
+        self._loop, self._kaleido = loop, browser
+
+    def _ensure_started(self) -> bool:
+        """
+        Starts the shared kaleido instance; returns False if this kaleido has no
+        async API. A failed start (e.g. no Chrome) is remembered and reported
+        again by later renders without retrying, until close() is called.
+        """
+        with self._lock:
+            if self._start_error is not None:
+                raise RuntimeError(f"Chart renderer failed to start: {self._start_error!r}")
+            if self._kaleido is None:
+                import kaleido
+                if not hasattr(kaleido, 'Kaleido'):
+                    return False
+                try:
+                    self._start()
+                except Exception as e:
+                    self._start_error = e
+                    raise
+            return True
+
+    def render_pngs(self, figures, width: int = None, height: int = None, scale: float = None) -> list:
+        """Renders figures to PNG bytes concurrently, in the order given."""
+        opts = {key: value for key, value in (('format', 'png'), ('width', width), ('height', height), ('scale', scale))
+                if value is not None}
+        if not self._ensure_started():
+            # kaleido < 1.0 keeps its own renderer process; render from a few threads instead.
+            with ThreadPoolExecutor(max_workers=self.tabs) as pool:
+                return list(pool.map(lambda fig: fig.to_image(**opts), figures))
+
+        async def render_all():
+            return await asyncio.gather(*(self._kaleido.calc_fig(fig, opts=dict(opts)) for fig in figures))
+
+        future = asyncio.run_coroutine_threadsafe(render_all(), self._loop)
+        return future.result(self.timeout * max(1, len(figures)))
+
+    def close(self):
+        """Shuts the kaleido instance down; the next render starts a new one."""
+        with self._lock:
+            self._start_error = None
+            if self._kaleido is None:
+                return
+            future = asyncio.run_coroutine_threadsafe(self._kaleido.__aexit__(None, None, None), self._loop)
+            try:
+                future.result(self.timeout)
+            finally:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop, self._kaleido = None, None
+
+
+_RENDERER = None
+_RENDERER_LOCK = threading.Lock()
+
+
+def get_renderer() -> ChartRenderer:
+    """Returns the process-wide ChartRenderer, creating it on first use."""
+    global _RENDERER
+    with _RENDERER_LOCK:
+        if _RENDERER is None:
+            _RENDERER = ChartRenderer()
+        return _RENDERER
@@ -0,0 +1,209 @@
+"""
+Batch report generation: the monthly PDF pack for many months and entities.
+
+generate_reports() loads the dataset once and computes every report's
+figures in this process, where the per-entity P&L cubes are built once and
+shared. Only chart rendering and PDF layout, the CPU-heavy part, is farmed
+out to a process pool; each worker keeps its own kaleido renderer alive
+across the reports it builds.
+
+Each PDF is written atomically, so a batch that fails or is interrupted can
+simply be run again: reports already on disk, or already in the zip archive
+being written, are skipped.
+
+Usage:
+    python -m agent.report_batch reports/ [--months 12] [--all-entities] [--workers 4]
+    python -m agent.report_batch pack.zip --months 24 --entity EMEA
+"""
+import argparse
+import os
+import re
+import shutil
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from . import reporting, tools
+
+CONSOLIDATED = 'consolidated'
+
+
+def report_filename(period, entity: str = None) -> str:
+    """Returns the file name of one report, e.g. 'report_2025-06_emea.pdf'."""
+    return f"report_{period}_{_slug(entity)}.pdf"
+
+
+def _slug(entity: str = None) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', entity.lower()).strip('-') if entity else CONSOLIDATED
+
+
+def check_filenames(entities):
+    """
+    Raises ValueError when an entity's reports would overwrite another's: two
+    names that only differ in case or punctuation ('EMEA' and 'emea'), or a
+    name that reads as the consolidated report's. Names without a letter or
+    digit are rejected too.
+    """
+    seen = {CONSOLIDATED: None}
+    for entity in entities:
+        if entity is None:
+            continue
+        slug = _slug(entity)
+        if not slug:
+            raise ValueError(f"Entity {entity!r} has no letter or digit to name its reports by.")
+        if seen.get(slug, entity) != entity:
+            other = "the consolidated report" if seen[slug] is None else f"entity {seen[slug]!r}"
+            raise ValueError(f"Entity {entity!r} would write the same report files as {other}.")
+        seen[slug] = entity
+
+
+def plan_reports(actuals_df, months: int = 12, entities=(None,)) -> list:
+    """
+    Returns (period, entity) for the latest `months` months of the data and
+    each entity, oldest first. An entity of None is the consolidated report.
+    """
+    if months < 1:
+        raise ValueError(f"months must be at least 1, got {months}.")
+    periods = sorted(tools._as_periods(actuals_df['month_period']).unique())[-months:]
+    return [(period, entity) for period in periods for entity in entities]
+
+
+def _write_atomic(path: str, payload: bytes):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def _render_to_file(path: str, data: dict) -> int:
+    """Worker entry point: lays out one report and writes it to path."""
+    report = reporting.render_report(data)
+    _write_atomic(path, report)
+    return len(report)
+
+
+def generate_reports(output: str, months: int = 12, entities=(None,), workers: int = None,
+                     resume: bool = True, path: str = None, progress=None) -> dict:
+    """
+    Writes one PDF per (month, entity) to the output directory, or into a zip
+    archive when output ends in '.zip'. workers=0 renders in this process.
+
+    Returns a summary with the counts of reports written, skipped (already on
+    disk or in the zip) and failed, the error for each failure, and the throughput.
+    progress, if given, is called as progress(filename, error_or_None).
+    """
+    start = time.perf_counter()
+    check_filenames(entities)
+    to_zip = output.endswith('.zip')
+    # A zip is assembled from a staging directory, which is also what a resumed run picks up from.
+    out_dir = f"{output}.parts" if to_zip else output
+    os.makedirs(out_dir, exist_ok=True)
+    if to_zip and resume and os.path.exists(output):
+        # The staging directory is gone once a zip is written: resume from the zip itself.
+        _unzip_missing(output, out_dir)
+
+    frames = tools.load_data(path)
+    jobs, skipped, failed = {}, 0, {}
+    for period, entity in plan_reports(frames[0], months, entities):
+        name = report_filename(period, entity)
+        if resume and os.path.exists(os.path.join(out_dir, name)):
+            skipped += 1
+            continue
+        try:
+            jobs[name] = reporting.build_report_data(*frames, month=period, entity=entity)
+        except Exception as e:
+            failed[name] = str(e)
+            if progress:
+                progress(name, str(e))
+
+    written = 0
+
+    def record(name, error):
+        nonlocal written
+        if error is None:
+            written += 1
+        else:
+            failed[name] = str(error)
+        if progress:
+            progress(name, None if error is None else str(error))
+
+    if workers == 0:
+        for name, data in jobs.items():
+            try:
+                _render_to_file(os.path.join(out_dir, name), data)
+                record(name, None)
+            except Exception as e:
+                record(name, e)
+    elif jobs:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_render_to_file, os.path.join(out_dir, name), data): name
+                       for name, data in jobs.items()}
+            for future in as_completed(futures):
+                record(futures[future], future.exception())
+
+    if to_zip and not failed:
+        _zip_directory(out_dir, output)
+        shutil.rmtree(out_dir)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "output": output,
+        "written": written,
+        "skipped": skipped,
+        "failed": len(failed),
+        "errors": failed,
+        "seconds": elapsed,
+        "reports_per_second": written / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def _unzip_missing(zip_path: str, out_dir: str):
+    with zipfile.ZipFile(zip_path) as archive:
+        for name in archive.namelist():
+            if name.endswith('.pdf') and not os.path.exists(os.path.join(out_dir, name)):
+                _write_atomic(os.path.join(out_dir, name), archive.read(name))
+
+
+def _zip_directory(src_dir: str, zip_path: str):
+    tmp_path = f"{zip_path}.tmp-{os.getpid()}"
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name in sorted(os.listdir(src_dir)):
+            if name.endswith('.pdf'):
+                archive.write(os.path.join(src_dir, name), arcname=name)
+    os.replace(tmp_path, zip_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the monthly PDF report for many months and entities.")
+    parser.add_argument("output", help="Output directory, or a .zip file")
+    parser.add_argument("--months", type=int, default=12, help="Number of most recent months (default: 12)")
+    parser.add_argument("--entity", action="append", default=[], help="Entity to report on (repeatable; default: consolidated)")
+    parser.add_argument("--all-entities", action="store_true", help="Consolidated report plus one per entity")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count, 0 = in-process)")
+    parser.add_argument("--no-resume", action="store_true", help="Rebuild reports that already exist")
+    parser.add_argument("--source", default=None, help="Path to data.xlsx")
+    args = parser.parse_args(argv)
+    if args.months < 1:
+        parser.error("--months must be at least 1")
+
+    entities = args.entity or [None]
+    if args.all_entities:
+        actuals_df = tools.load_data(args.source)[0]
+        entities = [None] + sorted(actuals_df['entity'].dropna().unique())
+    try:
+        check_filenames(entities)
+    except ValueError as e:
+        parser.error(str(e))
+
+    def progress(name, error):
+        print(f"{'FAILED' if error else 'ok':6} {name}" + (f": {error}" if error else ""), file=sys.stderr)
+
+    summary = generate_reports(args.output, months=args.months, entities=entities, workers=args.workers,
+                               resume=not args.no_resume, path=args.source, progress=progress)
+    print(f"Wrote {summary['written']} reports ({summary['skipped']} skipped, {summary['failed']} failed) "
+          f"in {summary['seconds']:.1f}s, {summary['reports_per_second']:.2f} reports/s", file=sys.stderr)
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+On-disk, size-bounded cache for generated reports and chart images.
+
+Entries are content-addressed: the key is a SHA-256 of everything that
+determines the bytes (for a report, the dataset version, the report
+parameters and the template version), so an entry never has to be
+invalidated; it simply stops being asked for and ages out.
+
+The store is shared by every process on the host (concurrent Streamlit
+sessions, batch workers). Entries are written to a temporary file and
+renamed into place, so readers never see a partial file, and eviction runs
+under an exclusive file lock. Reads bump an entry's mtime, which is what
+least-recently-used eviction orders by.
+"""
+import hashlib
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: eviction is serialized within the process only.
+    fcntl = None
+
+DEFAULT_CACHE_DIR = os.path.join('.cache', 'reports')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def cache_key(*parts) -> str:
+    """Returns the hex SHA-256 of the JSON encoding of parts."""
+    encoded = json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class ReportCache:
+    """A directory of immutable blobs with LRU eviction by total size."""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str):
+        """Returns the cached bytes for key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                payload = f.read()
+            os.utime(path)
+        except FileNotFoundError:  # never written, or evicted by another process
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return payload
+
+    def put(self, key: str, payload: bytes):
+        """Stores payload under key, then evicts old entries beyond max_bytes."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def get_or_create(self, key: str, build) -> bytes:
+        """Returns the cached bytes for key, calling build() and storing its result on a miss."""
+        payload = self.get(key)
+        if payload is None:
+            payload = build()
+            self.put(key, payload)
+        return payload
+
+    def _entries(self):
+        """Yields (mtime, size, path) for every stored entry."""
+        with os.scandir(self.directory) as shards:
+            for shard in shards:
+                if not shard.is_dir():
+                    continue
+                with os.scandir(shard.path) as files:
+                    for entry in files:
+                        if '.tmp-' in entry.name:
+                            continue
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        yield stat.st_mtime, stat.st_size, entry.path
+
+    def _evict(self):
+        with self._lock, open(os.path.join(self.directory, '.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.evictions += 1
+
+    def clear(self):
+        """Deletes every stored entry."""
+        for _, _, path in list(self._entries()):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        """Returns the number and total size of stored entries plus this process's counters."""
+        entries = list(self._entries()) if os.path.isdir(self.directory) else []
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+_REPORT_CACHE = None
+_REPORT_CACHE_LOCK = threading.Lock()
+
+
+def get_report_cache() -> ReportCache:
+    """
+    Returns the process-wide ReportCache. Its directory and size limit come
+    from the REPORT_CACHE_DIR and REPORT_CACHE_MAX_BYTES environment variables.
+    """
+    global _REPORT_CACHE
+    directory = os.path.abspath(os.environ.get('REPORT_CACHE_DIR', DEFAULT_CACHE_DIR))
+    max_bytes = int(os.environ.get('REPORT_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+    with _REPORT_CACHE_LOCK:
+        if _REPORT_CACHE is None or (_REPORT_CACHE.directory, _REPORT_CACHE.max_bytes) != (directory, max_bytes):
+            _REPORT_CACHE = ReportCache(directory, max_bytes)
+        return _REPORT_CACHE
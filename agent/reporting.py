@@ -1,96 +1,200 @@
-import tempfile
-from fpdf import FPDF
+import hashlib
+import time
 import pandas as pd
-from . import tools, plotting
-
-class PDF(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 12)
-        self.cell(0, 10, 'Monthly Financial Report', 0, 1, 'C')
-        self.ln(10)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
-
-    def chapter_title(self, title):
-        self.set_font('Arial', 'B', 12)
-        self.cell(0, 10, title, 0, 1, 'L')
-        self.ln(5)
-
-    def chapter_body(self, body):
-        self.set_font('Arial', '', 12)
-        self.multi_cell(0, 10, body)
-        self.ln()
-
-    def add_chart(self, chart_path, width=190):
-        self.image(chart_path, x=-5, w=width)
-        self.ln(5)
-
-def generate_pdf_report() -> bytes:
+from . import instrumentation, tenants, tools, plotting
+from .rendering import get_renderer
+from .report_cache import cache_key, get_report_cache
+
+# Part of every cached report's key: bump it whenever the layout or the
+# charts change, so reports built by the old template are no longer served.
+REPORT_TEMPLATE_VERSION = 2
+
+# The stages of generate_pdf_report(), in order, with what each one does.
+REPORT_STAGES = {
+    'cache_lookup': "Checking the report cache",
+    'load_data': "Loading data",
+    'compute': "Computing figures",
+    'build_figures': "Building charts",
+    'render_charts': "Rendering charts",
+    'build_pdf': "Laying out the PDF",
+}
+
+
+class _Stopwatch:
     """
-    Generates a PDF report with key financial metrics.
+    Records the seconds between successive lap() calls into a dict and, if a
+    progress callback is given, reports progress(fraction_done, next_stage_description).
+    """
+
+    def __init__(self, timings: dict = None, progress=None):
+        self.timings = timings if timings is not None else {}
+        self.progress = progress
+        self._clock = time.perf_counter()
+
+    def lap(self, stage: str):
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0.0) + (now - self._clock)
+        instrumentation.record(f'report.{stage}', now - self._clock, self._clock)
+        self._clock = now
+        if self.progress is not None:
+            stages = list(REPORT_STAGES)
+            done = stages.index(stage) + 1
+            self.progress(done / len(stages), REPORT_STAGES[stages[done]] if done < len(stages) else "Done")
+
+
+def build_report_data(actuals_df, budget_df, cash_df, fx_df, month=None, entity: str = None) -> dict:
     """
-    # 1. Load Data
-    actuals_df, budget_df, cash_df, fx_df = tools.load_data()
-
-    # 2. Determine Latest Month
-    latest_month_period = actuals_df['month_period'].max()
-    latest_month_name = latest_month_period.strftime('%B')
-    latest_year = latest_month_period.year
-
-    # 3. Get Data for Reports
-    rev_data = tools.get_revenue_vs_budget(actuals_df, budget_df, fx_df, latest_month_name, latest_year)
-    opex_data = tools.get_opex_breakdown(actuals_df, fx_df, latest_month_name, latest_year)
-    cash_trend_data = tools.get_cash_trend(cash_df, last_n_months=6)
-
-    # 4. Generate Plots
-    rev_chart = plotting.plot_revenue_vs_budget(rev_data['actual'], rev_data['budget'], latest_month_name, latest_year)
-    opex_chart = plotting.plot_opex_breakdown(opex_data, latest_month_name, latest_year)
-    cash_chart = plotting.plot_cash_trend(cash_trend_data)
-
-    # 5. Save plots to temporary files
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as rev_img, \
-         tempfile.NamedTemporaryFile(delete=False, suffix=".png") as opex_img, \
-         tempfile.NamedTemporaryFile(delete=False, suffix=".png") as cash_img:
-        
-        rev_chart.write_image(rev_img.name)
-        opex_chart.write_image(opex_img.name)
-        cash_chart.write_image(cash_img.name)
-
-        # 6. Create PDF
-        pdf = PDF()
-        pdf.set_auto_page_break(auto=False, margin=15)
+    Computes everything a report shows for one month: revenue vs. budget, the
+    Opex breakdown and the 6-month cash trend ending that month. month is a
+    'YYYY-MM' string or Period and defaults to the latest month in the data;
+    entity restricts revenue and Opex to one entity (cash stays consolidated).
+    """
+    frames = (actuals_df, budget_df, cash_df, fx_df)
+    if entity is not None:
+        frames = tools.filter_entity(frames, entity)
+    actuals_df, budget_df, cash_df, fx_df = frames
+
+    if month is None:
+        period = tools._as_periods(actuals_df['month_period']).max()
+    else:
+        period = pd.Period(month, freq='M')
+    month_name, year = period.strftime('%B'), period.year
+
+    rev_data = tools.get_revenue_vs_budget(actuals_df, budget_df, fx_df, month_name, year)
+    if rev_data is None:
+        raise ValueError(f"No revenue data found for {month_name} {year}.")
+    opex_data = tools.get_opex_breakdown(actuals_df, fx_df, month_name, year)
+    if opex_data is None:
+        raise ValueError(f"No Opex data found for {month_name} {year}.")
+    cash_to_date = cash_df[tools._period_ordinals(cash_df['month_period']) <= period.ordinal]
+    cash_trend_data = tools.get_cash_trend(cash_to_date, last_n_months=6)
+
+    return {
+        "month_name": month_name,
+        "year": year,
+        "entity": entity,
+        "revenue": rev_data,
+        "opex": opex_data,
+        "cash_trend": cash_trend_data,
+    }
+
+
+def render_report(data: dict, timings: dict = None, progress=None, use_cache: bool = True) -> bytes:
+    """
+    Lays out the PDF for data from build_report_data(). Charts are rendered
+    concurrently by the shared kaleido renderer and passed to FPDF as
+    in-memory PNGs, so no temporary files are written.
+    """
+    stopwatch = _Stopwatch(timings, progress)
+    month_name, year = data['month_name'], data['year']
+    rev_data, opex_data = data['revenue'], data['opex']
+
+    # 1. Generate Plots
+    rev_chart = plotting.plot_revenue_vs_budget(rev_data['actual'], rev_data['budget'], month_name, year)
+    opex_chart = plotting.plot_opex_breakdown(opex_data, month_name, year)
+    cash_chart = plotting.plot_cash_trend(data['cash_trend'])
+    stopwatch.lap('build_figures')
+
+    # 2. Render plots to in-memory PNGs
+    rev_png, opex_png, cash_png = _render_charts([rev_chart, opex_chart, cash_chart], use_cache)
+    stopwatch.lap('render_charts')
+
+    # 3. Create PDF (fpdf is only imported once a report is built)
+    from .pdf_layout import PDF
+    pdf = PDF(subtitle=data.get('entity'))
+    pdf.set_auto_page_break(auto=False, margin=15)
+    pdf.add_page()
+
+    # Page 1: Revenue vs Budget
+    pdf.chapter_title(f"Revenue vs. Budget - {month_name} {year}")
+    actual_rev_m = rev_data['actual'] / 1_000_000
+    budget_rev_m = rev_data['budget'] / 1_000_000
+    variance_m = (rev_data['actual'] - rev_data['budget']) / 1_000_000
+    rev_text = (
+        f"- Actual Revenue: ${actual_rev_m:.2f}M\n"
+        f"- Budgeted Revenue: ${budget_rev_m:.2f}M\n"
+        f"- Variance: ${variance_m:.2f}M"
+    )
+    pdf.chapter_body(rev_text)
+    pdf.add_chart(rev_png, width=150)
+
+    # Opex Breakdown
+    # A4 height is 297mm. A chart + title needs ~100mm. Check if we need a new page.
+    if pdf.get_y() + 100 > 297 - 15:
+        pdf.add_page()
+    pdf.chapter_title(f"Opex Breakdown - {month_name} {year}")
+    total_opex_m = opex_data['Amount (USD)'].sum() / 1_000_000
+    opex_text = f"Total Opex for {month_name} {year} was ${total_opex_m:.2f}M."
+    pdf.chapter_body(opex_text)
+    pdf.add_chart(opex_png, width=120)
+
+    # Cash Trend
+    if pdf.get_y() + 100 > 297 - 15:
         pdf.add_page()
+    pdf.chapter_title("Cash Balance Trend (Consolidated)" if data.get('entity') else "Cash Balance Trend")
+    pdf.add_chart(cash_png, width=150)
+
+    report = bytes(pdf.output(dest='S'))
+    stopwatch.lap('build_pdf')
+    return report
+
+
+def _render_charts(figures, use_cache: bool = True) -> list:
+    """
+    Renders figures to PNG bytes, serving any chart whose figure JSON has been
+    rendered before from the report cache and rendering the rest in one batch.
+    """
+    if not use_cache:
+        return get_renderer().render_pngs(figures)
+    cache = get_report_cache()
+    keys = [cache_key('chart-png', hashlib.sha256(fig.to_json().encode()).hexdigest()) for fig in figures]
+    pngs = [cache.get(key) for key in keys]
+    missing = [i for i, png in enumerate(pngs) if png is None]
+    if missing:
+        rendered = get_renderer().render_pngs([figures[i] for i in missing])
+        for i, png in zip(missing, rendered):
+            cache.put(keys[i], png)
+            pngs[i] = png
+    return pngs
+
+
+@instrumentation.timed('report.generate_pdf_report')
+def generate_pdf_report(month=None, entity: str = None, timings: dict = None, use_cache: bool = True,
+                        progress=None, tenant: str = None) -> bytes:
+    """
+    Generates a PDF report with key financial metrics.
+
+    Defaults to the latest month for the whole group; pass month ('YYYY-MM')
+    and/or entity for another period or a single entity. If a dict is passed
+    as timings, it is filled with the seconds spent in each stage.
+
+    Reports are stored in the on-disk report cache under the dataset version,
+    the parameters and REPORT_TEMPLATE_VERSION, so repeating an export for
+    unchanged data is a file read. use_cache=False rebuilds the report and
+    its charts.
+
+    progress, if given, is called as progress(fraction_done, message) after
+    each stage in REPORT_STAGES.
+
+    tenant picks the dataset from the registry (see agent.tenants); None is DATA_FILE.
+    """
+    stopwatch = _Stopwatch(timings, progress)
+    key = None
+    if use_cache:
+        month_key = str(pd.Period(month, freq='M')) if month is not None else None
+        key = cache_key('report-pdf', tenants.dataset_version(tenant), month_key, entity, REPORT_TEMPLATE_VERSION)
+        report = get_report_cache().get(key)
+        stopwatch.lap('cache_lookup')
+        if report is not None:
+            if progress is not None:
+                progress(1.0, "Done")
+            return report
 
-        # Page 1: Revenue vs Budget
-        pdf.chapter_title(f"Revenue vs. Budget - {latest_month_name} {latest_year}")
-        actual_rev_m = rev_data['actual'] / 1_000_000
-        budget_rev_m = rev_data['budget'] / 1_000_000
-        variance_m = (rev_data['actual'] - rev_data['budget']) / 1_000_000
-        rev_text = (
-            f"- Actual Revenue: ${actual_rev_m:.2f}M\n"
-            f"- Budgeted Revenue: ${budget_rev_m:.2f}M\n"
-            f"- Variance: ${variance_m:.2f}M"
-        )
-        pdf.chapter_body(rev_text)
-        pdf.add_chart(rev_img.name, width=150)
-
-        # Opex Breakdown
-        # A4 height is 297mm. A chart + title needs ~100mm. Check if we need a new page.
-        if pdf.get_y() + 100 > 297 - 15:
-            pdf.add_page()
-        pdf.chapter_title(f"Opex Breakdown - {latest_month_name} {latest_year}")
-        total_opex_m = opex_data['Amount (USD)'].sum() / 1_000_000
-        opex_text = f"Total Opex for {latest_month_name} {latest_year} was ${total_opex_m:.2f}M."
-        pdf.chapter_body(opex_text)
-        pdf.add_chart(opex_img.name, width=120)
-
-        # Cash Trend
-        if pdf.get_y() + 100 > 297 - 15:
-            pdf.add_page()
-        pdf.chapter_title("Cash Balance Trend")
-        pdf.add_chart(cash_img.name, width=150)
-
-        return bytes(pdf.output(dest='S'))
+    frames = tenants.load_data(tenant)
+    stopwatch.lap('load_data')
+    data = build_report_data(*frames, month=month, entity=entity)
+    stopwatch.lap('compute')
+    report = render_report(data, timings=stopwatch.timings, progress=progress, use_cache=use_cache)
+    if key is not None:
+        get_report_cache().put(key, report)
+    return report
@@ -0,0 +1,240 @@
+"""
+Monte Carlo cash runway scenarios.
+
+get_cash_runway() gives one number: the latest cash balance over the average
+net burn of the last 3 months. simulate_runway() starts from the same monthly
+Income/Expenses summary and cash balance and simulates many possible futures
+under a Scenario:
+
+- burn growth: each path draws its own monthly growth rate for expenses;
+- revenue shocks: an immediate change in income, then a monthly random walk
+  around it;
+- FX swings: a monthly random walk in the USD value of the non-USD share of
+  income and expenses.
+
+All paths of a block are simulated at once as (paths x months) NumPy arrays.
+Blocks have their own seed, derived from the run's seed, so a run gives the
+same answer in-process or spread over a process pool (workers=...).
+
+The result gives the runway (months until cash first falls below zero)
+at each requested percentile and the cash balance bands for a fan chart.
+
+Usage:
+    python -m agent.runway [--paths 100000] [--months 60] [--burn-growth 0.01]
+        [--revenue-shock -0.2] [--fx-vol 0.05] [--workers 4]
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+import numpy as np
+import pandas as pd
+from . import tools
+from .instrumentation import timed
+
+DEFAULT_PATHS = 10_000
+DEFAULT_HORIZON = 60  # months
+MAX_HORIZON = 240  # months
+DEFAULT_PERCENTILES = (10, 50, 90)
+DEFAULT_SEED = 0
+# Paths simulated per block, the unit of work given to a worker. Every block's
+# month-end cash is kept for the bands, so memory still grows with paths x horizon.
+BLOCK_PATHS = 20_000
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """Assumptions for the simulated months. Rates are monthly; vols are standard deviations."""
+    burn_growth: float = 0.0       # mean monthly growth rate of expenses
+    burn_growth_vol: float = 0.01  # spread of that growth rate between paths
+    revenue_shock: float = 0.0     # immediate relative change in income, e.g. -0.2
+    revenue_vol: float = 0.05      # monthly volatility of income
+    fx_vol: float = 0.02           # monthly volatility of FX rates to USD
+
+
+def runway_inputs(cube: pd.DataFrame, cash_df: pd.DataFrame, last_n_months: int = 3) -> dict:
+    """
+    Returns the starting point of a simulation: the latest cash balance, the
+    average monthly Income and Expenses of the last N months (in USD) and the
+    share of each that is booked in another currency. Returns {"error": ...}
+    when there is not enough data, like get_cash_runway().
+    """
+    summary = tools._income_expenses(cube, last_n_months)
+    if summary.empty:
+        return {"error": "Not enough recent financial data to calculate net burn."}
+    if cash_df.empty:
+        return {"error": "No cash data available."}
+
+    latest_cash_month = cash_df['month_period'].max()
+    latest_cash = cash_df[cash_df['month_period'] == latest_cash_month]['cash_usd'].sum()
+
+    recent = tools._cube_periods(cube, summary.index.min())
+    recent = recent[recent['line'] != 'other']
+    amount_usd = recent['amount_usd'].to_numpy()
+    by_line = pd.DataFrame({
+        'line': np.where(recent['line'] == 'revenue', 'Income', 'Expenses'),
+        'total': amount_usd,
+        'foreign': np.where(recent['currency'].astype(str) != tools.BASE_CURRENCY, amount_usd, 0.0),
+    }).groupby('line').sum()
+
+    def foreign_share(line):
+        if line not in by_line.index or by_line.at[line, 'total'] == 0:
+            return 0.0
+        return float(by_line.at[line, 'foreign'] / by_line.at[line, 'total'])
+
+    return {
+        "latest_cash": float(latest_cash),
+        "latest_month": summary.index.max(),
+        "income": float(summary['Income'].mean()),
+        "expenses": float(summary['Expenses'].mean()),
+        "foreign_income": foreign_share('Income'),
+        "foreign_expenses": foreign_share('Expenses'),
+    }
+
+
+def _accumulate_months(values: np.ndarray) -> np.ndarray:
+    """
+    Running total down the months of a (months, paths) array, in place. One
+    vectorized add per month over all paths is several times faster than
+    np.cumsum along axis 0.
+    """
+    for month in range(1, len(values)):
+        values[month] += values[month - 1]
+    return values
+
+
+def _random_walk(rng, vol: float, months: np.ndarray, paths: int) -> np.ndarray:
+    """Log random walk with monthly volatility vol, drift-corrected so its expected level stays at 1."""
+    walk = _accumulate_months(rng.standard_normal(size=(len(months), paths)))
+    walk *= vol
+    walk -= 0.5 * vol ** 2 * months
+    return np.exp(walk, out=walk)
+
+
+def _simulate_block(inputs: dict, scenario: Scenario, paths: int, horizon: int, seed):
+    """
+    Simulates one block of paths. Returns (runway, cash): the runway of each
+    path in months (inf if cash lasts the whole horizon) and the month-end
+    cash balances, shaped (horizon, paths).
+    """
+    rng = np.random.default_rng(seed)
+    months = np.arange(1, horizon + 1)[:, np.newaxis]
+
+    growth = rng.normal(scenario.burn_growth, scenario.burn_growth_vol, size=paths)
+    expenses = inputs['expenses'] * np.power(1.0 + growth, months)
+    income = _random_walk(rng, scenario.revenue_vol, months, paths)
+    income *= inputs['income'] * (1.0 + scenario.revenue_shock)
+
+    fx_move = _random_walk(rng, scenario.fx_vol, months, paths)
+    fx_move -= 1.0
+    income *= 1.0 + inputs['foreign_income'] * fx_move
+    expenses *= 1.0 + inputs['foreign_expenses'] * fx_move
+
+    income -= expenses
+    cash = _accumulate_months(income)
+    cash += inputs['latest_cash']
+
+    # Runway: the first month ending below zero, interpolated within that month.
+    below = cash < 0
+    ran_out = below.any(axis=0)
+    first = below.argmax(axis=0)
+    columns = np.arange(paths)
+    before = np.where(first > 0, cash[first - 1, columns], inputs['latest_cash'])
+    after = cash[first, columns]
+    runway = np.where(ran_out, first + before / np.where(ran_out, before - after, 1.0), np.inf)
+    return runway, cash
+
+
+@timed('runway.simulate_runway')
+def _simulate(inputs: dict, scenario: Scenario = None, paths: int = DEFAULT_PATHS, horizon: int = DEFAULT_HORIZON,
+              percentiles=DEFAULT_PERCENTILES, seed: int = DEFAULT_SEED, workers: int = 0) -> dict:
+    if paths < 1:
+        raise ValueError(f"paths must be at least 1, got {paths}.")
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise ValueError(f"horizon must be between 1 and {MAX_HORIZON} months, got {horizon}.")
+    scenario = scenario or Scenario()
+    sizes = [BLOCK_PATHS] * (paths // BLOCK_PATHS) + ([paths % BLOCK_PATHS] if paths % BLOCK_PATHS else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(inputs, scenario, size, horizon, block_seed) for size, block_seed in zip(sizes, seeds)]
+
+    if workers == 0 or len(args) == 1:
+        blocks = [_simulate_block(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            blocks = list(executor.map(_simulate_block, *zip(*args)))
+    runway = np.concatenate([block[0] for block in blocks])
+    cash = np.concatenate([block[1] for block in blocks], axis=1)
+
+    # inverted_cdf picks actual path values, so 'never runs out' (inf) stays inf.
+    runway_bands = np.percentile(runway, percentiles, method='inverted_cdf')
+    cash_bands = np.percentile(cash, percentiles, axis=1)
+    future = pd.period_range(inputs['latest_month'] + 1, periods=horizon, freq='M')
+    bands = pd.DataFrame({f"p{p}": band for p, band in zip(percentiles, cash_bands)})
+    bands.insert(0, 'month_str', future.strftime('%b %Y'))
+
+    return {
+        "paths": paths,
+        "horizon": horizon,
+        "scenario": asdict(scenario),
+        "latest_cash": inputs['latest_cash'],
+        "avg_burn": inputs['expenses'] - inputs['income'],
+        "runway_percentiles": {p: float(value) for p, value in zip(percentiles, runway_bands)},
+        "prob_out_of_cash": float(np.isfinite(runway).mean()),
+        "cash_bands": bands,
+    }
+
+
+def _simulate_runway(cube: pd.DataFrame, cash_df: pd.DataFrame, scenario: Scenario = None, **options) -> dict:
+    inputs = runway_inputs(cube, cash_df)
+    if "error" in inputs:
+        return inputs
+    return _simulate(inputs, scenario, **options)
+
+
+def simulate_runway(actuals_df: pd.DataFrame, cash_df: pd.DataFrame, fx_df: pd.DataFrame, scenario: Scenario = None,
+                    paths: int = DEFAULT_PATHS, horizon: int = DEFAULT_HORIZON, percentiles=DEFAULT_PERCENTILES,
+                    seed: int = DEFAULT_SEED, workers: int = 0) -> dict:
+    """
+    Simulates `paths` cash paths over `horizon` months under scenario and
+    returns the runway percentiles (months; inf when at least that share of
+    paths still has cash at the horizon), the share of paths that run out of
+    cash within the horizon and 'cash_bands', a frame of the month-end cash
+    percentiles ('month_str', 'p10', 'p50', ...). workers > 0 spreads the
+    blocks of paths over that many processes (None: one per CPU); the result
+    does not depend on it. Returns {"error": ...} like get_cash_runway().
+    """
+    return _simulate_runway(tools._ledger_cube(actuals_df, fx_df), cash_df, scenario, paths=paths, horizon=horizon,
+                            percentiles=percentiles, seed=seed, workers=workers)
+
+
+def main(argv=None):
+    defaults = Scenario()
+    parser = argparse.ArgumentParser(description="Simulate cash runway scenarios for the dataset.")
+    parser.add_argument("--paths", type=int, default=DEFAULT_PATHS)
+    parser.add_argument("--months", type=int, default=DEFAULT_HORIZON, help="Horizon in months")
+    parser.add_argument("--burn-growth", type=float, default=defaults.burn_growth, help="Mean monthly growth of expenses")
+    parser.add_argument("--burn-growth-vol", type=float, default=defaults.burn_growth_vol)
+    parser.add_argument("--revenue-shock", type=float, default=defaults.revenue_shock, help="Immediate change in income, e.g. -0.2")
+    parser.add_argument("--revenue-vol", type=float, default=defaults.revenue_vol)
+    parser.add_argument("--fx-vol", type=float, default=defaults.fx_vol)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: 0 = in-process)")
+    args = parser.parse_args(argv)
+    if not 1 <= args.months <= MAX_HORIZON:
+        parser.error(f"--months must be between 1 and {MAX_HORIZON}")
+
+    scenario = Scenario(args.burn_growth, args.burn_growth_vol, args.revenue_shock, args.revenue_vol, args.fx_vol)
+    actuals_df, _, cash_df, fx_df = tools.load_data()
+    start = time.perf_counter()
+    result = simulate_runway(actuals_df, cash_df, fx_df, scenario, paths=args.paths, horizon=args.months,
+                             seed=args.seed, workers=args.workers)
+    if "error" in result:
+        parser.exit(1, result["error"] + "\n")
+    print(f"{result['paths']:,} paths over {result['horizon']} months in {time.perf_counter() - start:.2f}s")
+    for p, months in result["runway_percentiles"].items():
+        print(f"  P{p} runway: {months:.1f} months")
+    print(f"  Out of cash within {result['horizon']} months: {result['prob_out_of_cash']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Headless HTTP API for CFO Copilot.
+
+Endpoints:
+    GET  /health                       liveness, dataset version and cache stats
+    POST /query   {"query": "...", "include_chart": true, "tenant": "acme"}
+    POST /batch   {"queries": ["...", ...], "include_charts": false, "tenant": "acme"}
+    GET  /report  ?month=YYYY-MM&entity=EMEA&tenant=acme   the PDF report
+    GET  /metrics                      stage latency histograms (Prometheus text;
+                                       start with CFO_INSTRUMENTATION=1)
+
+/query and /batch return the same JSON records as `python -m agent.batch`,
+with charts as Plotly JSON. The dataset is loaded and its monthly cubes are
+built when the server starts. Request handlers run the pandas work on a
+bounded thread pool, so every worker shares that one in-memory dataset and
+the answer caches while the event loop keeps accepting requests. "tenant"
+picks another company's dataset from the registry (see agent.tenants); those
+are loaded on their first request. Every
+response carries an X-Request-ID (echoed when the client sent one) and an
+X-Response-Time-Ms header.
+
+Usage:
+    python -m agent.server [--host 127.0.0.1] [--port 8000] [--workers 4]
+"""
+import argparse
+import asyncio
+import contextlib
+import functools
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+from . import backends, batch, instrumentation, planner, reporting, tenants, tools
+from .parser import parse_query
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+MAX_BATCH_QUERIES = 1000
+
+
+class RequestContextMiddleware:
+    """Adds X-Request-ID and X-Response-Time-Ms headers to every HTTP response."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = dict(scope["headers"]).get(b"x-request-id") or uuid.uuid4().hex.encode()
+        start = time.perf_counter()
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id),
+                    (b"x-response-time-ms", f"{elapsed_ms:.2f}".encode()),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+def _preload():
+    """Loads the dataset and builds the shared monthly cubes (or opens the SQLite backend)."""
+    backends.get_backend().preload()
+
+
+async def _run(request: Request, fn, *args, **kwargs):
+    """Runs blocking work on the app's worker pool."""
+    executor = request.app.state.executor
+    return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+
+async def _json_body(request: Request) -> dict:
+    try:
+        body = await request.json()
+    except ValueError:
+        body = None
+    return body if isinstance(body, dict) else None
+
+
+def _error(status_code: int, message: str) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+def _answer_query(query: str, include_chart: bool, tenant: str = None) -> dict:
+    result = planner.route_query(query, include_chart=include_chart, tenant=tenant)
+    return batch.to_json_record(0, query, {**result, "intent": parse_query(query)})
+
+
+def _answer_batch(queries, include_charts: bool, tenant: str = None) -> list:
+    return [batch.to_json_record(index, query, result)
+            for index, (query, result) in enumerate(batch.iter_route_queries(queries, include_charts, tenant))]
+
+
+def _tenant(value):
+    """Returns a request's tenant, or raises ValueError when it is not a registered one."""
+    if value is not None:
+        tenants.data_file(value)
+    return value
+
+
+async def health(request: Request) -> JSONResponse:
+    try:
+        version = tools.dataset_version()
+    except Exception as e:
+        return _error(503, f"Error loading data: {e}")
+    return JSONResponse({"status": "ok", "dataset_version": version, "query_cache": planner.QUERY_CACHE.stats(),
+                         "tenants": tenants.get_registry().usage()})
+
+
+async def query(request: Request) -> JSONResponse:
+    body = await _json_body(request)
+    if body is None or not isinstance(body.get("query"), str) or not body["query"].strip():
+        return _error(400, 'Expected a JSON body like {"query": "..."}.')
+    try:
+        tenant = _tenant(body.get("tenant"))
+    except (TypeError, ValueError) as e:
+        return _error(400, str(e))
+    record = await _run(request, _answer_query, body["query"], bool(body.get("include_chart", True)), tenant)
+    record.pop("index")
+    return JSONResponse(record)
+
+
+async def batch_queries(request: Request) -> JSONResponse:
+    body = await _json_body(request)
+    queries = body.get("queries") if body is not None else None
+    if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+        return _error(400, 'Expected a JSON body like {"queries": ["...", ...]}.')
+    if len(queries) > MAX_BATCH_QUERIES:
+        return _error(413, f"At most {MAX_BATCH_QUERIES} queries per batch.")
+    try:
+        tenant = _tenant(body.get("tenant"))
+    except (TypeError, ValueError) as e:
+        return _error(400, str(e))
+    records = await _run(request, _answer_batch, queries, bool(body.get("include_charts", False)), tenant)
+    return JSONResponse({"results": records})
+
+
+async def report(request: Request) -> Response:
+    month = request.query_params.get("month") or None
+    entity = request.query_params.get("entity") or None
+    tenant = request.query_params.get("tenant") or None
+    try:
+        pdf = await _run(request, reporting.generate_pdf_report, month=month, entity=entity, tenant=tenant)
+    except ValueError as e:
+        return _error(400, str(e))
+    except Exception as e:
+        return _error(500, f"Could not generate the report: {e}")
+    filename = f"financial_report_{month or 'latest'}.pdf"
+    return Response(pdf, media_type="application/pdf",
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+async def metrics(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(instrumentation.prometheus_text(), media_type="text/plain; version=0.0.4")
+
+
+def create_app(workers: int = DEFAULT_WORKERS, preload: bool = True) -> Starlette:
+    """Builds the ASGI app with its own pool of `workers` threads."""
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        app.state.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+        if preload:
+            # A missing or broken data file is reported per request rather than stopping the server.
+            with contextlib.suppress(Exception):
+                await asyncio.get_running_loop().run_in_executor(app.state.executor, _preload)
+        try:
+            yield
+        finally:
+            app.state.executor.shutdown(wait=False, cancel_futures=True)
+
+    app = Starlette(
+        routes=[
+            Route("/health", health, methods=["GET"]),
+            Route("/query", query, methods=["POST"]),
+            Route("/batch", batch_queries, methods=["POST"]),
+            Route("/report", report, methods=["GET"]),
+            Route("/metrics", metrics, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+    app.add_middleware(RequestContextMiddleware)
+    return app
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the CFO Copilot HTTP API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Threads for pandas and report work")
+    args = parser.parse_args(argv)
+    uvicorn.run(create_app(workers=args.workers), host=args.host, port=args.port, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Columnar snapshots of the Excel workbook.
+
+Parsing data.xlsx through openpyxl is the slowest part of a cold start. This
+module compiles the workbook once into one uncompressed Arrow (Feather v2) file
+per sheet plus a manifest recording the source file's hash. Snapshot files are
+memory-mapped on load, so worker processes on the same host share the pages
+instead of each holding a private copy.
+
+A snapshot written straight from frames (write_snapshot() without a source
+workbook) is a dataset of its own: point load_data() or DATA_FILE at its
+directory. append_snapshot() adds months to such a dataset as extra part
+files (see agent.ingest), so the history is never rewritten.
+
+Usage:
+    python -m agent.snapshot [fixtures/data.xlsx] [--out DIR]
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+import pandas as pd
+from . import tools
+from .instrumentation import timed
+
+SNAPSHOT_FORMAT = 1
+MANIFEST_NAME = "manifest.json"
+SHEETS = tools.SHEETS
+CATEGORY_COLUMNS = ('entity', 'account_category', 'currency')
+
+
+def default_snapshot_dir(source_path: str) -> str:
+    """Returns the snapshot directory that sits next to a workbook (data.xlsx -> data.snapshot/)."""
+    stem, _ = os.path.splitext(os.path.abspath(source_path))
+    return f"{stem}.snapshot"
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _to_categories(df: pd.DataFrame) -> pd.DataFrame:
+    """Stores the low-cardinality string dimensions as categoricals (dictionary-encoded in Arrow)."""
+    columns = {col: df[col].astype('category') for col in CATEGORY_COLUMNS if col in df.columns}
+    return df.assign(**columns)
+
+
+def write_snapshot(frames, snapshot_dir: str, source_path: str = None) -> dict:
+    """
+    Writes (actuals_df, budget_df, cash_df, fx_df), as returned by load_data(),
+    as one Arrow file per sheet plus a manifest. With source_path the manifest
+    records the workbook the frames came from, so load_if_fresh() can tell when
+    it has changed. Without one the snapshot is a dataset in its own right:
+    pass its directory to load_data(). Returns the manifest.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    files = {}
+    for name, df in zip(SHEETS, frames):
+        file_name = f"{name}.arrow"
+        _write_table(df, os.path.join(snapshot_dir, file_name))
+        files[name] = file_name
+
+    manifest = {"format": SNAPSHOT_FORMAT, "source_path": None, "sheets": files}
+    if source_path is not None:
+        stat = os.stat(source_path)
+        manifest.update({
+            "source_path": os.path.abspath(source_path),
+            "source_sha256": _sha256(source_path),
+            "source_size": stat.st_size,
+            "source_mtime_ns": stat.st_mtime_ns,
+        })
+    # Write the manifest last: a half-written snapshot never looks fresh.
+    _write_manifest(snapshot_dir, manifest)
+    return manifest
+
+
+def _write_table(df: pd.DataFrame, path: str):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    table = pa.Table.from_pandas(_to_categories(df), preserve_index=False)
+    # Uncompressed so the file can be memory-mapped without a decode step. The
+    # new file replaces the old one under a new inode, so frames still mapped
+    # onto the old file keep reading the old data.
+    tmp_path = path + ".tmp"
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+
+
+def _write_manifest(snapshot_dir: str, manifest: dict):
+    tmp_path = os.path.join(snapshot_dir, MANIFEST_NAME + ".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(snapshot_dir, MANIFEST_NAME))
+
+
+def append_snapshot(snapshot_dir: str, delta: dict) -> dict:
+    """
+    Appends rows to a snapshot: delta maps sheet names to frames holding the
+    new rows. Each sheet's rows go to a new part file and the manifest is
+    rewritten last, so readers see either all of the append or none of it.
+    The append makes the snapshot the dataset of record, so any link to a
+    source workbook is dropped. Returns the manifest.
+    """
+    manifest = read_manifest(snapshot_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No snapshot manifest found in {snapshot_dir}.")
+    appends = manifest.setdefault("appends", [])
+    files = {}
+    for name, df in delta.items():
+        file_name = f"{name}.{len(appends) + 1}.arrow"
+        _write_table(df, os.path.join(snapshot_dir, file_name))
+        files[name] = file_name
+    appends.append({"sheets": files, "appended_at": time.strftime('%Y-%m-%dT%H:%M:%S')})
+    for key in ("source_sha256", "source_size", "source_mtime_ns"):
+        manifest.pop(key, None)
+    manifest["source_path"] = None
+    _write_manifest(snapshot_dir, manifest)
+    return manifest
+
+
+def compile_snapshot(source_path: str = None, snapshot_dir: str = None) -> dict:
+    """
+    Parses the workbook and writes one Arrow file per sheet plus a manifest.
+    The stored frames already hold month_period, the zero-filled amount columns
+    and categorical dimensions. Returns the manifest.
+    """
+    source_path = source_path or tools.DATA_FILE
+    snapshot_dir = snapshot_dir or default_snapshot_dir(source_path)
+    frames = tools._read_workbook(source_path)
+    return write_snapshot(frames, snapshot_dir, source_path)
+
+
+def read_manifest(snapshot_dir: str):
+    """Returns the snapshot manifest, or None if the directory holds no snapshot."""
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def is_fresh(manifest: dict, source_path: str) -> bool:
+    """
+    Checks whether a manifest still describes the source workbook.
+    Matching size and mtime are trusted as-is; if only the mtime moved, the file
+    is re-hashed so a touched-but-unchanged workbook keeps its snapshot.
+    """
+    if not manifest or manifest.get("format") != SNAPSHOT_FORMAT or manifest.get("source_path") is None:
+        return False
+    stat = os.stat(source_path)
+    if stat.st_size != manifest.get("source_size"):
+        return False
+    if stat.st_mtime_ns == manifest.get("source_mtime_ns"):
+        return True
+    return _sha256(source_path) == manifest.get("source_sha256")
+
+
+@timed('snapshot.load_snapshot')
+def load_snapshot(snapshot_dir: str):
+    """
+    Memory-maps the snapshot files and returns (actuals_df, budget_df, cash_df, fx_df).
+    Sheets with appended parts are concatenated after reading.
+    """
+    import pyarrow.feather as feather
+
+    manifest = read_manifest(snapshot_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No snapshot manifest found in {snapshot_dir}.")
+    frames = []
+    for name in SHEETS:
+        files = [manifest["sheets"][name]] + [
+            part["sheets"][name] for part in manifest.get("appends", []) if name in part["sheets"]]
+        # split_blocks keeps numeric columns as zero-copy views onto the mapped file.
+        parts = [feather.read_table(os.path.join(snapshot_dir, file_name), memory_map=True).to_pandas(split_blocks=True)
+                 for file_name in files]
+        frames.append(parts[0] if len(parts) == 1 else tools.concat_rows(parts))
+    return tuple(frames)
+
+
+def load_if_fresh(source_path: str, snapshot_dir: str = None):
+    """Returns the snapshot frames for a workbook, or None when no fresh snapshot exists."""
+    snapshot_dir = snapshot_dir or default_snapshot_dir(source_path)
+    manifest = read_manifest(snapshot_dir)
+    if manifest is None or not is_fresh(manifest, source_path):
+        return None
+    try:
+        return load_snapshot(snapshot_dir)
+    except ImportError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the Excel workbook into a columnar snapshot.")
+    parser.add_argument("source", nargs="?", default=tools.DATA_FILE, help="Path to data.xlsx")
+    parser.add_argument("--out", default=None, help="Snapshot directory (default: next to the workbook)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    compile_snapshot(args.source, args.out)
+    compile_s = time.perf_counter() - start
+
+    snapshot_dir = args.out or default_snapshot_dir(args.source)
+    start = time.perf_counter()
+    load_snapshot(snapshot_dir)
+    load_s = time.perf_counter() - start
+
+    print(f"Snapshot written to {snapshot_dir} in {compile_s:.2f}s (load: {load_s * 1000:.1f}ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+SQLite storage backend.
+
+write_database() stores a dataset in a single SQLite file: the actuals and
+budget ledgers indexed on (month, category, currency), cash indexed on month
+and FX rates keyed on (month, currency). Months are stored as period ordinals
+and category is the lower-cased account_category, so the tools' filters are
+plain index range scans.
+
+SQLiteBackend answers the same questions as the pandas tools without loading
+the ledgers: each query pushes its month and category filter, the FX join and
+the aggregation down to SQLite, and only the resulting monthly cube rows (a
+few dozen) come back to pandas, where the tools' own cube-level code finishes
+the answer. Connections are read-only and memory-map the file, so any number
+of worker processes share one on-disk dataset through the page cache.
+
+load_data() also accepts a database file, so every other feature (reports,
+batches) keeps working from it through the pandas path.
+
+Usage:
+    python -m agent.sql_backend [fixtures/data.xlsx] --out data.sqlite
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+import weakref
+import numpy as np
+import pandas as pd
+from . import runway, timeseries, tools, variance
+
+SUFFIXES = ('.sqlite', '.sqlite3', '.db')
+MMAP_SIZE = 1 << 30
+
+# Each thread's own connections: path -> (weak reference to the backend, connection).
+# A thread closes its connection to a replaced or closed backend itself, the next
+# time it opens one, so no connection is closed under another thread's query.
+_THREAD_CONNS = threading.local()
+
+# Amount columns have no declared type, so integers and floats are stored as
+# given and sum exactly like the pandas columns they came from.
+_SCHEMA = """
+CREATE TABLE actuals (month INTEGER NOT NULL, entity TEXT, account_category TEXT NOT NULL,
+                      category TEXT NOT NULL, amount NOT NULL, currency TEXT);
+CREATE TABLE budget (month INTEGER NOT NULL, entity TEXT, account_category TEXT NOT NULL,
+                     category TEXT NOT NULL, amount NOT NULL, currency TEXT);
+CREATE TABLE cash (month INTEGER NOT NULL, entity TEXT, cash_usd NOT NULL);
+CREATE TABLE fx (month INTEGER NOT NULL, currency TEXT NOT NULL, rate_to_usd REAL NOT NULL,
+                 PRIMARY KEY (month, currency)) WITHOUT ROWID;
+-- The display label of each category: its first spelling in the ledger.
+CREATE TABLE category_labels (sheet TEXT NOT NULL, category TEXT NOT NULL, label TEXT NOT NULL,
+                              PRIMARY KEY (sheet, category)) WITHOUT ROWID;
+"""
+# A blank ledger currency is stored as NULL: it matches no FX rate, so like in
+# the pandas tools those lines convert at 1.0 and are reported as missing a rate.
+# amount rides along in the ledger indexes so the cube queries never touch the tables.
+_INDEXES = """
+CREATE INDEX actuals_month_category_currency ON actuals (month, category, currency, amount);
+CREATE INDEX budget_month_category_currency ON budget (month, category, currency, amount);
+CREATE INDEX cash_month ON cash (month);
+"""
+
+# One cube row per (month, category, currency), in the tools' cube order with a
+# blank currency last. The lines are summed from the covering index first;
+# labels and rates are joined per cube row.
+_CUBE_QUERY = """
+SELECT c.month, c.category, c.currency, labels.label, c.amount, fx.rate_to_usd
+FROM (SELECT l.month, l.category, l.currency, SUM(l.amount) AS amount
+      FROM {sheet} AS l
+      WHERE {where}
+      GROUP BY l.month, l.category, l.currency) AS c
+JOIN category_labels AS labels ON labels.sheet = '{sheet}' AND labels.category = c.category
+LEFT JOIN fx ON fx.month = c.month AND fx.currency = c.currency
+ORDER BY c.month, c.category, c.currency IS NULL, c.currency
+"""
+
+# Ledger totals per (month, spelling of the category, entity, currency), converted
+# per row like variance.ledger_cells() does.
+_CELLS_QUERY = """
+SELECT c.month, c.category, labels.label, c.entity, c.amount, fx.rate_to_usd
+FROM (SELECT month, account_category, category, entity, currency, SUM(amount) AS amount
+      FROM {sheet}
+      GROUP BY month, account_category, entity, currency) AS c
+JOIN category_labels AS labels ON labels.sheet = '{sheet}' AND labels.category = c.category
+LEFT JOIN fx ON fx.month = c.month AND fx.currency = c.currency
+"""
+
+# Ledger (month, currency) pairs with no FX rate, which the cube queries convert at 1.0.
+_MISSING_FX_QUERY = """
+SELECT l.month, l.currency
+FROM (SELECT month, currency FROM actuals UNION SELECT month, currency FROM budget) AS l
+LEFT JOIN fx ON fx.month = l.month AND fx.currency = l.currency
+WHERE fx.rate_to_usd IS NULL AND (l.currency IS NULL OR l.currency != ?)
+ORDER BY l.month, l.currency IS NULL, l.currency
+"""
+
+
+def is_database(path: str) -> bool:
+    return os.path.splitext(str(path))[1].lower() in SUFFIXES
+
+
+def _ledger_rows(df: pd.DataFrame):
+    if 'currency' in df.columns:
+        currency = df['currency'].astype(object).where(df['currency'].notna(), None)
+    else:
+        currency = pd.Series(tools.BASE_CURRENCY, index=df.index)
+    category = df['account_category'].astype(str)
+    entity = df['entity'].astype(str) if 'entity' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    return zip(tools._period_ordinals(df['month_period']).tolist(), entity.tolist(), category.tolist(),
+               category.str.lower().tolist(), df['amount'].tolist(), currency.tolist())
+
+
+def write_database(frames, path: str) -> str:
+    """
+    Writes (actuals_df, budget_df, cash_df, fx_df), as returned by load_data(),
+    to a new SQLite file at path, replacing any existing file atomically.
+    Returns path.
+    """
+    actuals_df, budget_df, cash_df, fx_df = frames
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;" + _SCHEMA)
+        with conn:
+            for sheet, df in (('actuals', actuals_df), ('budget', budget_df)):
+                conn.executemany(f"INSERT INTO {sheet} VALUES (?, ?, ?, ?, ?, ?)", _ledger_rows(df))
+                labels = df['account_category'].astype(str)
+                first = labels.groupby(labels.str.lower(), sort=False).first()
+                conn.executemany("INSERT INTO category_labels VALUES (?, ?, ?)",
+                                 ((sheet, category, label) for category, label in first.items()))
+            conn.executemany("INSERT INTO cash VALUES (?, ?, ?)", zip(
+                tools._period_ordinals(cash_df['month_period']).tolist(),
+                cash_df['entity'].astype(str).tolist() if 'entity' in cash_df.columns else [None] * len(cash_df),
+                cash_df['cash_usd'].tolist()))
+            # Like tools.FxTable, the last rate given for a month and currency wins.
+            conn.executemany("INSERT OR REPLACE INTO fx VALUES (?, ?, ?)", zip(
+                tools._period_ordinals(fx_df['month_period']).tolist(),
+                fx_df['currency'].astype(str).tolist(), fx_df['rate_to_usd'].astype(float).tolist()))
+        conn.executescript(_INDEXES + "ANALYZE;")
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_frames(path: str):
+    """Reads a database written by write_database() back into load_data()-shaped frames."""
+    conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        frames = []
+        for sheet, columns, order in (('actuals', 'entity, account_category, amount, currency', 'rowid'),
+                                      ('budget', 'entity, account_category, amount, currency', 'rowid'),
+                                      ('cash', 'entity, cash_usd', 'rowid'),
+                                      ('fx', 'currency, rate_to_usd', 'month, currency')):
+            df = pd.read_sql_query(f"SELECT month, {columns} FROM {sheet} ORDER BY {order}", conn)
+            periods = tools._as_periods(df['month'].to_numpy())
+            df['month'] = periods.strftime('%Y-%m')
+            df['month_period'] = periods
+            frames.append(df)
+        return tuple(frames)
+    finally:
+        conn.close()
+
+
+class SQLiteBackend:
+    """Answers the tool questions with SQL queries against a database file."""
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self._derived = {}  # name -> structure built once from whole-ledger queries
+        self._derived_lock = threading.Lock()
+        self._closed = False
+
+    def _conn(self) -> sqlite3.Connection:
+        conns = getattr(_THREAD_CONNS, 'conns', None)
+        if conns is None:
+            conns = _THREAD_CONNS.conns = {}
+        entry = conns.get(self.path)
+        if entry is not None and entry[0]() is self:
+            return entry[1]
+        # This thread's connections to backends since replaced or closed are idle now.
+        for path, (ref, conn) in list(conns.items()):
+            backend = ref()
+            if path == self.path or backend is None or backend._closed:
+                del conns[path]
+                conn.close()
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        conns[self.path] = (weakref.ref(self), conn)
+        return conn
+
+    def _scalar(self, query: str, params=()):
+        return self._conn().execute(query, params).fetchone()[0]
+
+    def _latest_month(self, sheet: str = 'actuals'):
+        return self._scalar(f"SELECT MAX(month) FROM {sheet}")
+
+    def _cube(self, sheet: str, where: str, params=()) -> pd.DataFrame:
+        """Returns the ledger cube rows matching where, shaped like tools.build_ledger_cube()."""
+        rows = self._conn().execute(_CUBE_QUERY.format(sheet=sheet, where=where), params).fetchall()
+        months, categories, currencies, labels, amounts, rates = (list(col) for col in zip(*rows)) if rows else [[]] * 6
+        categories, currencies = pd.Series(categories, dtype=str), pd.Series(currencies, dtype=str)
+        rates = np.array(rates, dtype=float)
+        amounts = np.array(amounts) if amounts else np.zeros(0, dtype=np.int64)
+        index = pd.MultiIndex.from_arrays(
+            [tools._as_periods(np.array(months, dtype=np.int64)), categories, currencies],
+            names=['month_period', 'category', 'currency'])
+        return pd.DataFrame({
+            'label': pd.array(labels, dtype=str),
+            'line': tools._pnl_line(categories),
+            'amount': amounts,
+            'amount_usd': np.asarray(amounts, dtype=float) / np.where(np.isnan(rates), 1.0, rates),
+            'fx_missing': np.isnan(rates) & (currencies != tools.BASE_CURRENCY).to_numpy(),
+        }, index=index)
+
+    def latest_period(self):
+        latest = self._latest_month()
+        return tools._as_periods(np.array([latest]))[0] if latest is not None else None
+
+    def latest_year(self):
+        latest = self.latest_period()
+        return latest.year if latest is not None else None
+
+    def get_revenue_vs_budget(self, month_name: str, year: int):
+        period = tools._target_period(month_name, year)
+        where = "l.month = ? AND l.category = 'revenue'"
+        return tools._revenue_vs_budget(self._cube('actuals', where, (period.ordinal,)),
+                                        self._cube('budget', where, (period.ordinal,)), period)
+
+    def get_financial_metric_trend(self, metric: str, last_n_months: int):
+        # The cube of the last N months has the same latest month as the whole ledger.
+        start = (self._latest_month() or 0) - last_n_months + 1
+        return tools._metric_trend(self._cube('actuals', "l.month >= ?", (start,)), metric, last_n_months)
+
+    def get_opex_breakdown(self, month_name: str, year: int):
+        period = tools._target_period(month_name, year)
+        # A range on the indexed category column: every 'opex:...' sorts before 'opex;'.
+        cube = self._cube('actuals', "l.month = ? AND l.category >= 'opex:' AND l.category < 'opex;'",
+                          (period.ordinal,))
+        return tools._opex_breakdown(cube, period)
+
+    def _memo(self, name: str, build):
+        with self._derived_lock:
+            if name not in self._derived:
+                self._derived[name] = build()
+            return self._derived[name]
+
+    def _indexes(self):
+        """Prefix indexes of actuals and budget, built once from the whole-ledger cubes."""
+        return self._memo('prefix_indexes', lambda: (timeseries.PrefixIndex(self._cube('actuals', "1")),
+                                                     timeseries.PrefixIndex(self._cube('budget', "1"))))
+
+    def _cells(self, sheet: str) -> pd.DataFrame:
+        """Returns the sheet's USD totals per (month, category, entity), shaped like variance.ledger_cells()."""
+        rows = self._conn().execute(_CELLS_QUERY.format(sheet=sheet)).fetchall()
+        months, categories, labels, entities, amounts, rates = (list(col) for col in zip(*rows)) if rows else [[]] * 6
+        rates = np.array(rates, dtype=float)
+        return pd.DataFrame({
+            'month_ordinal': np.array(months, dtype=np.int64),
+            'category': pd.array(categories, dtype=object),
+            'label': pd.array(labels, dtype=object),
+            'entity': [variance.CONSOLIDATED if entity is None else entity for entity in entities],
+            # Missing rates convert at 1.0, as in the pandas tools.
+            'amount_usd': np.asarray(amounts, dtype=float) / np.where(np.isnan(rates), 1.0, rates),
+        })
+
+    def _variance_matrix(self):
+        return self._memo('variance_matrix', lambda: variance.VarianceMatrix(self._cells('actuals'), self._cells('budget')))
+
+    def get_variance_report(self, start=None, end=None, top_n: int = variance.DEFAULT_TOP_N):
+        return variance._variance_report(self._variance_matrix(), start, end, top_n)
+
+    def missing_fx_rates(self) -> pd.DataFrame:
+        def build():
+            rows = self._conn().execute(_MISSING_FX_QUERY, (tools.BASE_CURRENCY,)).fetchall()
+            months, currencies = (list(col) for col in zip(*rows)) if rows else ([], [])
+            return pd.DataFrame({'month_period': tools._as_periods(np.array(months, dtype=np.int64)),
+                                 'currency': pd.array(currencies, dtype=str)})
+        return self._memo('missing_fx_rates', build)
+
+    def get_range_total(self, metric: str, start, end):
+        return timeseries._range_total(*self._indexes(), metric, start, end)
+
+    def get_rolling_metric(self, metric: str, window: int, last_n_months: int):
+        return timeseries._rolling_metric(self._indexes()[0], metric, window, last_n_months)
+
+    def get_opex_breakdown_range(self, start, end):
+        return timeseries._opex_breakdown_range(self._indexes()[0], start, end)
+
+    def get_cash_runway(self):
+        return tools._cash_runway(*self._runway_data())
+
+    def get_runway_scenarios(self, scenario: runway.Scenario = None, **options):
+        return runway._simulate_runway(*self._runway_data(), scenario, **options)
+
+    def _runway_data(self):
+        """The cube of the last 3 months and the latest cash balance."""
+        start = (self._latest_month() or 0) - 2
+        cash_df = self._cash("month = (SELECT MAX(month) FROM cash)")
+        return self._cube('actuals', "l.month >= ?", (start,)), cash_df
+
+    def get_cash_trend(self, last_n_months: int):
+        cash_df = self._cash("month >= (SELECT MAX(month) FROM cash) - ? + 1", (last_n_months,))
+        return tools.get_cash_trend(cash_df, last_n_months)
+
+    def _cash(self, where: str, params=()) -> pd.DataFrame:
+        rows = self._conn().execute(f"SELECT month, cash_usd FROM cash WHERE {where} ORDER BY rowid", params).fetchall()
+        df = pd.DataFrame(rows, columns=['month', 'cash_usd'])
+        df['month_period'] = tools._as_periods(df['month'].to_numpy(dtype='int64'))
+        return df
+
+    def preload(self):
+        """Opens this thread's connection and checks the schema."""
+        self._latest_month()
+
+    def close(self):
+        """
+        Closes this thread's connection. Every other thread closes its own the next
+        time it opens a connection, so queries already running finish undisturbed.
+        """
+        self._closed = True
+        conns = getattr(_THREAD_CONNS, 'conns', {})
+        entry = conns.get(self.path)
+        if entry is not None and entry[0]() is self:
+            del conns[self.path]
+            entry[1].close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write the dataset to a single SQLite file.")
+    parser.add_argument("source", nargs="?", default=None, help="Workbook or snapshot to convert (default: DATA_FILE)")
+    parser.add_argument("--out", required=True, help="Database file to write (.sqlite, .sqlite3 or .db)")
+    args = parser.parse_args(argv)
+    if not is_database(args.out):
+        parser.error(f"--out must end in one of: {', '.join(SUFFIXES)}")
+
+    start = time.perf_counter()
+    write_database(tools.load_data(args.source), args.out)
+    print(f"Database written to {args.out} in {time.perf_counter() - start:.2f}s "
+          f"({os.path.getsize(args.out) / 1e6:.1f} MB). Point DATA_FILE at it to query it directly.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Dataset registry: one deployment serving several companies.
+
+A DatasetRegistry maps tenant IDs to data files (a workbook, snapshot
+directory or SQLite database, like DATA_FILE). A tenant's dataset is loaded
+on its first question and stays in the process-wide data cache while it is
+in use. The registry keeps the loaded tenants under a memory budget: when the
+total goes over max_bytes, the least recently used tenants are evicted,
+together with the cubes and indexes built from their data, and are loaded
+again on their next question.
+
+Workers share read-only data where the storage allows it. Before a tenant's
+workbook is first loaded, the registry compiles it into a columnar snapshot
+(see agent.snapshot), whose numeric columns are memory-mapped: every worker
+process on the host maps the same page-cache pages instead of parsing its own
+copy. Those columns do not count against the budget, which measures the
+memory each process holds privately. SQLite tenants are queried through a
+memory-mapped connection and hold little beyond their indexes.
+
+The registry is read from the JSON file named by TENANTS_FILE, e.g.
+{"acme": "data/acme.xlsx", "globex": "data/globex.sqlite"}; relative paths are
+resolved against the file's directory. TENANT_MEMORY_MAX_BYTES sets the
+budget. tenant=None is the default dataset, DATA_FILE, which is served as
+before and never evicted.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from . import backends, snapshot, sql_backend, tools
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+_REGISTRY = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def private_bytes(frames) -> int:
+    """
+    Returns the deep memory of the frames, leaving out numeric columns that are
+    zero-copy views of a memory-mapped snapshot (shared between processes).
+    """
+    total = 0
+    for df in frames:
+        usage = df.memory_usage(deep=True, index=True)
+        for col in df.columns:
+            if isinstance(df[col].dtype, np.dtype) and _is_mapped(df[col].to_numpy(copy=False)):
+                usage[col] = 0
+        total += int(usage.sum())
+    return total
+
+
+def _is_mapped(values: np.ndarray) -> bool:
+    # An array whose memory belongs to a foreign buffer (an Arrow memory map) rather than to NumPy.
+    base = values
+    while isinstance(base, np.ndarray):
+        base = base.base
+    return base is not None
+
+
+class DatasetRegistry:
+    """Tenant data files, and the tenants currently loaded, least recently used first."""
+
+    def __init__(self, sources: dict = None, max_bytes: int = None, share: bool = True):
+        self.sources = dict(sources or {})
+        self.max_bytes = max_bytes or int(os.environ.get('TENANT_MEMORY_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.share = share
+        self.evictions = 0
+        self._resident = OrderedDict()  # tenant -> private bytes of its loaded dataset
+        self._measured = {}  # tenant -> dataset version its bytes were measured at
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> 'DatasetRegistry':
+        """Reads a {tenant: data file} JSON mapping; relative data files are relative to path."""
+        with open(path) as f:
+            sources = json.load(f)
+        root = os.path.dirname(os.path.abspath(path))
+        return cls({tenant: os.path.join(root, source) for tenant, source in sources.items()}, **kwargs)
+
+    def register(self, tenant: str, path: str):
+        """Adds or repoints a tenant; a repointed tenant's loaded dataset is evicted."""
+        with self._lock:
+            if tenant in self.sources and self.sources[tenant] != path:
+                self.evict(tenant)
+            self.sources[tenant] = path
+
+    def unregister(self, tenant: str):
+        with self._lock:
+            self.evict(tenant)
+            self.sources.pop(tenant, None)
+
+    def data_file(self, tenant: str = None) -> str:
+        """Returns the tenant's data file (DATA_FILE for None). Raises ValueError for an unknown tenant."""
+        if tenant is None:
+            return tools.DATA_FILE
+        try:
+            return self.sources[tenant]
+        except KeyError:
+            raise ValueError(f"Unknown tenant: {tenant}") from None
+
+    def dataset_version(self, tenant: str = None) -> str:
+        return tools.dataset_version(self.data_file(tenant))
+
+    def load_data(self, tenant: str = None):
+        """Returns the tenant's frames like tools.load_data(), keeping the tenants under the memory budget."""
+        path = self.data_file(tenant)
+        if tenant is None:
+            return tools.load_data(path)
+        if self.share and tenant not in self._resident:
+            _compile_snapshot(path)
+        frames = tools.load_data(path)
+        version = frames[0].attrs.get('dataset_version')
+        with self._lock:
+            measured = tenant in self._resident and self._measured.get(tenant) == version
+        if not measured:
+            # Measured once per loaded version rather than on every question.
+            nbytes = private_bytes(frames)
+            with self._lock:
+                self._resident[tenant], self._measured[tenant] = nbytes, version
+        self._touch(tenant)
+        return frames
+
+    def get_backend(self, tenant: str = None):
+        """Returns the backend serving the tenant's dataset, like backends.get_backend()."""
+        path = self.data_file(tenant)
+        if tenant is None:
+            return backends.get_backend(path)
+        if sql_backend.is_database(path):
+            backend = backends.get_backend(path)
+            with self._lock:
+                self._resident.setdefault(tenant, 0)
+            self._touch(tenant)
+            return backend
+        return backends.PandasBackend(self.load_data(tenant))
+
+    def _touch(self, tenant: str):
+        """Records a loaded tenant as the most recently used, then evicts others until the budget is met."""
+        with self._lock:
+            if tenant not in self._resident:
+                return  # evicted by another thread since it was loaded
+            self._resident.move_to_end(tenant)
+            # The tenant just used is kept, even when it alone is over the budget.
+            while len(self._resident) > 1 and sum(self._resident.values()) > self.max_bytes:
+                self.evict(next(iter(self._resident)))
+
+    def evict(self, tenant: str) -> bool:
+        """Drops a tenant's loaded dataset and everything built from it. Returns whether it was loaded."""
+        with self._lock:
+            self._measured.pop(tenant, None)
+            if self._resident.pop(tenant, None) is None:
+                return False
+            path = self.sources[tenant]
+            tools.evict_dataset(path)
+            backends.close_backend(path)
+            self.evictions += 1
+            return True
+
+    def usage(self) -> dict:
+        """Returns the loaded tenants and their private bytes against the budget, for /health."""
+        with self._lock:
+            return {
+                'tenants': len(self.sources),
+                'loaded': dict(self._resident),
+                'bytes': sum(self._resident.values()),
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+            }
+
+
+def _compile_snapshot(path: str):
+    """Compiles a workbook's snapshot unless a fresh one exists; data stays readable if that fails."""
+    if os.path.isdir(path) or sql_backend.is_database(path):
+        return
+    try:
+        if not snapshot.is_fresh(snapshot.read_manifest(snapshot.default_snapshot_dir(path)), path):
+            snapshot.compile_snapshot(path)
+    except (ImportError, OSError):
+        # No pyarrow or a read-only directory: each worker parses the workbook instead.
+        pass
+
+
+def get_registry() -> DatasetRegistry:
+    """Returns the process-wide registry, read from TENANTS_FILE on first use (empty without it)."""
+    global _REGISTRY
+    with _REGISTRY_LOCK:
+        if _REGISTRY is None:
+            path = os.environ.get('TENANTS_FILE')
+            _REGISTRY = DatasetRegistry.from_file(path) if path else DatasetRegistry()
+        return _REGISTRY
+
+
+def set_registry(registry: DatasetRegistry = None):
+    """Replaces the process-wide registry; None reads TENANTS_FILE again on next use."""
+    global _REGISTRY
+    with _REGISTRY_LOCK:
+        _REGISTRY = registry
+
+
+def data_file(tenant: str = None) -> str:
+    return get_registry().data_file(tenant)
+
+
+def dataset_version(tenant: str = None) -> str:
+    return get_registry().dataset_version(tenant)
+
+
+def load_data(tenant: str = None):
+    return get_registry().load_data(tenant)
+
+
+def get_backend(tenant: str = None):
+    return get_registry().get_backend(tenant)
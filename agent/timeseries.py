@@ -0,0 +1,178 @@
+"""
+Prefix-sum index over a ledger's monthly USD totals.
+
+A PrefixIndex holds, for every month from the first to the last in the
+ledger, the running total of amount_usd per category and per P&L line
+(revenue, cogs, opex), with a leading row of zeros. The total of any
+category or line over any month range is then the difference of two rows,
+and a rolling-window series is one vectorized subtraction of the array from
+itself shifted by the window.
+
+The index is built once from the ledger cube and memoized per dataset
+version like the cube. It backs the range tools below: totals over a
+quarter, a from-to range or the year to date, comparisons of two ranges,
+rolling totals, and Opex breakdowns over a range.
+"""
+import numpy as np
+import pandas as pd
+from . import tools
+from .instrumentation import timed
+
+METRICS = ('Revenue', 'COGS', 'Opex', 'Gross Margin', 'EBITDA')
+LINES = ('revenue', 'cogs', 'opex')
+
+
+class PrefixIndex:
+    """Cumulative monthly USD totals of one ledger, per category and per P&L line."""
+
+    def __init__(self, cube: pd.DataFrame):
+        months = cube.index.get_level_values('month_period')
+        if len(cube):
+            self.periods = pd.period_range(months.min(), months.max(), freq='M')
+        else:
+            self.periods = pd.PeriodIndex([], freq='M')
+        flat = cube.reset_index()
+
+        def cumulative(by: str, columns) -> np.ndarray:
+            monthly = flat.groupby(['month_period', by])['amount_usd'].sum().unstack(by, fill_value=0.0)
+            monthly = monthly.reindex(index=self.periods, columns=columns, fill_value=0.0).to_numpy(dtype=float)
+            return np.vstack([np.zeros((1, len(columns))), np.cumsum(monthly, axis=0)])
+
+        self.categories = pd.Index(sorted(flat['category'].unique()), dtype=object)
+        # Display label per category: its first spelling in the ledger, as in the cube.
+        self.labels = flat.groupby('category', sort=False)['label'].first().reindex(self.categories)
+        self._categories = cumulative('category', self.categories)
+        self._lines = cumulative('line', list(LINES))
+
+    @property
+    def first(self):
+        return self.periods[0] if len(self.periods) else None
+
+    @property
+    def last(self):
+        return self.periods[-1] if len(self.periods) else None
+
+    def _rows(self, start, end):
+        """Returns the prefix rows (i, j) whose difference is the total of [start, end], or None if disjoint."""
+        if self.first is None or end < self.first or start > self.last or end < start:
+            return None
+        i = max(start, self.first).ordinal - self.first.ordinal
+        j = min(end, self.last).ordinal - self.first.ordinal + 1
+        return i, j
+
+    def line_totals(self, start, end) -> dict:
+        """Returns the USD total of each P&L line over [start, end] (months outside the data count as 0)."""
+        rows = self._rows(start, end)
+        totals = self._lines[rows[1]] - self._lines[rows[0]] if rows else np.zeros(len(LINES))
+        return dict(zip(LINES, totals.tolist()))
+
+    def category_totals(self, start, end) -> pd.Series:
+        """Returns the USD total of every category over [start, end], indexed by category."""
+        rows = self._rows(start, end)
+        totals = self._categories[rows[1]] - self._categories[rows[0]] if rows else np.zeros(len(self.categories))
+        return pd.Series(totals, index=self.categories)
+
+    def rolling_lines(self, window: int) -> pd.DataFrame:
+        """Returns the trailing `window`-month total of each line for every month with a full window."""
+        if window < 1 or window > len(self.periods):
+            return pd.DataFrame(columns=list(LINES), index=self.periods[:0], dtype=float)
+        rolling = self._lines[window:] - self._lines[:-window]
+        return pd.DataFrame(rolling, columns=list(LINES), index=self.periods[window - 1:])
+
+
+def metric_value(lines, metric: str):
+    """Computes a metric from line totals (dict of floats or frame of columns), like get_financial_metric_trend()."""
+    revenue, cogs, opex = lines['revenue'], lines['cogs'], lines['opex']
+    if metric == 'Revenue':
+        return revenue
+    if metric == 'COGS':
+        return cogs
+    if metric == 'Opex':
+        return opex
+    if metric == 'EBITDA':
+        return revenue - cogs - opex
+    if metric == 'Gross Margin':
+        revenue, cogs = np.asarray(revenue, dtype=float), np.asarray(cogs, dtype=float)
+        margin = np.divide(revenue - cogs, revenue, out=np.zeros_like(revenue), where=revenue > 0) * 100
+        return float(margin) if margin.ndim == 0 else margin
+    raise ValueError(f"Unknown metric: {metric}")
+
+
+def format_range(start, end) -> str:
+    """Names a month range the way a question would: 'June 2025', 'Q2 2025', '2025' or 'Mar 2025 – Jun 2025'."""
+    if start == end:
+        return start.strftime('%B %Y')
+    if start.year == end.year and end.ordinal - start.ordinal == 2 and start.month % 3 == 1:
+        return f"Q{start.quarter} {start.year}"
+    if start.year == end.year and (start.month, end.month) == (1, 12):
+        return str(start.year)
+    return f"{start.strftime('%b %Y')} – {end.strftime('%b %Y')}"
+
+
+def build_prefix_index(ledger_df: pd.DataFrame, fx_df: pd.DataFrame) -> PrefixIndex:
+    return PrefixIndex(tools._ledger_cube(ledger_df, fx_df))
+
+
+def prefix_index(ledger_df: pd.DataFrame, fx_df: pd.DataFrame) -> PrefixIndex:
+    """Returns the PrefixIndex of a ledger, memoized per dataset version."""
+    return tools._dataset_memo('prefix_index', (ledger_df, fx_df), build_prefix_index)
+
+# --- Tool Functions ---
+# As in agent.tools, each tool hands prefix indexes to a core function, which
+# the SQLite backend reuses with indexes built from its own cubes.
+
+@timed('timeseries.get_range_total')
+def get_range_total(actuals_df: pd.DataFrame, budget_df: pd.DataFrame, fx_df: pd.DataFrame, metric: str, start, end):
+    """
+    Returns {'actual', 'budget'} totals of a metric over the months [start,
+    end] (Periods), or None when neither ledger has data in the range.
+    """
+    return _range_total(prefix_index(actuals_df, fx_df), prefix_index(budget_df, fx_df), metric, start, end)
+
+
+def _range_total(actual_index: PrefixIndex, budget_index: PrefixIndex, metric: str, start, end):
+    if actual_index._rows(start, end) is None and budget_index._rows(start, end) is None:
+        return None
+    return {
+        "actual": metric_value(actual_index.line_totals(start, end), metric),
+        "budget": metric_value(budget_index.line_totals(start, end), metric),
+    }
+
+
+@timed('timeseries.get_rolling_metric')
+def get_rolling_metric(actuals_df: pd.DataFrame, fx_df: pd.DataFrame, metric: str, window: int, last_n_months: int):
+    """
+    Returns the metric over a trailing `window`-month window for each of the
+    last N months that has a full window, in the get_financial_metric_trend()
+    shape ('month_str', 'Metric').
+    """
+    return _rolling_metric(prefix_index(actuals_df, fx_df), metric, window, last_n_months)
+
+
+def _rolling_metric(index: PrefixIndex, metric: str, window: int, last_n_months: int):
+    rolling = index.rolling_lines(window).iloc[-last_n_months:]
+    return pd.DataFrame({
+        'month_str': rolling.index.strftime('%b %Y'),
+        'Metric': np.asarray(metric_value(rolling, metric), dtype=float),
+    })
+
+
+@timed('timeseries.get_opex_breakdown_range')
+def get_opex_breakdown_range(actuals_df: pd.DataFrame, fx_df: pd.DataFrame, start, end):
+    """Calculates the Opex breakdown by category over the months [start, end], like get_opex_breakdown()."""
+    return _opex_breakdown_range(prefix_index(actuals_df, fx_df), start, end)
+
+
+def _opex_breakdown_range(index: PrefixIndex, start, end):
+    if index._rows(start, end) is None:
+        return None
+    totals = index.category_totals(start, end)
+    opex = totals[totals.index.str.startswith('opex:') & (totals != 0)]
+    if opex.empty:
+        return None
+    category_summary = pd.DataFrame({
+        'Category': index.labels[opex.index].str.replace('Opex: ', '', case=False).to_numpy(),
+        'Amount (USD)': opex.to_numpy(),
+    })
+    category_summary = category_summary.groupby('Category', as_index=False)['Amount (USD)'].sum()
+    return category_summary.sort_values(by='Amount (USD)', ascending=False)
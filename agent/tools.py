@@ -1,130 +1,544 @@
+import os
+import threading
+import warnings
+import weakref
+import zlib
+import numpy as np
 import pandas as pd
+from .instrumentation import timed
 
 # --- Data Loading ---
 DATA_FILE = "fixtures/data.xlsx"
+SHEETS = ('actuals', 'budget', 'cash', 'fx')
+AMOUNT_COLUMNS = {'actuals': 'amount', 'budget': 'amount', 'cash': 'cash_usd'}
+
+# Parsed datasets keyed by absolute path. Each entry remembers the (mtime, size)
+# it was read at, so an edited workbook is picked up on the next call.
+_DATA_CACHE = {}
+_DATA_CACHE_LOCK = threading.Lock()  # held for cache lookups and inserts only
+# One lock per cache key, held while that dataset is read, so a dataset is read
+# once however many threads ask for it while other datasets load in parallel.
+_LOAD_LOCKS = {}
+# The frames load_data() (and filter_entity) handed out, by id. A frame derived
+# from one, e.g. with assign(), inherits its attrs but is not listed here, so
+# aggregates cached for the loaded data are never served for edited data.
+_DATASET_FRAMES = weakref.WeakValueDictionary()
+
+
+def _file_signature(path: str):
+    """
+    Returns the (absolute path, mtime_ns, size) triple used to key the data cache.
+    For a snapshot directory, the manifest (always written last) is what is stat'ed.
+    """
+    stat = os.stat(os.path.join(path, 'manifest.json') if os.path.isdir(path) else path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def _version_from_signature(signature) -> str:
+    path, mtime_ns, size = signature
+    return f"{zlib.crc32(path.encode()):08x}-{mtime_ns:x}-{size:x}"
+
+
+def dataset_version(path: str = None) -> str:
+    """
+    Returns a cheap identifier of the current contents of the data file.
+    It changes whenever the file's modification time or size changes.
+    """
+    return _version_from_signature(_file_signature(path or DATA_FILE))
+
+
+@timed('tools.read_workbook')
+def _read_workbook(path: str):
+    """Parses the Excel workbook and standardizes month and amount columns."""
+    xls = pd.ExcelFile(path)
+    return tuple(standardize_sheet(pd.read_excel(xls, sheet), sheet) for sheet in SHEETS)
+
+
+def standardize_sheet(df: pd.DataFrame, sheet: str) -> pd.DataFrame:
+    """Adds month_period and zero-fills the amount column of one raw sheet, in place."""
+    if 'month' not in df.columns:
+        raise ValueError(f"Column 'month' not found in one of the sheets.")
+    df['month_period'] = pd.to_datetime(df['month']).dt.to_period('M')
+    amount_col = AMOUNT_COLUMNS.get(sheet)
+    if amount_col in df.columns:
+        df[amount_col] = df[amount_col].fillna(0)
+    return df
+
 
-def load_data():
+def _read_dataset(path: str):
+    """
+    Reads a snapshot directory or SQLite database directly; for a workbook,
+    reads its compiled columnar snapshot when it is fresh and otherwise parses
+    the workbook.
+    """
+    from . import snapshot, sql_backend
+
+    if os.path.isdir(path):
+        return snapshot.load_snapshot(path)
+    if sql_backend.is_database(path):
+        return sql_backend.read_frames(path)
+    frames = snapshot.load_if_fresh(path)
+    if frames is None:
+        frames = _read_workbook(path)
+    return frames
+
+
+@timed('tools.load_data')
+def load_data(path: str = None, compact: bool = False):
     """
     Loads all necessary dataframes from the Excel file and standardizes month columns.
+
+    A fresh columnar snapshot (see agent.snapshot) is read instead of the workbook
+    when one exists; path may also be a snapshot directory or a SQLite database
+    (see agent.sql_backend). Parsed frames are cached process-wide and only
+    re-read when the file's modification time or size changes. Every call
+    returns shallow copies of the cached frames: treat them as read-only, any
+    column you add or overwrite stays local to your copy and never reaches the
+    cache. To change values, build a new frame (e.g. with assign()): aggregates
+    are cached per returned frame.
+
+    With compact=True the frames use the memory-compact layout from
+    agent.compact (categorical dimensions, int32 month ordinals). The tool
+    functions accept either layout.
     """
+    path = path or DATA_FILE
     try:
-        xls = pd.ExcelFile(DATA_FILE)
-        actuals_df = pd.read_excel(xls, 'actuals')
-        budget_df = pd.read_excel(xls, 'budget')
-        cash_df = pd.read_excel(xls, 'cash')
-        fx_df = pd.read_excel(xls, 'fx')
-
-        # --- Data Cleaning & Standardization ---
-        for df in [actuals_df, budget_df, cash_df, fx_df]:
-            if 'month' not in df.columns:
-                raise ValueError(f"Column 'month' not found in one of the sheets.")
-            df['month_period'] = pd.to_datetime(df['month']).dt.to_period('M')
-
-        for df, amount_col in [(actuals_df, 'amount'), (budget_df, 'amount'), (cash_df, 'cash_usd')]:
-             if amount_col in df.columns:
-                df[amount_col].fillna(0, inplace=True)
-
-        return actuals_df, budget_df, cash_df, fx_df
+        signature = _file_signature(path)
+        cache_key = (signature[0], compact)
+        with _DATA_CACHE_LOCK:
+            entry = _DATA_CACHE.get(cache_key)
+            load_lock = _LOAD_LOCKS.setdefault(cache_key, threading.Lock())
+        if entry is None or entry[0] != signature:
+            with load_lock:
+                # Another thread may have read this version while we waited.
+                with _DATA_CACHE_LOCK:
+                    entry = _DATA_CACHE.get(cache_key)
+                if entry is None or entry[0] != signature:
+                    frames = _read_dataset(path)
+                    if compact:
+                        from . import compact as compact_layout
+                        frames = compact_layout.compact_frames(frames)
+                    version = _version_from_signature(signature)
+                    for sheet, df in zip(SHEETS, frames):
+                        df.attrs['dataset_version'] = version
+                        df.attrs['dataset_sheet'] = sheet
+                    entry = (signature, frames)
+                    with _DATA_CACHE_LOCK:
+                        _DATA_CACHE[cache_key] = entry
+        return tuple(_dataset_frame(df.copy(deep=False)) for df in entry[1])
     except FileNotFoundError:
-        raise FileNotFoundError(f"Error: The data file was not found at {DATA_FILE}.")
+        raise FileNotFoundError(f"Error: The data file was not found at {path}.")
     except Exception as e:
         raise Exception(f"An error occurred while loading data: {e}")
 
+
+def concat_rows(frames) -> pd.DataFrame:
+    """
+    Stacks frames holding rows of the same sheet. Columns that are categorical
+    in the first frame stay categorical, with the union of the categories.
+    """
+    first = frames[0]
+    for col in first.columns:
+        if isinstance(first[col].dtype, pd.CategoricalDtype):
+            # With one shared dtype pandas concatenates the integer codes instead
+            # of falling back to an array of strings.
+            categories = first[col].cat.categories
+            for df in frames[1:]:
+                categories = categories.append(pd.Index(df[col].unique()).difference(categories))
+            dtype = pd.CategoricalDtype(categories)
+            frames = [df.assign(**{col: df[col].astype(dtype)}) for df in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def clear_data_cache():
+    """Drops every cached dataset, forcing the next load_data() to re-read from disk."""
+    with _DATA_CACHE_LOCK:
+        _DATA_CACHE.clear()
+    with _DERIVED_CACHE_LOCK:
+        _DERIVED_CACHE.clear()
+
+
+def evict_dataset(path: str) -> bool:
+    """
+    Drops one dataset's cached frames (both layouts) and the aggregates built
+    from them. Returns whether it was cached. Frames already handed out stay
+    valid; the next load_data() of path reads it again.
+    """
+    path = os.path.abspath(path)
+    with _DATA_CACHE_LOCK:
+        keys = [key for key in _DATA_CACHE if key[0] == path]
+        versions = {_version_from_signature(_DATA_CACHE.pop(key)[0]) for key in keys}
+    with _DERIVED_CACHE_LOCK:
+        for key in [key for key in _DERIVED_CACHE if key[1] in versions]:
+            del _DERIVED_CACHE[key]
+    return bool(keys)
+
 # --- Helper Functions ---
+BASE_CURRENCY = 'USD'
+
+
+def _period_ordinals(periods) -> np.ndarray:
+    """
+    Returns monthly periods as int64 ordinals (months since 1970-01). Accepts
+    Period values or the integer ordinals stored by the compact dataset layout.
+    """
+    values = periods.array if isinstance(periods, (pd.Series, pd.Index)) else periods
+    if pd.api.types.is_integer_dtype(getattr(values, 'dtype', None)):
+        return np.asarray(values, dtype=np.int64)
+    return pd.PeriodIndex(values, freq='M').asi8
+
+
+def _as_periods(periods) -> pd.PeriodIndex:
+    """Returns monthly periods as a PeriodIndex, whether given as Periods or ordinals."""
+    return pd.PeriodIndex.from_ordinals(_period_ordinals(periods), freq='M')
+
+
+class FxTable:
+    """
+    Dense (month, currency) -> rate_to_usd lookup built once per dataset.
+
+    Rates live in a 2-D array indexed by month ordinal offset and currency code,
+    so converting a column is a single vectorized gather: no merge, and no copy
+    of the other columns. USD always converts at 1.0.
+    """
+
+    def __init__(self, fx_df: pd.DataFrame):
+        ordinals = _period_ordinals(fx_df['month_period'])
+        currency_codes, currencies = pd.factorize(fx_df['currency'].astype(str))
+        self.currencies = pd.Index(currencies)
+        self.first_ordinal = int(ordinals.min()) if len(ordinals) else 0
+        n_periods = int(ordinals.max()) - self.first_ordinal + 1 if len(ordinals) else 0
+        self.rates = np.full((n_periods, len(currencies)), np.nan)
+        self.rates[ordinals - self.first_ordinal, currency_codes] = fx_df['rate_to_usd'].to_numpy(dtype=float)
+
+    def lookup(self, periods, currencies) -> np.ndarray:
+        """Returns the rate for each (period, currency) pair, NaN where no rate is known."""
+        offsets = _period_ordinals(periods) - self.first_ordinal
+        # A blank currency gets a code of its own (with no rate) instead of -1, which would index the last one.
+        codes, uniques = pd.factorize(pd.Series(currencies).astype(str), use_na_sentinel=False)
+        is_base = np.asarray(uniques == BASE_CURRENCY)[codes]
+        currency_idx = self.currencies.get_indexer(uniques)[codes]
+
+        rates = np.full(len(offsets), np.nan)
+        valid = (offsets >= 0) & (offsets < self.rates.shape[0]) & (currency_idx >= 0)
+        rates[valid] = self.rates[offsets[valid], currency_idx[valid]]
+        rates[is_base & np.isnan(rates)] = 1.0
+        return rates
+
+    @timed('tools.fx_convert')
+    def convert(self, amounts, periods, currencies, on_missing: str = 'par'):
+        """
+        Converts local amounts to USD. Returns (amounts_usd, missing) where
+        missing flags the rows that had no rate. on_missing decides what those
+        rows become: 'par' converts them at 1.0, 'nan' leaves them NaN and
+        'raise' raises a ValueError naming the missing months and currencies.
+        """
+        rates = self.lookup(periods, currencies)
+        missing = np.isnan(rates)
+        if missing.any():
+            if on_missing == 'raise':
+                pairs = sorted({(str(p), str(c)) for p, c in zip(np.asarray(periods)[missing], np.asarray(currencies)[missing])})
+                raise ValueError(f"No FX rate to USD for: {pairs}")
+            if on_missing == 'par':
+                rates = np.where(missing, 1.0, rates)
+            elif on_missing != 'nan':
+                raise ValueError(f"Unknown on_missing policy: {on_missing}")
+        return np.asarray(amounts, dtype=float) / rates, missing
+
+
+def _fx_table(fx_df: pd.DataFrame) -> FxTable:
+    return _dataset_memo('fx_table', (fx_df,), FxTable)
+
+
 def _convert_to_usd(df: pd.DataFrame, fx_df: pd.DataFrame) -> pd.DataFrame:
-    """Merges a dataframe with FX rates and converts 'amount' to USD."""
+    """Adds an 'amount_usd' column using the dataset's FX lookup table."""
     if 'currency' not in df.columns:
-        df['amount_usd'] = df['amount']
-        return df
-        
-    merged_df = df.merge(fx_df, on=['month_period', 'currency'], how='left')
-    # Assume 1.0 rate for USD or if rate is not found
-    merged_df['rate_to_usd'] = merged_df['rate_to_usd'].fillna(1.0)
-    merged_df['amount_usd'] = merged_df['amount'] / merged_df['rate_to_usd']
-    return merged_df
+        return df.assign(amount_usd=df['amount'])
+
+    amount_usd, _ = _fx_table(fx_df).convert(df['amount'], df['month_period'], df['currency'])
+    return df.assign(amount_usd=amount_usd)
+
+# --- P&L Cube ---
+# Aggregates derived from a loaded dataset (e.g. the P&L cube) are cached per
+# dataset version, so they are built once and shared by every tool call.
+_DERIVED_CACHE = {}
+_DERIVED_CACHE_LOCK = threading.Lock()
+_DERIVED_CACHE_SIZE = 16
+
+
+def _dataset_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Registers df as unmodified dataset data, whose aggregates _dataset_memo may cache."""
+    _DATASET_FRAMES[id(df)] = df
+    return df
+
+
+def _dataset_memo(name: str, frames, build):
+    """
+    Returns build(*frames), cached when every frame comes straight from load_data().
+    Any other frame, including one derived from a loaded frame (assign(), a
+    filter, a copy), is computed on the fly, so ad-hoc and edited frames are
+    never served stale results.
+    """
+    versions = {df.attrs.get('dataset_version') for df in frames}
+    if len(versions) != 1 or None in versions or any(_DATASET_FRAMES.get(id(df)) is not df for df in frames):
+        return build(*frames)
+
+    key = (name, versions.pop()) + tuple(df.attrs.get('dataset_sheet') for df in frames)
+    with _DERIVED_CACHE_LOCK:
+        value = _DERIVED_CACHE.get(key)
+    if value is None:
+        value = build(*frames)
+        _memo_put(key, value)
+    return value
+
+
+def _memo_put(key, value):
+    with _DERIVED_CACHE_LOCK:
+        _DERIVED_CACHE[key] = value
+        while len(_DERIVED_CACHE) > _DERIVED_CACHE_SIZE:
+            _DERIVED_CACHE.pop(next(iter(_DERIVED_CACHE)))
+
+
+def filter_entity(frames, entity: str):
+    """
+    Restricts (actuals_df, budget_df, cash_df, fx_df) to one entity. Cash is
+    only reported consolidated and FX rates apply to every entity, so those two
+    frames are returned unchanged. The filtered frames are tagged as a dataset
+    of their own, so aggregates built from them are cached per entity.
+    """
+    actuals_df, budget_df, cash_df, fx_df = frames
+    filtered = []
+    for df in (actuals_df, budget_df):
+        subset = df[df['entity'] == entity]
+        if 'dataset_version' in df.attrs:
+            subset.attrs['dataset_sheet'] = f"{df.attrs['dataset_sheet']}[{entity}]"
+            if _DATASET_FRAMES.get(id(df)) is df:
+                _dataset_frame(subset)
+        filtered.append(subset)
+    return filtered[0], filtered[1], cash_df, fx_df
+
+
+@timed('tools.build_ledger_cube')
+def build_ledger_cube(ledger_df: pd.DataFrame, fx_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pre-aggregates an actuals or budget ledger into a monthly P&L cube.
+
+    The cube is indexed by (month_period, category, currency), where category is
+    the lower-cased account_category, and holds the local 'amount', the USD
+    'amount_usd', a display 'label' and the P&L 'line' ('revenue', 'cogs', 'opex'
+    or 'other') of the category. FX conversion runs once per cube row instead of
+    once per ledger line.
+    """
+    # Group on integer codes so string handling runs once per distinct value,
+    # not once per ledger line.
+    has_currency = 'currency' in ledger_df.columns
+    key_columns = ['month_period', 'account_category'] + (['currency'] if has_currency else [])
+    codes = {}
+    uniques = {}
+    for col in key_columns:
+        # A blank value gets a code of its own rather than -1, which would index the last real value.
+        codes[col], uniques[col] = pd.factorize(ledger_df[col], use_na_sentinel=False)
+    grouped = pd.DataFrame({**codes, 'amount': ledger_df['amount'].to_numpy()})
+    cube = grouped.groupby(key_columns, sort=False)['amount'].sum().reset_index()
+
+    labels = pd.Index(uniques['account_category']).astype(str)
+    cube['month_period'] = _as_periods(uniques['month_period'])[cube['month_period']]
+    cube['label'] = labels[cube['account_category']]
+    cube['category'] = labels.str.lower()[cube['account_category']]
+    if has_currency:
+        cube['currency'] = pd.Index(uniques['currency']).astype(str)[cube['currency']]
+    # Labels that only differ by case collapse into one category; keep the first spelling.
+    cube['label'] = cube.groupby('category')['label'].transform('first')
+    cube = cube.groupby(['month_period', 'category', 'label'] + (['currency'] if has_currency else []),
+                        sort=False, dropna=False)['amount'].sum().reset_index()
+
+    if has_currency:
+        cube['amount_usd'], cube['fx_missing'] = _fx_table(fx_df).convert(
+            cube['amount'], cube['month_period'], cube['currency'])
+    else:
+        cube['amount_usd'], cube['fx_missing'] = cube['amount'].astype(float), False
+        cube['currency'] = BASE_CURRENCY
+
+    if cube['fx_missing'].any():
+        missing = cube.loc[cube['fx_missing'], ['month_period', 'currency']].drop_duplicates()
+        warnings.warn(
+            f"No FX rate to USD for {len(missing)} month/currency pair(s) "
+            f"(e.g. {missing.iloc[0, 1]} in {missing.iloc[0, 0]}); those amounts were converted at 1.0. "
+            "See tools.missing_fx_rates().",
+            RuntimeWarning,
+        )
+    cube['line'] = _pnl_line(cube['category'])
+    cube = cube.set_index(['month_period', 'category', 'currency']).sort_index()
+    return cube[['label', 'line', 'amount', 'amount_usd', 'fx_missing']]
+
+
+def _pnl_line(categories: pd.Series) -> np.ndarray:
+    """Classifies lower-cased categories into the P&L lines the tools aggregate."""
+    return np.select(
+        [categories == 'revenue', categories == 'cogs', categories.str.startswith('opex:')],
+        ['revenue', 'cogs', 'opex'],
+        default='other',
+    )
+
+
+def _ledger_cube(ledger_df: pd.DataFrame, fx_df: pd.DataFrame) -> pd.DataFrame:
+    return _dataset_memo('ledger_cube', (ledger_df, fx_df), build_ledger_cube)
+
+
+def extend_cached_dataset(path: str, previous_signature, delta: dict) -> bool:
+    """
+    Brings the cached copy of a dataset up to date after agent.ingest appended
+    months to it on disk, without re-reading the history. delta maps sheet
+    names to the appended rows (standardized, with month_period).
+
+    The cached frames get the new rows concatenated, and every cached ledger
+    cube is extended with a cube built from the appended rows alone, so the
+    aggregation work scales with the delta. Returns False, leaving the next
+    load_data() to read from disk, when the dataset was not cached at
+    previous_signature.
+    """
+    signature = _file_signature(path or DATA_FILE)
+    old_version = _version_from_signature(previous_signature)
+    version = _version_from_signature(signature)
+    with _DATA_CACHE_LOCK:
+        entry = _DATA_CACHE.get((signature[0], False))
+        # The compact layout is re-derived on its next load.
+        _DATA_CACHE.pop((signature[0], True), None)
+        if entry is None or entry[0] != previous_signature:
+            return False
+        frames = []
+        for sheet, df in zip(SHEETS, entry[1]):
+            df = concat_rows([df, delta[sheet]]) if sheet in delta else df.copy(deep=False)
+            df.attrs.update(dataset_version=version, dataset_sheet=sheet)
+            frames.append(df)
+        _DATA_CACHE[(signature[0], False)] = (signature, tuple(frames))
+
+    with _DERIVED_CACHE_LOCK:
+        previous = [(key, value) for key, value in _DERIVED_CACHE.items() if key[1] == old_version]
+    fx_df = frames[SHEETS.index('fx')]
+    fx_periods = _period_ordinals(delta['fx']['month_period']) if 'fx' in delta else np.empty(0, dtype=np.int64)
+    for (name, _, *sheets), cube in previous:
+        if name != 'ledger_cube':
+            continue
+        ledger_sheet, _, entity = sheets[0].partition('[')
+        # New rates for months the cube already covers change its USD amounts: rebuild lazily instead.
+        if len(cube) and len(fx_periods) and fx_periods.min() <= _period_ordinals(cube.index.get_level_values(0)).max():
+            continue
+        rows = delta.get(ledger_sheet)
+        if rows is not None and entity:
+            rows = rows[rows['entity'] == entity[:-1]]
+        if rows is not None and len(rows):
+            cube = pd.concat([cube, build_ledger_cube(rows, fx_df)]).sort_index()
+            cube['label'] = cube.groupby(level='category')['label'].transform('first')
+        _memo_put(('ledger_cube', version) + tuple(sheets), cube)
+    return True
+
+
+def missing_fx_rates(ledger_df: pd.DataFrame, fx_df: pd.DataFrame) -> pd.DataFrame:
+    """Lists the (month_period, currency) pairs of a ledger that have no FX rate to USD."""
+    cube = _ledger_cube(ledger_df, fx_df)
+    missing = cube[cube['fx_missing']].reset_index()[['month_period', 'currency']]
+    return missing.drop_duplicates().reset_index(drop=True)
+
+
+def _cube_periods(cube: pd.DataFrame, start_period, end_period=None) -> pd.DataFrame:
+    """Returns the cube rows for months in [start_period, end_period] as a flat frame."""
+    periods = cube.index.get_level_values('month_period')
+    mask = periods >= start_period
+    if end_period is not None:
+        mask &= periods <= end_period
+    return cube[mask].reset_index()
+
+
+def _monthly_pnl(cube: pd.DataFrame, start_period) -> pd.DataFrame:
+    """
+    Returns one row per month from start_period onwards with the USD 'revenue',
+    'cogs' and 'opex' totals, computed as a single groupby-sum over the cube.
+    """
+    recent = _cube_periods(cube, start_period)
+    summary = recent.groupby(['month_period', 'line'])['amount_usd'].sum().unstack('line', fill_value=0)
+    return summary.reindex(columns=['revenue', 'cogs', 'opex'], fill_value=0).astype(float)
+
+
+def _cube_total(cube: pd.DataFrame, period, category: str) -> float:
+    """Sums amount_usd for one month and one (lower-case) category via an index lookup."""
+    try:
+        return cube.loc[(period, category), 'amount_usd'].sum()
+    except KeyError:
+        return 0
 
 # --- Tool Functions ---
+# Each tool builds the ledger cubes it needs and hands them to a cube-level
+# core (the _-prefixed functions below), which agent.sql_backend reuses with
+# cubes aggregated by the SQL engine.
 
-def get_revenue_vs_budget(actuals_df: pd.DataFrame, budget_df: pd.DataFrame, fx_df: pd.DataFrame, month_name: str, year: int):
-    """Fetches and compares actual vs. budget revenue for a given month in USD."""
+def _target_period(month_name: str, year: int) -> pd.Period:
     try:
-        target_period = pd.Period(f'{year}-{month_name}', freq='M')
+        return pd.Period(f'{year}-{month_name}', freq='M')
     except ValueError:
         raise ValueError(f"Invalid month name: '{month_name}'. Please use a full month name (e.g., 'June').")
 
-    # Filter for revenue
-    actual_rev = actuals_df[actuals_df['account_category'].str.lower() == 'revenue'].copy()
-    budget_rev = budget_df[budget_df['account_category'].str.lower() == 'revenue'].copy()
 
-    # Convert to USD
-    actual_rev_usd = _convert_to_usd(actual_rev, fx_df)
-    budget_rev_usd = _convert_to_usd(budget_rev, fx_df)
+@timed('tools.get_revenue_vs_budget')
+def get_revenue_vs_budget(actuals_df: pd.DataFrame, budget_df: pd.DataFrame, fx_df: pd.DataFrame, month_name: str, year: int):
+    """Fetches and compares actual vs. budget revenue for a given month in USD."""
+    target_period = _target_period(month_name, year)
+    return _revenue_vs_budget(_ledger_cube(actuals_df, fx_df), _ledger_cube(budget_df, fx_df), target_period)
+
 
-    # Filter for the target month
-    actual_monthly = actual_rev_usd[actual_rev_usd['month_period'] == target_period]['amount_usd'].sum()
-    budget_monthly = budget_rev_usd[budget_rev_usd['month_period'] == target_period]['amount_usd'].sum()
+def _revenue_vs_budget(actual_cube: pd.DataFrame, budget_cube: pd.DataFrame, target_period):
+    actual_monthly = _cube_total(actual_cube, target_period, 'revenue')
+    budget_monthly = _cube_total(budget_cube, target_period, 'revenue')
 
     if actual_monthly == 0 and budget_monthly == 0:
         return None
 
     return {"actual": actual_monthly, "budget": budget_monthly}
 
+@timed('tools.get_financial_metric_trend')
 def get_financial_metric_trend(actuals_df: pd.DataFrame, fx_df: pd.DataFrame, metric: str, last_n_months: int):
     """Calculates a financial metric (Gross Margin or EBITDA) over a trend period."""
-    latest_month = actuals_df['month_period'].max()
-    start_period = latest_month - last_n_months + 1
-    
-    recent_actuals = actuals_df[actuals_df['month_period'] >= start_period].copy()
-    recent_actuals_usd = _convert_to_usd(recent_actuals, fx_df)
+    return _metric_trend(_ledger_cube(actuals_df, fx_df), metric, last_n_months)
 
-    def sum_by_category(df, category):
-        return df[df['account_category'].str.lower() == category]['amount_usd'].sum()
 
-    def sum_by_prefix(df, prefix):
-        return df[df['account_category'].str.lower().str.startswith(prefix)]['amount_usd'].sum()
+def _metric_trend(cube: pd.DataFrame, metric: str, last_n_months: int):
+    latest_month = cube.index.get_level_values('month_period').max()
+    start_period = latest_month - last_n_months + 1
 
-    monthly_summary = recent_actuals_usd.groupby('month_period').apply(lambda x: pd.Series({
-        'Revenue': sum_by_category(x, 'revenue'),
-        'COGS': sum_by_category(x, 'cogs'),
-        'Opex': sum_by_prefix(x, 'opex:')
-    }), include_groups=False).reset_index()
+    pnl = _monthly_pnl(cube, start_period)
+    revenue, cogs, opex = pnl['revenue'].to_numpy(), pnl['cogs'].to_numpy(), pnl['opex'].to_numpy()
 
     if metric == 'Gross Margin':
         # Safely calculate gross margin to avoid division by zero
-        monthly_summary['Metric'] = monthly_summary.apply(
-            lambda row: ((row['Revenue'] - row['COGS']) / row['Revenue']) * 100 if row['Revenue'] > 0 else 0,
-            axis=1
-        )
+        margin = np.divide(revenue - cogs, revenue, out=np.zeros_like(revenue), where=revenue > 0)
+        metric_values = margin * 100
     elif metric == 'EBITDA':
-        monthly_summary['Metric'] = monthly_summary['Revenue'] - monthly_summary['COGS'] - monthly_summary['Opex']
+        metric_values = revenue - cogs - opex
     else:
         raise ValueError(f"Unknown metric: {metric}")
 
+    monthly_summary = pd.DataFrame({'month_period': pnl.index, 'Metric': metric_values})
     monthly_summary = monthly_summary.sort_values('month_period')
     monthly_summary['month_str'] = monthly_summary['month_period'].dt.strftime('%b %Y')
     
     return monthly_summary[['month_str', 'Metric']]
 
 
+@timed('tools.get_opex_breakdown')
 def get_opex_breakdown(actuals_df: pd.DataFrame, fx_df: pd.DataFrame, month_name: str, year: int):
     """Calculates the Opex breakdown by category for a given month."""
-    try:
-        target_period = pd.Period(f'{year}-{month_name}', freq='M')
-    except ValueError:
-        raise ValueError(f"Invalid month name: '{month_name}'. Please use a full month name (e.g., 'June').")
+    return _opex_breakdown(_ledger_cube(actuals_df, fx_df), _target_period(month_name, year))
+
 
-    opex_actuals = actuals_df[
-        (actuals_df['account_category'].str.lower().str.startswith('opex:')) &
-        (actuals_df['month_period'] == target_period)
-    ].copy()
+def _opex_breakdown(cube: pd.DataFrame, target_period):
+    opex_usd = _cube_periods(cube, target_period, target_period)
+    opex_usd = opex_usd[opex_usd['category'].str.startswith('opex:')].copy()
 
-    if opex_actuals.empty:
+    if opex_usd.empty:
         return None
 
-    opex_usd = _convert_to_usd(opex_actuals, fx_df)
-    
     # Clean up category names
-    opex_usd['Category'] = opex_usd['account_category'].str.replace('Opex: ', '', case=False)
+    opex_usd['Category'] = opex_usd['label'].str.replace('Opex: ', '', case=False)
     
     category_summary = opex_usd.groupby('Category')['amount_usd'].sum().reset_index()
     category_summary.rename(columns={'amount_usd': 'Amount (USD)'}, inplace=True)
@@ -132,27 +546,29 @@ def get_opex_breakdown(actuals_df: pd.DataFrame, fx_df: pd.DataFrame, month_name
     return category_summary.sort_values(by='Amount (USD)', ascending=False)
 
 
+@timed('tools.get_cash_runway')
 def get_cash_runway(actuals_df: pd.DataFrame, cash_df: pd.DataFrame, fx_df: pd.DataFrame):
     """Calculates the current cash runway in months."""
+    return _cash_runway(_ledger_cube(actuals_df, fx_df), cash_df)
+
+
+def _income_expenses(cube: pd.DataFrame, last_n_months: int = 3) -> pd.DataFrame:
+    """Returns the monthly USD 'Income' and 'Expenses' of the last N months of the cube."""
+    latest_month = cube.index.get_level_values('month_period').max()
+    start_period = latest_month - last_n_months + 1
+
+    pnl = _monthly_pnl(cube, start_period)
+    return pd.DataFrame({
+        'Income': pnl['revenue'],
+        'Expenses': pnl['cogs'] + pnl['opex'],
+    })
+
+
+def _cash_runway(cube: pd.DataFrame, cash_df: pd.DataFrame):
     # 1. Calculate Average Monthly Net Burn over last 3 months
-    latest_month = actuals_df['month_period'].max()
-    start_period = latest_month - 2  # 3 months including the latest
-    
-    recent_actuals = actuals_df[actuals_df['month_period'] >= start_period].copy()
-    if recent_actuals.empty:
+    monthly_summary = _income_expenses(cube, 3)
+    if monthly_summary.empty:
         return {"error": "Not enough recent financial data to calculate net burn."}
-        
-    recent_actuals_usd = _convert_to_usd(recent_actuals, fx_df)
-    
-    def sum_by_category(df, category):
-        return df[df['account_category'].str.lower() == category]['amount_usd'].sum()
-    def sum_by_prefix(df, prefix):
-        return df[df['account_category'].str.lower().str.startswith(prefix)]['amount_usd'].sum()
-
-    monthly_summary = recent_actuals_usd.groupby('month_period').apply(lambda x: pd.Series({
-        'Income': sum_by_category(x, 'revenue'),
-        'Expenses': sum_by_category(x, 'cogs') + sum_by_prefix(x, 'opex:')
-    }), include_groups=False).reset_index()
 
     monthly_summary['net_flow'] = monthly_summary['Income'] - monthly_summary['Expenses']
     
@@ -174,13 +590,16 @@ def get_cash_runway(actuals_df: pd.DataFrame, cash_df: pd.DataFrame, fx_df: pd.D
 
     return {"runway_months": runway_months, "latest_cash": latest_cash, "avg_burn": avg_monthly_burn}
 
+@timed('tools.get_cash_trend')
 def get_cash_trend(cash_df: pd.DataFrame, last_n_months: int):
     """Calculates the cash balance over a trend period."""
-    latest_month = cash_df['month_period'].max()
+    cash_periods = pd.Series(_as_periods(cash_df['month_period']), index=cash_df.index)
+    latest_month = cash_periods.max()
     start_period = latest_month - last_n_months + 1
-    
-    recent_cash = cash_df[cash_df['month_period'] >= start_period].copy()
-    
+
+    recent = cash_periods >= start_period
+    recent_cash = pd.DataFrame({'month_period': cash_periods[recent], 'cash_usd': cash_df.loc[recent, 'cash_usd']})
+
     monthly_summary = recent_cash.groupby('month_period')['cash_usd'].sum().reset_index()
     monthly_summary = monthly_summary.sort_values('month_period')
     monthly_summary['month_str'] = monthly_summary['month_period'].dt.strftime('%b %Y')
@@ -0,0 +1,206 @@
+"""
+Budget-vs-actual variance for every month x account category x entity.
+
+build_variance_matrix() sums both ledgers in USD per (month, category,
+entity) cell and scatters the sums into two dense arrays on the same
+(period, category, entity) axes: the union of both ledgers' months (every
+month from the first to the last), categories (lower-cased, as in the P&L
+cube) and entities. Absolute and percentage variance for the whole grid are
+then single array operations, and slices by month range, rankings and
+heatmaps are views of those arrays. The matrix is memoized per dataset
+version like the P&L cube.
+
+A variance is favorable when actual revenue is above budget, or actual COGS
+or Opex below it; other categories count as income.
+"""
+import numpy as np
+import pandas as pd
+from . import tools
+from .instrumentation import timed
+
+CONSOLIDATED = 'Consolidated'
+DEFAULT_TOP_N = 10
+
+
+def ledger_cells(ledger_df: pd.DataFrame, fx_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sums a ledger in USD per (month, category, entity). Returns one row per
+    cell with 'month_ordinal', 'category', 'label', 'entity' and 'amount_usd'.
+    Ledgers without an entity column, and lines without an entity, are booked
+    to the CONSOLIDATED entity.
+    """
+    key_columns = ['month_period', 'account_category', 'entity', 'currency']
+    columns = {col: ledger_df[col] for col in key_columns if col in ledger_df.columns}
+    codes, uniques = {}, {}
+    for col, values in columns.items():
+        # Keep NaN as a value: its default code of -1 would pick the last entity or currency.
+        codes[col], uniques[col] = pd.factorize(values, use_na_sentinel=False)
+    grouped = pd.DataFrame({**codes, 'amount': ledger_df['amount'].to_numpy()})
+    cells = grouped.groupby(list(columns), sort=False)['amount'].sum().reset_index()
+
+    periods = tools._as_periods(uniques['month_period'])[cells['month_period']]
+    labels = pd.Index(uniques['account_category']).astype(str)[cells['account_category']]
+    if 'currency' in columns:
+        currencies = pd.Index(uniques['currency']).astype(str)[cells['currency']]
+        # Missing rates convert at 1.0, as in the P&L cube (which warns about them).
+        amount_usd, _ = tools._fx_table(fx_df).convert(cells['amount'], periods, currencies)
+    else:
+        amount_usd = cells['amount'].to_numpy(dtype=float)
+    if 'entity' in columns:
+        entities = pd.Index(uniques['entity']).astype(str).fillna(CONSOLIDATED)[cells['entity']]
+    else:
+        entities = np.full(len(cells), CONSOLIDATED)
+
+    return pd.DataFrame({
+        'month_ordinal': periods.asi8,
+        'category': labels.str.lower(),
+        'label': labels,
+        'entity': entities,
+        'amount_usd': amount_usd,
+    })
+
+
+class VarianceMatrix:
+    """Actual, budget and variance arrays shaped (periods, categories, entities)."""
+
+    def __init__(self, actual_cells: pd.DataFrame, budget_cells: pd.DataFrame):
+        cells = pd.concat([actual_cells, budget_cells], ignore_index=True)
+        if len(cells):
+            first, last = tools._as_periods(np.array([cells['month_ordinal'].min(), cells['month_ordinal'].max()]))
+            self.periods = pd.period_range(first, last, freq='M')
+        else:
+            self.periods = pd.PeriodIndex([], freq='M')
+        self.categories = pd.Index(sorted(cells['category'].unique()), dtype=object)
+        self.entities = pd.Index(sorted(cells['entity'].unique()), dtype=object)
+        # Display label: the category's first spelling, actuals first.
+        self.labels = cells.groupby('category', sort=False)['label'].first().reindex(self.categories)
+        self.favorable_sign = np.where(np.isin(tools._pnl_line(pd.Series(self.categories, dtype=object)),
+                                               ['cogs', 'opex']), -1.0, 1.0)
+
+        shape = (len(self.periods), len(self.categories), len(self.entities))
+        self.actual = self._scatter(actual_cells, shape)
+        self.budget = self._scatter(budget_cells, shape)
+        self.variance = self.actual - self.budget
+        self.variance_pct = self._pct(self.variance, self.budget)
+
+    def _scatter(self, cells: pd.DataFrame, shape) -> np.ndarray:
+        if not len(cells):
+            return np.zeros(shape)
+        flat = np.ravel_multi_index((
+            cells['month_ordinal'].to_numpy() - self.periods[0].ordinal,
+            self.categories.get_indexer(cells['category']),
+            self.entities.get_indexer(cells['entity']),
+        ), shape)
+        amounts = cells['amount_usd'].to_numpy(dtype=float)
+        # Sum each cell's rows in the same order whatever order the cells came in,
+        # so the pandas and SQLite backends agree to the last bit.
+        order = np.lexsort((amounts, flat))
+        return np.bincount(flat[order], weights=amounts[order], minlength=int(np.prod(shape))).reshape(shape)
+
+    @staticmethod
+    def _pct(variance: np.ndarray, budget: np.ndarray) -> np.ndarray:
+        """Variance as a percentage of |budget|; NaN where there is no budget."""
+        return np.divide(variance * 100, np.abs(budget), out=np.full(variance.shape, np.nan), where=budget != 0)
+
+    def _months(self, start=None, end=None) -> slice:
+        """The slice of the period axis covering [start, end]; None means the first or last month."""
+        if not len(self.periods):
+            return slice(0, 0)
+        first = self.periods[0].ordinal
+        i = 0 if start is None else min(max(start.ordinal - first, 0), len(self.periods))
+        j = len(self.periods) if end is None else min(max(end.ordinal - first + 1, 0), len(self.periods))
+        return slice(i, max(i, j))
+
+    def _frame(self, months: slice, p, c, e) -> pd.DataFrame:
+        """Builds one row per (period, category, entity) cell, indexed within the months slice."""
+        variance = self.variance[months][p, c, e]
+        return pd.DataFrame({
+            'month_period': self.periods[months][p],
+            'category': self.categories[c],
+            'label': self.labels.to_numpy()[c],
+            'entity': self.entities[e],
+            'actual': self.actual[months][p, c, e],
+            'budget': self.budget[months][p, c, e],
+            'variance': variance,
+            'variance_pct': self.variance_pct[months][p, c, e],
+            'favorable': variance * self.favorable_sign[c] >= 0,
+        })
+
+    def to_frame(self, start=None, end=None) -> pd.DataFrame:
+        """Returns every cell with an actual or a budget in [start, end] as one row."""
+        months = self._months(start, end)
+        return self._frame(months, *np.nonzero((self.actual[months] != 0) | (self.budget[months] != 0)))
+
+    def summary(self, start=None, end=None) -> dict:
+        """
+        Returns the net favorable (+) / unfavorable (-) variance in USD over
+        [start, end], and how many cells have a budget or actual and how many
+        of them are unfavorable.
+        """
+        months = self._months(start, end)
+        favorable = self.variance[months] * self.favorable_sign[np.newaxis, :, np.newaxis]
+        cells = (self.actual[months] != 0) | (self.budget[months] != 0)
+        return {
+            "net_variance": float(favorable.sum()),
+            "cells": int(cells.sum()),
+            "unfavorable": int((cells & (favorable < 0)).sum()),
+        }
+
+    def heatmap(self, start=None, end=None, entity: str = None) -> pd.DataFrame:
+        """
+        Returns the favorable (+) / unfavorable (-) variance in USD per category
+        (rows, by label) and month (columns), for one entity or all of them.
+        """
+        months = self._months(start, end)
+        variance = self.variance[months]
+        if entity is not None:
+            variance = variance[..., [self.entities.get_loc(entity)]]
+        grid = variance.sum(axis=2) * self.favorable_sign
+        return pd.DataFrame(grid.T, index=pd.Index(self.labels.to_numpy(), name='Category'),
+                            columns=self.periods[months].strftime('%b %Y'))
+
+    def largest_misses(self, start=None, end=None, n: int = DEFAULT_TOP_N) -> pd.DataFrame:
+        """
+        Returns the n cells with the largest unfavorable variance in [start, end],
+        largest first. Favorable variances (revenue above budget, costs below)
+        are not misses, however large.
+        """
+        months = self._months(start, end)
+        shortfall = -(self.variance[months] * self.favorable_sign[np.newaxis, :, np.newaxis]).ravel()
+        n = min(n, int(np.count_nonzero(shortfall > 0)))
+        top = np.argpartition(shortfall, -n)[-n:] if n else np.zeros(0, dtype=np.int64)
+        top = top[np.argsort(-shortfall[top], kind='stable')]
+        return self._frame(months, *np.unravel_index(top, self.variance[months].shape))
+
+
+@timed('variance.build_variance_matrix')
+def build_variance_matrix(actuals_df: pd.DataFrame, budget_df: pd.DataFrame, fx_df: pd.DataFrame) -> VarianceMatrix:
+    return VarianceMatrix(ledger_cells(actuals_df, fx_df), ledger_cells(budget_df, fx_df))
+
+
+def variance_matrix(actuals_df: pd.DataFrame, budget_df: pd.DataFrame, fx_df: pd.DataFrame) -> VarianceMatrix:
+    """Returns the dataset's VarianceMatrix, memoized per dataset version."""
+    return tools._dataset_memo('variance_matrix', (actuals_df, budget_df, fx_df), build_variance_matrix)
+
+# --- Tool Functions ---
+
+@timed('variance.get_variance_report')
+def get_variance_report(actuals_df: pd.DataFrame, budget_df: pd.DataFrame, fx_df: pd.DataFrame,
+                        start=None, end=None, top_n: int = DEFAULT_TOP_N):
+    """
+    Returns the budget variance over the months [start, end] (default: all):
+    the 'heatmap' grid, the top_n 'misses' and the summary() counts. Returns
+    None when neither ledger has data in the range.
+    """
+    return _variance_report(variance_matrix(actuals_df, budget_df, fx_df), start, end, top_n)
+
+
+def _variance_report(matrix: VarianceMatrix, start=None, end=None, top_n: int = DEFAULT_TOP_N):
+    months = matrix._months(start, end)
+    if months.stop <= months.start:
+        return None
+    return {
+        "heatmap": matrix.heatmap(start, end),
+        "misses": matrix.largest_misses(start, end, top_n),
+        **matrix.summary(start, end),
+    }
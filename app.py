@@ -1,5 +1,7 @@
 import streamlit as st
 import pandas as pd
+from agent import history, instrumentation, tools
+from agent.jobs import REPORT_JOBS
 from agent.planner import route_query
 from agent.reporting import generate_pdf_report
 
@@ -45,25 +47,29 @@ sample_questions = [
     "Show Gross Margin % trend for the last 6 months.",
     "Break down Opex by category for May 2025.",
     "What is our cash runway right now?",
+    "Run cash runway scenarios.",
+    "Show the budget variance heatmap for 2025.",
 ]
 
 # --- Initialize Chat History ---
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-    st.session_state.messages.append(
-        {"role": "assistant", "content": "How can I help you analyze the latest financials?"}
-    )
+# Charts are kept as compact serialized specs, and the history is capped (see agent.history).
+if "history" not in st.session_state:
+    st.session_state.history = history.ChatHistory()
+    st.session_state.history.append("assistant", "How can I help you analyze the latest financials?")
 
 # --- Display chat messages from history ---
-for i, message in enumerate(st.session_state.messages):
+chat_history = st.session_state.history
+eager_charts = chat_history.eager_chart_ids()
+for message in chat_history:
     with st.chat_message(message["role"]):
-        if "chart" in message and message["chart"] is not None:
-            st.markdown(message["content"])
-            st.plotly_chart(
-                message["chart"], use_container_width=True, key=f"history_chart_{i}"
-            )
-        else:
-            st.markdown(message["content"])
+        st.markdown(message["content"])
+        if message["chart"] is not None:
+            # Older charts are only decoded and sent to the browser once asked for.
+            if message["id"] in eager_charts or st.toggle("Show chart", key=f"show_chart_{message['id']}"):
+                st.plotly_chart(
+                    history.load_chart(message["chart"]), use_container_width=True,
+                    key=f"history_chart_{message['id']}"
+                )
 
 
 # --- Handle Sidebar Clicks and Chat Input ---
@@ -87,19 +93,68 @@ with st.sidebar:
     st.markdown("---")
 
     if st.button("Export PDF Report", use_container_width=True):
-        with st.spinner("Generating PDF report..."):
-            st.session_state.pdf_report = generate_pdf_report()
-
-    if "pdf_report" in st.session_state and st.session_state.pdf_report is not None:
-        st.download_button(
-            label="Download PDF Report",
-            data=st.session_state.pdf_report,
-            file_name="financial_report.pdf",
-            mime="application/pdf",
-            use_container_width=True,
-        )
+        # Runs in the background; identical requests from any session share one job.
+        try:
+            st.session_state.report_job = REPORT_JOBS.submit(
+                ("pdf_report", tools.dataset_version()), generate_pdf_report
+            )
+        except Exception as e:
+            st.error(f"Could not start the PDF export: {e}")
+
+    report_job = st.session_state.get("report_job")
+    report_pending = report_job is not None and not report_job.done()
+
+    # Only this fragment re-runs while the report is being built, polling the job once a second.
+    @st.fragment(run_every=1 if report_pending else None)
+    def report_status():
+        job = st.session_state.get("report_job")
+        if job is None:
+            return
+        if not job.done():
+            st.progress(job.progress, text=job.message)
+            return
+        if report_pending:
+            # Finished since the last full run: rerun the app once to stop polling.
+            st.rerun()
+        if job.error is not None:
+            st.error(f"PDF export failed: {job.error}")
+        else:
+            st.download_button(
+                label="Download PDF Report",
+                data=job.result(),
+                file_name="financial_report.pdf",
+                mime="application/pdf",
+                use_container_width=True,
+            )
+
+    report_status()
 
     st.markdown("---")
+
+    usage = chat_history.usage()
+    st.progress(
+        min(usage["bytes"] / usage["max_bytes"], 1.0),
+        text=f"Chat history: {usage['bytes'] / 1024:,.1f} of {usage['max_bytes'] / 1024:,.0f} KB, "
+             f"{usage['messages']} of {usage['max_messages']} messages ({usage['charts']} charts)"
+             + (f"; {usage['dropped']} older messages dropped" if usage["dropped"] else ""),
+    )
+
+    with st.expander("Debug"):
+        # Instrumentation is process-wide, so this switch affects every session.
+        record_timings = st.checkbox("Record timings", value=instrumentation.is_enabled())
+        if record_timings != instrumentation.is_enabled():
+            instrumentation.enable() if record_timings else instrumentation.disable()
+        st.checkbox("Profile questions with cProfile", key="profile_questions")
+        if record_timings:
+            span_stats = instrumentation.summary()
+            if span_stats:
+                st.dataframe(pd.DataFrame(span_stats), hide_index=True, use_container_width=True)
+            if st.session_state.get("last_trace") is not None:
+                st.download_button("Download last trace (JSON)", st.session_state.last_trace.to_json(),
+                                   file_name="trace.json", mime="application/json", use_container_width=True)
+            st.download_button("Download metrics (Prometheus)", instrumentation.prometheus_text(),
+                               file_name="metrics.txt", mime="text/plain", use_container_width=True)
+
     st.info("This is a demo application. The data is from the provided `data.xlsx` file in the `fixtures` directory.")
 
 
@@ -114,7 +169,7 @@ if st.session_state.prompt_from_sidebar:
 
 if prompt:
     # Add user message to chat history
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    chat_history.append("user", prompt)
     # Display user message in chat message container
     with st.chat_message("user"):
         st.markdown(prompt)
@@ -123,7 +178,12 @@ if prompt:
     with st.chat_message("assistant"):
         with st.spinner("Analyzing data..."):
             try:
-                response = route_query(prompt)
+                profile_report = None
+                with instrumentation.trace() as trace:
+                    if st.session_state.get("profile_questions"):
+                        response, profile_report = instrumentation.profile_call(route_query, prompt)
+                    else:
+                        response = route_query(prompt)
                 
                 # Check if the response contains a chart
                 if response.get("chart"):
@@ -131,21 +191,25 @@ if prompt:
                     st.plotly_chart(
                         response["chart"],
                         use_container_width=True,
-                        key=f"live_chart_{len(st.session_state.messages)}",
+                        key=f"live_chart_{len(chat_history)}_{chat_history.dropped}",
                     )
                 else:
                     st.markdown(response["text"])
+
+                if trace.spans:
+                    st.session_state.last_trace = trace
+                    with st.expander("Timings"):
+                        st.text("\n".join(f"{'  ' * depth}{name}: {seconds * 1000:.1f} ms"
+                                           for name, seconds, depth in trace.summary()))
+                if profile_report:
+                    with st.expander("Profile"):
+                        st.code(profile_report)
                 
                 # Add assistant response to chat history
-                assistant_message = {
-                    "role": "assistant", 
-                    "content": response["text"],
-                    "chart": response.get("chart")
-                }
-                st.session_state.messages.append(assistant_message)
+                chat_history.append("assistant", response["text"], response.get("chart"))
 
             except Exception as e:
                 error_message = f"Sorry, I encountered an error: {e}"
                 st.error(error_message)
-                st.session_state.messages.append({"role": "assistant", "content": error_message})
+                chat_history.append("assistant", error_message)
 
@@ -0,0 +1,75 @@
+"""
+Compares the vectorized monthly P&L summary used by get_financial_metric_trend
+and get_cash_runway against the previous groupby().apply() implementation.
+
+Usage:
+    python -m benchmarks.bench_monthly_summary [--months 36] [--lines 10000]
+"""
+import argparse
+import timeit
+import pandas as pd
+from agent import tools
+from benchmarks.synthetic import make_dataset
+
+
+def legacy_trend(actuals_df, fx_df, metric, last_n_months):
+    """The per-group apply implementation the tools used before vectorization."""
+    latest_month = actuals_df['month_period'].max()
+    start_period = latest_month - last_n_months + 1
+    recent = actuals_df[actuals_df['month_period'] >= start_period].copy()
+    recent = recent.merge(fx_df, on=['month_period', 'currency'], how='left')
+    recent['amount_usd'] = recent['amount'] / recent['rate_to_usd'].fillna(1.0)
+
+    def sum_by_category(df, category):
+        return df[df['account_category'].str.lower() == category]['amount_usd'].sum()
+
+    def sum_by_prefix(df, prefix):
+        return df[df['account_category'].str.lower().str.startswith(prefix)]['amount_usd'].sum()
+
+    summary = recent.groupby('month_period').apply(lambda x: pd.Series({
+        'Revenue': sum_by_category(x, 'revenue'),
+        'COGS': sum_by_category(x, 'cogs'),
+        'Opex': sum_by_prefix(x, 'opex:')
+    }), include_groups=False).reset_index()
+    if metric == 'Gross Margin':
+        summary['Metric'] = summary.apply(
+            lambda row: ((row['Revenue'] - row['COGS']) / row['Revenue']) * 100 if row['Revenue'] > 0 else 0,
+            axis=1
+        )
+    else:
+        summary['Metric'] = summary['Revenue'] - summary['COGS'] - summary['Opex']
+    summary['month_str'] = summary['month_period'].dt.strftime('%b %Y')
+    return summary[['month_str', 'Metric']]
+
+
+def _best_of(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--months", type=int, default=36)
+    parser.add_argument("--lines", type=int, default=10_000, help="Actuals lines per month")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    actuals_df, _, _, fx_df = make_dataset(args.months, args.lines)
+    print(f"{len(actuals_df):,} actuals lines over {args.months} months")
+
+    for metric in ('Gross Margin', 'EBITDA'):
+        expected = legacy_trend(actuals_df, fx_df, metric, args.months)
+        result = tools.get_financial_metric_trend(actuals_df, fx_df, metric, args.months)
+        pd.testing.assert_frame_equal(result.reset_index(drop=True), expected, check_exact=False, rtol=1e-9)
+
+        legacy_s = _best_of(lambda: legacy_trend(actuals_df, fx_df, metric, args.months), args.repeat)
+        # Plain frames carry no dataset version, so the cube is rebuilt on every call.
+        cold_s = _best_of(lambda: tools.get_financial_metric_trend(actuals_df, fx_df, metric, args.months), args.repeat)
+        cube = tools.build_ledger_cube(actuals_df, fx_df)
+        summary_s = _best_of(lambda: tools._monthly_pnl(cube, cube.index.get_level_values('month_period').min()), args.repeat)
+
+        print(f"{metric:>12}: legacy {legacy_s * 1000:8.1f}ms | vectorized {cold_s * 1000:8.1f}ms "
+              f"({legacy_s / cold_s:5.1f}x) | summary from cached cube {summary_s * 1000:6.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
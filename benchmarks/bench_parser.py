@@ -0,0 +1,79 @@
+"""
+Micro-benchmark of agent.parser.parse_query against the previous sequential
+re.search + substring routing, over a corpus of generated real-style questions.
+
+Usage:
+    python -m benchmarks.bench_parser [--size 5000]
+"""
+import argparse
+import random
+import re
+import timeit
+from agent.parser import MONTHS, parse_query
+
+TEMPLATES = [
+    "What was {month} {year} revenue vs budget in USD?",
+    "How did revenue compare to budget in {mon} {year}?",
+    "revenue vs budget {month}",
+    "Show Gross Margin % trend for the last {n} months.",
+    "What's the EBITDA trend over the past {n} months?",
+    "Break down Opex by category for {month} {year}.",
+    "opex breakdown {mon} {year}",
+    "What is our cash runway right now?",
+    "How many months of cash runway do we have?",
+    "Revenue vs budget for Q{q} {year}",
+    "Opex by category from {month} to {month2} {year}",
+    "Can you summarise the board deck for {month}?",
+    "Who is the CFO?",
+]
+
+
+def make_corpus(size: int, seed: int = 0):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        month, month2 = rng.sample(MONTHS, 2)
+        corpus.append(rng.choice(TEMPLATES).format(
+            month=month.capitalize(), month2=month2.capitalize(), mon=month[:3].capitalize(),
+            year=rng.choice([2023, 2024, 2025]), n=rng.choice([3, 6, 12, 24]), q=rng.randint(1, 4),
+        ))
+    return corpus
+
+
+def legacy_resolve(query):
+    """The sequential regex and substring routing route_query used before agent.parser."""
+    query_lower = query.lower()
+    month_match = re.search(r'(january|february|march|april|may|june|july|august|september|october|november|december)', query_lower)
+    year_match = re.search(r'(\d{4})', query_lower)
+    month_name = month_match.group(1).capitalize() if month_match else None
+    year = int(year_match.group(1)) if year_match else None
+    if 'revenue' in query_lower and 'budget' in query_lower:
+        return ('revenue_vs_budget', month_name, year)
+    if ('gross margin' in query_lower or 'ebitda' in query_lower) and 'trend' in query_lower:
+        num_months_match = re.search(r'(\d+)\s+months', query_lower)
+        return ('metric_trend', int(num_months_match.group(1)) if num_months_match else 6)
+    if 'opex' in query_lower and ('breakdown' in query_lower or 'category' in query_lower):
+        return ('opex_breakdown', month_name, year)
+    if 'cash runway' in query_lower:
+        return ('cash_runway',)
+    return ('fallback',)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    corpus = make_corpus(args.size)
+    agree = sum(legacy_resolve(q)[0] == parse_query(q).intent for q in corpus)
+
+    legacy_s = min(timeit.repeat(lambda: [legacy_resolve(q) for q in corpus], number=1, repeat=args.repeat))
+    parser_s = min(timeit.repeat(lambda: [parse_query(q) for q in corpus], number=1, repeat=args.repeat))
+
+    print(f"{len(corpus):,} queries, intent agreement with legacy routing: {agree / len(corpus):.1%}")
+    print(f"legacy: {legacy_s / len(corpus) * 1e6:6.2f}us/query | parser: {parser_s / len(corpus) * 1e6:6.2f}us/query")
+
+
+if __name__ == "__main__":
+    main()
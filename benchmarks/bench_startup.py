@@ -0,0 +1,134 @@
+"""
+Startup benchmark: import time and time to first answer, with a JSON baseline.
+
+Every round runs in a fresh Python process, so nothing is imported or cached
+beforehand. It times importing each entry module (planner, batch, server,
+reporting, the app's history) and, from the first import, answering a
+text-only question and a question with a chart.
+
+Each process also records which slow rendering dependencies (plotly, fpdf,
+kaleido) it loaded. An import or a text answer that loads one of them is
+reported as a regression whatever the timings say.
+
+Usage:
+    python -m benchmarks.bench_startup [--rounds 5] [--output startup.json]
+    python -m benchmarks.bench_startup --compare startup.json [--tolerance 1.3]
+
+With --compare the run exits with status 1 when any step's median is more
+than `tolerance` times (and 20ms) slower than in the baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ('plotly', 'fpdf', 'kaleido')
+# Startup times vary more between processes than warm timings within one.
+NOISE_FLOOR_S = 0.020
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _answer(query: str) -> str:
+    return "from agent import planner, tools\ntools.DATA_FILE = {data!r}\nplanner.route_query(" + repr(query) + ")"
+
+
+# step -> (code timed in a fresh process, with {data!r} for the dataset; whether it may load HEAVY_MODULES)
+STEPS = {
+    'import.agent.planner': ("import agent.planner", False),
+    'import.agent.batch': ("import agent.batch", False),
+    'import.agent.server': ("import agent.server", False),
+    'import.agent.reporting': ("import agent.reporting", False),
+    'import.agent.history': ("import agent.history", False),
+    'first_answer.text': (_answer("What is our cash runway right now?"), False),
+    'first_answer.chart': (_answer("What was June 2025 revenue vs budget in USD?"), True),
+}
+
+_CHILD = """
+import json, sys, time
+start = time.perf_counter()
+{code}
+print(json.dumps({{"seconds": time.perf_counter() - start, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def run_step(code: str, data_file: str) -> dict:
+    """Runs code in a fresh interpreter; returns its {'seconds', 'heavy'}."""
+    child = _CHILD.format(code=code.format(data=os.path.abspath(data_file)), heavy=HEAVY_MODULES)
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')]))}
+    out = subprocess.run([sys.executable, '-c', child], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run_startup(rounds: int = 5, data_file: str = 'fixtures/data.xlsx') -> dict:
+    results = {}
+    for step, (code, may_load_heavy) in STEPS.items():
+        runs = [run_step(code, data_file) for _ in range(rounds)]
+        samples = [run['seconds'] for run in runs]
+        heavy = sorted({module for run in runs for module in run['heavy']})
+        results[step] = {"min_s": min(samples), "median_s": statistics.median(samples), "rounds": rounds,
+                         "heavy_modules": heavy, "heavy_allowed": may_load_heavy}
+    return {
+        "meta": {
+            "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def heavy_imports(current: dict) -> list:
+    """Returns (step, modules) for every step that loaded a rendering dependency it should not need."""
+    return [(step, timing["heavy_modules"]) for step, timing in current["results"].items()
+            if timing["heavy_modules"] and not timing["heavy_allowed"]]
+
+
+def compare(baseline: dict, current: dict, tolerance: float = 1.3) -> list:
+    """Returns (step, baseline median, current median) for every regression."""
+    regressions = []
+    for step, timing in current["results"].items():
+        old = baseline.get("results", {}).get(step)
+        if not old:
+            continue
+        if timing["median_s"] > old["median_s"] * tolerance and timing["median_s"] - old["median_s"] > NOISE_FLOOR_S:
+            regressions.append((step, old["median_s"], timing["median_s"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark import time and time to first answer.")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--data", default="fixtures/data.xlsx", help="Dataset for the first answers")
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this file")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=1.3, help="Allowed slowdown factor (default: 1.3)")
+    args = parser.parse_args(argv)
+
+    result = run_startup(args.rounds, args.data)
+    for step, timing in result["results"].items():
+        loaded = f"  loads {', '.join(timing['heavy_modules'])}" if timing["heavy_modules"] else ""
+        print(f"  {step:28} median {timing['median_s'] * 1000:9.2f}ms  min {timing['min_s'] * 1000:9.2f}ms{loaded}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    failed = False
+    for step, modules in heavy_imports(result):
+        print(f"REGRESSION {step} imports {', '.join(modules)}", file=sys.stderr)
+        failed = True
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), result, args.tolerance)
+        for step, old, new in regressions:
+            print(f"REGRESSION {step}: {old * 1000:.2f}ms -> {new * 1000:.2f}ms", file=sys.stderr)
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""
+End-to-end benchmark suite with a JSON baseline for regression checks.
+
+Times load_data, every tool function, a 100k-path runway simulation,
+route_query for each intent and generate_pdf_report on synthetic datasets at several scales. "cold" timings
+start from empty caches (dataset, derived cubes, answers), "warm" ones from a
+primed process. Each result records the best and median of several rounds.
+
+Usage:
+    python -m benchmarks.bench_suite [--scales small,medium] [--rounds 5] [--output baseline.json]
+    python -m benchmarks.bench_suite --compare baseline.json [--tolerance 1.3]
+
+With --compare the run exits with status 1 when any benchmark's median is
+more than `tolerance` times (and 2ms) slower than in the baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import numpy as np
+import pandas as pd
+from agent import planner, reporting, runway, tools, variance
+from benchmarks.synthetic import write_dataset
+
+# Every scale ends in December 2025, so the sample questions below always have data.
+SCALES = {
+    'small': dict(months=12, lines_per_month=1_000, entities=2, currencies=2),
+    'medium': dict(months=36, lines_per_month=10_000, entities=4, currencies=3),
+    'large': dict(months=60, lines_per_month=50_000, entities=8, currencies=5),
+}
+QUERIES = {
+    'revenue_vs_budget': "What was June 2025 revenue vs budget in USD?",
+    'metric_trend': "Show Gross Margin % trend for the last 6 months.",
+    'opex_breakdown': "Break down Opex by category for May 2025.",
+    'cash_runway': "What is our cash runway right now?",
+    'runway_scenarios': "Run cash runway scenarios.",
+    'variance': "Show the budget variance heatmap for 2025.",
+}
+NOISE_FLOOR_S = 0.002
+DATASET_DIR = os.path.join('.cache', 'bench')
+
+
+def dataset_path(scale: str, fmt: str = 'snapshot') -> str:
+    """Writes the scale's dataset once and returns its path."""
+    params = SCALES[scale]
+    start = str(pd.Period('2025-12', freq='M') - params['months'] + 1)
+    name = '-'.join(f"{key}{value}" for key, value in sorted(params.items()))
+    path = os.path.join(DATASET_DIR, f"{scale}-{name}" + ('.xlsx' if fmt == 'xlsx' else ''))
+    ready = os.path.exists(os.path.join(path, 'manifest.json')) if fmt == 'snapshot' else os.path.exists(path)
+    if not ready:
+        os.makedirs(DATASET_DIR, exist_ok=True)
+        write_dataset(path, fmt, start=start, **params)
+    return path
+
+
+def _time(fn, rounds: int, setup=None) -> dict:
+    samples = []
+    for _ in range(rounds):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {"min_s": min(samples), "median_s": statistics.median(samples), "rounds": rounds}
+
+
+def _reset(path: str):
+    """Empties every cache, then reloads the dataset so only derived work is timed."""
+    tools.clear_data_cache()
+    planner.QUERY_CACHE.clear()
+    tools.load_data(path)
+
+
+def bench_scale(scale: str, rounds: int = 5, include_xlsx: bool = None, include_report: bool = True) -> dict:
+    """Runs every benchmark against one scale; returns {benchmark name: timing}."""
+    path = dataset_path(scale)
+    previous_data_file, tools.DATA_FILE = tools.DATA_FILE, path
+    results = {}
+    try:
+        results['load_data.cold'] = _time(lambda: tools.load_data(path), rounds, setup=tools.clear_data_cache)
+        results['load_data.warm'] = _time(lambda: tools.load_data(path), rounds)
+        if include_xlsx if include_xlsx is not None else scale == 'small':
+            xlsx = dataset_path(scale, 'xlsx')
+            results['load_data.xlsx'] = _time(lambda: tools.load_data(xlsx), max(1, rounds // 2),
+                                              setup=tools.clear_data_cache)
+
+        actuals_df, budget_df, cash_df, fx_df = tools.load_data(path)
+        latest = tools._as_periods(actuals_df['month_period']).max()
+        month_name, year = latest.strftime('%B'), latest.year
+        tool_calls = {
+            'get_revenue_vs_budget': lambda: tools.get_revenue_vs_budget(actuals_df, budget_df, fx_df, month_name, year),
+            'get_financial_metric_trend': lambda: tools.get_financial_metric_trend(actuals_df, fx_df, 'Gross Margin', 12),
+            'get_opex_breakdown': lambda: tools.get_opex_breakdown(actuals_df, fx_df, month_name, year),
+            'get_cash_runway': lambda: tools.get_cash_runway(actuals_df, cash_df, fx_df),
+            'get_cash_trend': lambda: tools.get_cash_trend(cash_df, 6),
+        }
+        for name, call in tool_calls.items():
+            # Cold: the frames' cubes are rebuilt; the frames themselves stay loaded.
+            results[f'tools.{name}.cold'] = _time(call, rounds, setup=lambda: tools._DERIVED_CACHE.clear())
+            results[f'tools.{name}.warm'] = _time(call, rounds)
+        report = lambda: variance.get_variance_report(actuals_df, budget_df, fx_df)  # noqa: E731
+        results['variance.get_variance_report.cold'] = _time(report, rounds, setup=lambda: tools._DERIVED_CACHE.clear())
+        results['variance.get_variance_report.warm'] = _time(report, rounds)
+        results['runway.simulate_runway.100k'] = _time(
+            lambda: runway.simulate_runway(actuals_df, cash_df, fx_df, paths=100_000), max(1, rounds // 2))
+
+        for intent, query in QUERIES.items():
+            run = lambda: planner.route_query(query)  # noqa: E731
+            results[f'route_query.{intent}.cold'] = _time(run, rounds, setup=lambda: _reset(path))
+            results[f'route_query.{intent}.warm'] = _time(run, rounds)
+
+        if include_report:
+            try:
+                results['generate_pdf_report'] = _time(lambda: reporting.generate_pdf_report(use_cache=False),
+                                                       max(1, rounds // 2))
+            except Exception as e:  # kaleido needs a local Chrome
+                results['generate_pdf_report'] = {"skipped": str(e).splitlines()[0]}
+    finally:
+        tools.DATA_FILE = previous_data_file
+        tools.clear_data_cache()
+        planner.QUERY_CACHE.clear()
+    return results
+
+
+def run_suite(scales, rounds: int = 5, include_report: bool = True) -> dict:
+    return {
+        "meta": {
+            "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "scales": {
+            scale: {"params": SCALES[scale], "results": bench_scale(scale, rounds, include_report=include_report)}
+            for scale in scales
+        },
+    }
+
+
+def compare(baseline: dict, current: dict, tolerance: float = 1.3) -> list:
+    """Returns (scale, benchmark, baseline median, current median) for every regression."""
+    regressions = []
+    for scale, entry in current["scales"].items():
+        old_results = baseline.get("scales", {}).get(scale, {}).get("results", {})
+        for name, timing in entry["results"].items():
+            old = old_results.get(name)
+            if not old or "median_s" not in old or "median_s" not in timing:
+                continue
+            if timing["median_s"] > old["median_s"] * tolerance and timing["median_s"] - old["median_s"] > NOISE_FLOOR_S:
+                regressions.append((scale, name, old["median_s"], timing["median_s"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark load_data, the tools, route_query and the PDF report.")
+    parser.add_argument("--scales", default="small,medium", help=f"Comma-separated, from: {', '.join(SCALES)}")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--no-report", action="store_true", help="Skip generate_pdf_report")
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this file")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=1.3, help="Allowed slowdown factor (default: 1.3)")
+    args = parser.parse_args(argv)
+
+    scales = [s.strip() for s in args.scales.split(',') if s.strip()]
+    unknown = set(scales) - set(SCALES)
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(sorted(unknown))}")
+
+    result = run_suite(scales, args.rounds, include_report=not args.no_report)
+    for scale, entry in result["scales"].items():
+        print(f"[{scale}] {entry['params']}")
+        for name, timing in entry["results"].items():
+            if "skipped" in timing:
+                print(f"  {name:45} skipped: {timing['skipped']}")
+            else:
+                print(f"  {name:45} median {timing['median_s'] * 1000:9.2f}ms  min {timing['min_s'] * 1000:9.2f}ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), result, args.tolerance)
+        for scale, name, old, new in regressions:
+            print(f"REGRESSION [{scale}] {name}: {old * 1000:.2f}ms -> {new * 1000:.2f}ms", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
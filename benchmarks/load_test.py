@@ -0,0 +1,109 @@
+"""
+Load-test client for the HTTP API (agent.server).
+
+Sends a mix of sample questions to /query from N concurrent keep-alive
+connections and reports throughput and latency percentiles. Start the
+server first, e.g. `python -m agent.server --workers 4`.
+
+Usage:
+    python -m benchmarks.load_test [--url http://127.0.0.1:8000] [--concurrency 16] [--requests 2000]
+        [--charts] [--endpoint query|batch|report]
+"""
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from .bench_parser import make_corpus
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def run_load_test(url: str, concurrency: int = 16, requests: int = 2000, endpoint: str = 'query',
+                  charts: bool = False, batch_size: int = 50) -> dict:
+    """Returns requests/s, error count and latency percentiles (ms) for one run."""
+    parts = urlsplit(url)
+    corpus = make_corpus(max(requests, batch_size))
+    counter = iter(range(requests))
+    lock = threading.Lock()
+    latencies, errors = [], []
+
+    def request_for(i):
+        if endpoint == 'query':
+            return 'POST', '/query', {"query": corpus[i], "include_chart": charts}
+        if endpoint == 'batch':
+            return 'POST', '/batch', {"queries": corpus[i:i + batch_size], "include_charts": charts}
+        return 'GET', '/report', None
+
+    def worker():
+        connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=120)
+        try:
+            while True:
+                with lock:
+                    i = next(counter, None)
+                if i is None:
+                    return
+                method, path, body = request_for(i)
+                payload = json.dumps(body).encode() if body is not None else None
+                start = time.perf_counter()
+                try:
+                    connection.request(method, path, body=payload, headers={"Content-Type": "application/json"})
+                    response = connection.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                except (OSError, http.client.HTTPException) as e:
+                    connection.close()
+                    ok, response = False, e
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    latencies.append(elapsed)
+                    if not ok:
+                        errors.append(getattr(response, 'status', str(response)))
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "endpoint": endpoint,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "mean_ms": statistics.fmean(latencies) if latencies else float('nan'),
+        "p50_ms": _percentile(latencies, 0.50),
+        "p95_ms": _percentile(latencies, 0.95),
+        "p99_ms": _percentile(latencies, 0.99),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the CFO Copilot HTTP API.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--endpoint", choices=["query", "batch", "report"], default="query")
+    parser.add_argument("--charts", action="store_true", help="Ask for charts (Plotly JSON) in answers")
+    args = parser.parse_args(argv)
+
+    result = run_load_test(args.url, args.concurrency, args.requests, args.endpoint, args.charts)
+    print(f"{result['requests']} {result['endpoint']} requests in {result['seconds']:.2f}s "
+          f"({result['requests_per_second']:.0f} req/s, {result['errors']} errors)")
+    print(f"latency ms: mean {result['mean_ms']:.1f}  p50 {result['p50_ms']:.1f}  "
+          f"p95 {result['p95_ms']:.1f}  p99 {result['p99_ms']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
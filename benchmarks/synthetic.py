@@ -0,0 +1,113 @@
+"""
+Deterministic synthetic ledgers for benchmarks.
+
+make_dataset() returns frames shaped like load_data() output, scalable by
+months, entities, currencies and lines per month; the same arguments always
+give the same data. write_dataset() stores them as a workbook (the real input
+format, practical up to a few hundred thousand lines) or as a snapshot
+directory that load_data() reads directly.
+
+Usage:
+    python -m benchmarks.synthetic OUT [--months 36] [--entities 2] [--currencies 2]
+        [--lines 10000] [--format snapshot|xlsx] [--seed 0]
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+CATEGORIES = ['Revenue', 'COGS', 'Opex:Marketing', 'Opex:Sales', 'Opex:R&D', 'Opex:Admin']
+CATEGORY_WEIGHTS = [0.3, 0.2, 0.15, 0.15, 0.1, 0.1]
+ENTITIES = ['ParentCo', 'EMEA', 'APAC', 'LATAM', 'NorthAm', 'Nordics', 'DACH', 'Benelux']
+# Units of each currency per USD in the first month.
+BASE_RATES = {'USD': 1.0, 'EUR': 0.9, 'GBP': 0.78, 'JPY': 150.0, 'CHF': 0.88, 'CAD': 1.35, 'AUD': 1.5, 'SEK': 10.5}
+
+
+def _names(pool, count, prefix):
+    return pool[:count] + [f"{prefix}{i}" for i in range(len(pool) + 1, count + 1)]
+
+
+def make_dataset(months: int = 36, lines_per_month: int = 10_000, seed: int = 0,
+                 entities: int = 2, currencies: int = 2, start: str = '2023-01'):
+    """
+    Returns (actuals_df, budget_df, cash_df, fx_df) shaped like load_data() output,
+    with `lines_per_month` actuals and budget lines for each of `months` months,
+    spread over `entities` entities and `currencies` currencies (USD first).
+    """
+    if not 1 <= currencies <= len(BASE_RATES):
+        raise ValueError(f"currencies must be between 1 and {len(BASE_RATES)}")
+    rng = np.random.default_rng(seed)
+    periods = pd.period_range(start, periods=months, freq='M')
+    entity_names = _names(ENTITIES, entities, 'Entity')
+    currency_names = list(BASE_RATES)[:currencies]
+
+    def ledger():
+        n = months * lines_per_month
+        df = pd.DataFrame({
+            'month': np.repeat(periods.strftime('%Y-%m'), lines_per_month),
+            'entity': rng.choice(entity_names, n),
+            'account_category': rng.choice(CATEGORIES, n, p=CATEGORY_WEIGHTS),
+            'amount': rng.integers(100, 10_000, n),
+            'currency': rng.choice(currency_names, n),
+        })
+        df['month_period'] = np.repeat(periods, lines_per_month)
+        return df
+
+    actuals_df, budget_df = ledger(), ledger()
+    cash_df = pd.DataFrame({
+        'month': periods.strftime('%Y-%m'),
+        'entity': 'Consolidated',
+        'cash_usd': np.linspace(6_000_000, 4_000_000, months).round(),
+        'month_period': periods,
+    })
+    # Non-USD rates drift up by 1/900 a month (EUR: 0.900, 0.901, 0.902, ...).
+    rates = [[1.0 if name == 'USD' else BASE_RATES[name] * (1 + i / 900) for name in currency_names]
+             for i in range(months)]
+    fx_df = pd.DataFrame({
+        'month': np.repeat(periods.strftime('%Y-%m'), currencies),
+        'currency': currency_names * months,
+        'rate_to_usd': np.ravel(rates),
+        'month_period': np.repeat(periods, currencies),
+    })
+    return actuals_df, budget_df, cash_df, fx_df
+
+
+def write_dataset(path: str, fmt: str = 'snapshot', **params) -> str:
+    """
+    Generates a dataset with make_dataset(**params) and writes it to path, as
+    an .xlsx workbook or as a snapshot directory. Returns path, ready to pass to
+    load_data() or to use as DATA_FILE.
+    """
+    frames = make_dataset(**params)
+    if fmt == 'xlsx':
+        from agent.tools import SHEETS
+        with pd.ExcelWriter(path) as writer:
+            for sheet, df in zip(SHEETS, frames):
+                df.drop(columns='month_period').to_excel(writer, sheet_name=sheet, index=False)
+    elif fmt == 'snapshot':
+        from agent import snapshot
+        snapshot.write_snapshot(frames, path)
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic ledger.")
+    parser.add_argument("out", help="Output .xlsx file or snapshot directory")
+    parser.add_argument("--months", type=int, default=36)
+    parser.add_argument("--entities", type=int, default=2)
+    parser.add_argument("--currencies", type=int, default=2)
+    parser.add_argument("--lines", type=int, default=10_000, help="Actuals and budget lines per month")
+    parser.add_argument("--format", choices=["snapshot", "xlsx"], default="snapshot")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    write_dataset(args.out, args.format, months=args.months, lines_per_month=args.lines, seed=args.seed,
+                  entities=args.entities, currencies=args.currencies)
+    print(f"Wrote {args.months * args.lines:,} lines per ledger to {args.out} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Shared fixtures and helpers for the test suite."""
+import asyncio
+import io
+import json
+import pytest
+import pandas as pd
+from PIL import Image
+from agent import tools
+
+# --- Workbook Fixtures ---
+
+def write_workbook(path, revenue=1000, opex=None):
+    """
+    Writes a minimal workbook with the four sheets load_data() expects. With
+    opex set, June also gets an 'Opex:Marketing' line of that amount.
+    """
+    sheets = {
+        'actuals': pd.DataFrame({
+            'month': ['2025-05', '2025-06'],
+            'entity': ['ParentCo', 'ParentCo'],
+            'account_category': ['Revenue', 'Revenue'],
+            'amount': [revenue, revenue],
+            'currency': ['USD', 'USD'],
+        }),
+        'budget': pd.DataFrame({
+            'month': ['2025-06'],
+            'entity': ['ParentCo'],
+            'account_category': ['Revenue'],
+            'amount': [900],
+            'currency': ['USD'],
+        }),
+        'cash': pd.DataFrame({'month': ['2025-06'], 'entity': ['Consolidated'], 'cash_usd': [5000]}),
+        'fx': pd.DataFrame({'month': ['2025-06'], 'currency': ['USD'], 'rate_to_usd': [1.0]}),
+    }
+    if opex is not None:
+        sheets['actuals'].loc[len(sheets['actuals'])] = ['2025-06', 'ParentCo', 'Opex:Marketing', opex, 'USD']
+    with pd.ExcelWriter(path) as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+
+
+@pytest.fixture(autouse=True)
+def report_cache_dir(tmp_path, monkeypatch):
+    """Points the on-disk report cache at a per-test directory."""
+    directory = tmp_path / "report-cache"
+    monkeypatch.setenv('REPORT_CACHE_DIR', str(directory))
+    return directory
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / "data.xlsx"
+    write_workbook(path)
+    tools.clear_data_cache()
+    yield str(path)
+    tools.clear_data_cache()
+
+# --- Mock Data Fixtures ---
+
+@pytest.fixture
+def mock_data_frames():
+    """Creates a dictionary of mock DataFrames for use in tests."""
+    actuals_data = {
+        'month': ['2025-06-30', '2025-06-30', '2025-05-31', '2025-05-31', '2025-04-30', '2025-04-30'],
+        'account_category': ['revenue', 'cogs', 'revenue', 'cogs', 'revenue', 'cogs'],
+        'amount': [2000, 800, 1800, 700, 1600, 600],
+        'currency': ['USD', 'USD', 'CAD', 'CAD', 'USD', 'USD']
+    }
+    budget_data = {
+        'month': ['2025-06-30'],
+        'account_category': ['revenue'],
+        'amount': [1900],
+        'currency': ['USD']
+    }
+    cash_data = {
+        'month': ['2025-06-30'],
+        'cash_usd': [5000]
+    }
+    fx_data = {
+        'month': ['2025-05-31'],
+        'currency': ['CAD'],
+        'rate_to_usd': [1.25]
+    }
+    
+    dfs = {
+        "actuals_df": pd.DataFrame(actuals_data),
+        "budget_df": pd.DataFrame(budget_data),
+        "cash_df": pd.DataFrame(cash_data),
+        "fx_df": pd.DataFrame(fx_data)
+    }
+
+    # Convert month columns to period objects, similar to load_data()
+    for name, df in dfs.items():
+        df['month_period'] = pd.to_datetime(df['month']).dt.to_period('M')
+
+    return dfs
+
+# --- Report and API Helpers ---
+
+def _tiny_png():
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 3), 'white').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class StubRenderer:
+    """Stands in for kaleido, which needs a headless Chromium."""
+
+    def __init__(self):
+        self.batches = []
+
+    def render_pngs(self, figures, **kwargs):
+        self.batches.append(list(figures))
+        return [_tiny_png() for _ in figures]
+
+
+async def call_app(app, method, path, body=None, headers=()):
+    """Sends one HTTP request straight to the ASGI app and returns (status, headers, body)."""
+    path, _, query_string = path.partition('?')
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query_string.encode(),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers], "server": ("test", 80), "client": ("test", 1),
+    }
+    payload = json.dumps(body).encode() if body is not None else b""
+    received = []
+
+    async def receive():
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        received.append(message)
+
+    await app(scope, receive, send)
+    start = next(m for m in received if m["type"] == "http.response.start")
+    content = b"".join(m.get("body", b"") for m in received if m["type"] == "http.response.body")
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, content
+
+
+def request_app(method, path, body=None, headers=()):
+    """Runs the server app (with its lifespan) for one request; returns (status, headers, body)."""
+    from agent import server
+
+    app = server.create_app(workers=2)
+
+    async def run():
+        async with app.router.lifespan_context(app):
+            return await call_app(app, method, path, body, headers)
+
+    return asyncio.run(run())
@@ -0,0 +1,51 @@
+import json
+import pytest
+from agent import batch, planner, tools
+from agent.query_cache import QueryCache
+
+
+@pytest.fixture
+def batch_workbook(workbook, monkeypatch):
+    monkeypatch.setattr(tools, 'DATA_FILE', workbook)
+    monkeypatch.setattr(planner, 'QUERY_CACHE', QueryCache())
+    return workbook
+
+
+def test_route_queries_loads_once_and_keeps_order(batch_workbook, monkeypatch):
+    """
+    Tests that a batch loads data once, answers each distinct intent once and
+    returns results in input order without building charts.
+    """
+    loads, answers = [], []
+    original_load, original_answer = tools.load_data, planner._answer
+    monkeypatch.setattr(tools, 'load_data', lambda *a, **k: loads.append(1) or original_load(*a, **k))
+    monkeypatch.setattr(planner, '_answer', lambda *a, **k: answers.append(a[0]) or original_answer(*a, **k))
+
+    results = batch.route_queries([
+        "June 2025 revenue vs budget",
+        "What is the meaning of life?",
+        "revenue vs budget for jun 2025",
+        "cash runway",
+    ])
+
+    assert [r['intent'].intent for r in results] == ['revenue_vs_budget', 'fallback', 'revenue_vs_budget', 'cash_runway']
+    assert results[0]['text'] == results[2]['text']
+    assert all(r['chart'] is None for r in results)
+    assert len(loads) == 1
+    assert len(answers) == 2
+
+
+def test_batch_cli_streams_json_lines(batch_workbook, tmp_path, capsys):
+    """
+    Tests that the CLI writes one JSON record per question, skipping comments.
+    """
+    questions = tmp_path / "questions.txt"
+    questions.write_text("# month-end pack\nJune 2025 revenue vs budget\n\ncash runway\n")
+
+    batch.main([str(questions), "--charts"])
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    assert [r['index'] for r in records] == [0, 1]
+    assert records[0]['intent']['month'] == 'June'
+    assert records[0]['chart']['data'][0]['type'] == 'bar'
+    assert records[1]['chart'] is None
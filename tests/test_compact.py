@@ -0,0 +1,36 @@
+import pytest
+import pandas as pd
+from agent import tools, compact
+
+
+def test_tools_match_on_compact_layout(mock_data_frames):
+    """
+    Tests that every tool gives the same answer on the compact layout.
+    """
+    frames = (mock_data_frames['actuals_df'], mock_data_frames['budget_df'],
+              mock_data_frames['cash_df'], mock_data_frames['fx_df'])
+    actuals_df, budget_df, cash_df, fx_df = frames
+    c_actuals, c_budget, c_cash, c_fx = compact.compact_frames(frames)
+
+    assert c_actuals['month_period'].dtype == 'int32'
+    assert isinstance(c_actuals['account_category'].dtype, pd.CategoricalDtype)
+
+    assert tools.get_revenue_vs_budget(c_actuals, c_budget, c_fx, 'May', 2025) == \
+        pytest.approx(tools.get_revenue_vs_budget(actuals_df, budget_df, fx_df, 'May', 2025))
+    pd.testing.assert_frame_equal(
+        tools.get_financial_metric_trend(c_actuals, c_fx, 'Gross Margin', 3),
+        tools.get_financial_metric_trend(actuals_df, fx_df, 'Gross Margin', 3),
+    )
+    assert tools.get_cash_runway(c_actuals, c_cash, c_fx) == tools.get_cash_runway(actuals_df, cash_df, fx_df)
+    pd.testing.assert_frame_equal(tools.get_cash_trend(c_cash, 6), tools.get_cash_trend(cash_df, 6))
+
+
+def test_memory_report_shows_savings(workbook):
+    """
+    Tests that the memory report covers every sheet and the compact layout is smaller.
+    """
+    report = compact.memory_report(workbook)
+
+    assert report['sheet'].tolist() == ['actuals', 'budget', 'cash', 'fx', 'total']
+    total = report.iloc[-1]
+    assert total['compact_bytes'] < total['standard_bytes']
@@ -0,0 +1,115 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from agent import tools
+from tests.conftest import write_workbook
+
+# --- Tests ---
+
+def test_load_data_parses_workbook_once(workbook, monkeypatch):
+    """
+    Tests that repeated loads of an unchanged file are served from the cache.
+    """
+    calls = []
+    original = tools._read_workbook
+    monkeypatch.setattr(tools, '_read_workbook', lambda path: calls.append(path) or original(path))
+
+    first = tools.load_data(workbook)
+    second = tools.load_data(workbook)
+
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(first[0], second[0])
+
+
+def test_load_data_reloads_when_file_changes(workbook):
+    """
+    Tests that rewriting the workbook invalidates the cached dataset.
+    """
+    before = tools.load_data(workbook)[0]
+    version_before = tools.dataset_version(workbook)
+
+    write_workbook(workbook, revenue=2500)
+    stat = os.stat(workbook)
+    os.utime(workbook, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    after = tools.load_data(workbook)[0]
+    assert tools.dataset_version(workbook) != version_before
+    assert before['amount'].tolist() == [1000, 1000]
+    assert after['amount'].tolist() == [2500, 2500]
+
+
+def test_callers_cannot_mutate_cached_frames(workbook):
+    """
+    Tests that changes made to a returned frame do not leak into later loads.
+    """
+    actuals_df, _, _, fx_df = tools.load_data(workbook)
+    actuals_df['amount_usd'] = 0
+    actuals_df.loc[0, 'amount'] = -1
+    tools._convert_to_usd(actuals_df.drop(columns=['currency']), fx_df)
+
+    fresh_actuals, _, _, _ = tools.load_data(workbook)
+    assert 'amount_usd' not in fresh_actuals.columns
+    assert fresh_actuals['amount'].tolist() == [1000, 1000]
+
+
+def test_ledger_cube_built_once_per_dataset_version(workbook, monkeypatch):
+    """
+    Tests that tool calls on loaded frames share one cube per dataset version,
+    while frames filtered after loading get a freshly built cube.
+    """
+    builds = []
+    original = tools.build_ledger_cube
+    monkeypatch.setattr(tools, 'build_ledger_cube', lambda *frames: builds.append(1) or original(*frames))
+
+    for _ in range(3):
+        actuals_df, budget_df, _, fx_df = tools.load_data(workbook)
+        result = tools.get_revenue_vs_budget(actuals_df, budget_df, fx_df, 'June', 2025)
+    assert result == {"actual": 1000, "budget": 900}
+    assert len(builds) == 2  # one actuals cube, one budget cube
+
+    may_only = actuals_df[actuals_df['month_period'] == pd.Period('2025-05', freq='M')]
+    assert tools.get_revenue_vs_budget(may_only, budget_df, fx_df, 'June', 2025) == {"actual": 0, "budget": 900}
+    assert len(builds) == 3
+
+
+def test_edited_frames_are_not_served_cached_aggregates(workbook):
+    """
+    Tests that a frame derived from a loaded one with different amounts but
+    the same rows gets its own aggregates rather than the loaded data's.
+    """
+    actuals_df, budget_df, _, fx_df = tools.load_data(workbook)
+    assert tools.get_revenue_vs_budget(actuals_df, budget_df, fx_df, 'June', 2025) == {"actual": 1000, "budget": 900}
+
+    doubled = actuals_df.assign(amount=actuals_df['amount'] * 2)
+    assert tools.get_revenue_vs_budget(doubled, budget_df, fx_df, 'June', 2025) == {"actual": 2000, "budget": 900}
+    assert tools.get_revenue_vs_budget(actuals_df, budget_df, fx_df, 'June', 2025) == {"actual": 1000, "budget": 900}
+
+
+def test_slow_read_only_blocks_its_own_dataset(workbook, tmp_path, monkeypatch):
+    """
+    Tests that threads asking for a dataset that is being read wait for that
+    one read, while another dataset loads in the meantime.
+    """
+    other = str(tmp_path / "other.xlsx")
+    write_workbook(other, revenue=2500)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    original = tools._read_workbook
+
+    def read(path):
+        calls.append(os.path.basename(path))
+        if path == workbook:
+            started.set()
+            release.wait(10)
+        return original(path)
+
+    monkeypatch.setattr(tools, '_read_workbook', read)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        slow = [pool.submit(tools.load_data, workbook) for _ in range(2)]
+        assert started.wait(10)
+        assert tools.load_data(other)[0]['amount'].tolist() == [2500, 2500]
+        assert not any(future.done() for future in slow)
+        release.set()
+        assert [future.result()[0]['amount'].tolist() for future in slow] == [[1000, 1000]] * 2
+    assert sorted(calls) == ['data.xlsx', 'other.xlsx']
@@ -0,0 +1,45 @@
+import numpy as np
+import plotly.graph_objects as go
+from agent import history
+
+# --- Tests ---
+
+def test_chart_round_trips_as_compact_spec():
+    """
+    Tests that a stored chart comes back with its traces and layout, that
+    long traces are downsampled keeping both ends and that short ones are not.
+    """
+    fig = go.Figure([go.Scatter(x=np.arange(10_000), y=np.arange(10_000) * 2.0, name='long'),
+                     go.Bar(x=['Actual', 'Budget'], y=[1.0, 2.0], name='short')])
+    fig.update_layout(title_text='Cash')
+
+    spec = history.serialize_chart(fig, max_points=100)
+    restored = go.Figure(history.load_chart(spec))
+
+    assert len(spec) < 10_000
+    assert restored.layout.title.text == 'Cash'
+    long, short = restored.data
+    assert len(long.x) == 100 and (long.x[0], long.x[-1]) == (0, 9_999)
+    assert np.array_equal(long.y, np.asarray(long.x) * 2.0)
+    assert list(short.x) == ['Actual', 'Budget'] and list(short.y) == [1.0, 2.0]
+
+
+def test_history_is_capped_by_messages_and_bytes():
+    """Tests that the oldest messages are dropped first and the latest is always kept."""
+    chat = history.ChatHistory(max_messages=3, max_bytes=1_000)
+    for i in range(5):
+        chat.append('user', f"question {i}")
+    assert [m['content'] for m in chat] == ['question 2', 'question 3', 'question 4']
+    assert chat.usage()['dropped'] == 2
+
+    chat.append('assistant', 'x' * 2_000)
+    assert [m['content'] for m in chat] == ['x' * 2_000]
+    assert chat.nbytes == 2_000
+
+
+def test_only_the_latest_charts_are_eager():
+    chat = history.ChatHistory()
+    chart = go.Figure(go.Bar(x=['a'], y=[1]))
+    ids = [chat.append('assistant', 'answer', chart if i != 2 else None)['id'] for i in range(5)]
+    assert chat.eager_chart_ids(2) == {ids[3], ids[4]}
+    assert chat.usage()['charts'] == 4
@@ -0,0 +1,88 @@
+import pytest
+import pandas as pd
+from agent import ingest, planner, snapshot, tools
+
+# --- Fixtures ---
+
+def july_delta(revenue=1200, currency='USD'):
+    return {
+        'actuals': pd.DataFrame({'month': ['2025-07'], 'entity': ['ParentCo'], 'account_category': ['Revenue'],
+                                 'amount': [revenue], 'currency': [currency]}),
+        'budget': pd.DataFrame({'month': ['2025-07'], 'entity': ['ParentCo'], 'account_category': ['Revenue'],
+                                'amount': [1100], 'currency': ['USD']}),
+        'cash': pd.DataFrame({'month': ['2025-07'], 'entity': ['Consolidated'], 'cash_usd': [5200]}),
+        'fx': pd.DataFrame({'month': ['2025-07'], 'currency': ['USD'], 'rate_to_usd': [1.0]}),
+    }
+
+
+@pytest.fixture
+def dataset(workbook, tmp_path, monkeypatch):
+    """A snapshot dataset holding the workbook fixture, used as DATA_FILE."""
+    path = str(tmp_path / "data.snapshot")
+    snapshot.write_snapshot(tools._read_workbook(workbook), path)
+    monkeypatch.setattr(tools, 'DATA_FILE', path)
+    planner.QUERY_CACHE.clear()
+    yield path
+    planner.QUERY_CACHE.clear()
+
+# --- Tests ---
+
+def test_append_extends_dataset_on_disk_and_in_memory(dataset):
+    """
+    Tests that appended months are visible right away and after a reload, and
+    that the extended cube matches one built from scratch.
+    """
+    actuals_df, _, _, fx_df = tools.load_data()
+    tools._ledger_cube(actuals_df, fx_df)
+
+    summary = ingest.append_delta(july_delta())
+    assert summary["months"]["actuals"] == ['2025-07']
+
+    actuals_df, budget_df, cash_df, fx_df = tools.load_data()
+    assert actuals_df['amount'].tolist() == [1000, 1000, 1200]
+    assert tools.get_revenue_vs_budget(actuals_df, budget_df, fx_df, 'July', 2025) == {'actual': 1200.0, 'budget': 1100.0}
+    extended = tools._ledger_cube(actuals_df, fx_df)
+    pd.testing.assert_frame_equal(extended, tools.build_ledger_cube(actuals_df, fx_df))
+
+    tools.clear_data_cache()
+    reloaded = tools.load_data()
+    assert reloaded[0]['amount'].tolist() == [1000, 1000, 1200]
+    assert reloaded[2]['cash_usd'].tolist() == [5000, 5200]
+
+
+def test_append_keeps_answers_about_earlier_months(dataset):
+    """
+    Tests that a memoized answer for an earlier month survives the append while
+    the runway answer, which depends on the latest months, is recomputed.
+    """
+    planner.route_query("What was June 2025 revenue vs budget in USD?", include_chart=False)
+    planner.route_query("What is our cash runway right now?", include_chart=False)
+
+    summary = ingest.append_delta(july_delta())
+
+    assert summary["answers_kept"] == 1
+    hits = planner.QUERY_CACHE.hits
+    planner.route_query("What was June 2025 revenue vs budget in USD?", include_chart=False)
+    assert planner.QUERY_CACHE.hits == hits + 1
+
+
+@pytest.mark.parametrize("delta, message", [
+    ({'actuals': pd.DataFrame({'month': ['2025-06'], 'entity': ['ParentCo'], 'account_category': ['Revenue'],
+                               'amount': [1], 'currency': ['USD']})}, "already loaded"),
+    ({'cash': pd.DataFrame({'month': ['2025-07'], 'cash': [1]})}, "columns do not match"),
+    ({'actuals': july_delta(currency='EUR')['actuals']}, "No FX rate"),
+])
+def test_invalid_delta_is_rejected(dataset, delta, message):
+    """
+    Tests that overlapping months, a changed schema and missing FX rates are
+    rejected without touching the stored dataset.
+    """
+    manifest = snapshot.read_manifest(dataset)
+    with pytest.raises(ValueError, match=message):
+        ingest.append_delta(delta)
+    assert snapshot.read_manifest(dataset) == manifest
+
+
+def test_workbook_dataset_is_rejected(workbook):
+    with pytest.raises(ValueError, match="not a snapshot dataset"):
+        ingest.append_delta(july_delta(), workbook)
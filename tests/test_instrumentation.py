@@ -0,0 +1,53 @@
+import json
+import pytest
+from agent import instrumentation, planner, tools
+from agent.query_cache import QueryCache
+
+
+@pytest.fixture
+def instrumented():
+    instrumentation.reset()
+    instrumentation.enable()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def test_route_query_trace_nests_tool_and_plot_spans(workbook, monkeypatch, instrumented):
+    """
+    Tests that one question yields nested spans for loading, the tool and the
+    plot, exported both as a Chrome trace and as Prometheus histograms.
+    """
+    monkeypatch.setattr(tools, 'DATA_FILE', workbook)
+    monkeypatch.setattr(planner, 'QUERY_CACHE', QueryCache())
+
+    with instrumentation.trace() as trace:
+        planner.route_query("June 2025 revenue vs budget")
+
+    spans = {name: depth for name, _, depth in trace.summary()}
+    assert spans['planner.route_query'] == 0
+    assert spans['tools.load_data'] == 1
+    assert spans['tools.get_revenue_vs_budget'] == 2
+    assert spans['plotting.plot_revenue_vs_budget'] == 2
+    events = json.loads(trace.to_json())['traceEvents']
+    assert {e['ph'] for e in events} == {'X'} and len(events) == len(trace.spans)
+
+    text = instrumentation.prometheus_text()
+    assert 'cfo_span_duration_seconds_count{span="planner.route_query"} 1' in text
+    assert 'cfo_span_duration_seconds_bucket{span="tools.load_data",le="+Inf"} 1' in text
+
+
+def test_disabled_instrumentation_records_nothing():
+    instrumentation.reset()
+    with instrumentation.span('ignored'):
+        pass
+    instrumentation.timed('also_ignored')(lambda: None)()
+
+    assert instrumentation.summary() == []
+
+
+def test_profile_call_returns_result_and_report():
+    result, report = instrumentation.profile_call(sorted, [3, 1, 2])
+
+    assert result == [1, 2, 3]
+    assert 'function calls' in report
@@ -0,0 +1,52 @@
+import threading
+import pytest
+from agent.jobs import JobManager
+
+
+def test_duplicate_submissions_share_one_job():
+    """
+    Tests that a key submitted while its job is in flight returns the same
+    Job, that progress is visible, and that a finished key can run again.
+    """
+    manager = JobManager(max_workers=1)
+    release = threading.Event()
+    calls = []
+
+    def work(value, progress):
+        calls.append(value)
+        progress(0.5, "Halfway")
+        release.wait(5)
+        return value * 2
+
+    first = manager.submit('report', work, 21)
+    second = manager.submit('report', work, 99)
+    assert second is first
+
+    release.set()
+    assert first.result(5) == 42
+    assert first.status == 'done' and first.progress == 1.0
+    assert calls == [21]
+    assert manager.get(first.id) is first
+
+    third = manager.submit('report', work, 1)
+    assert third is not first and third.result(5) == 2
+    manager.shutdown()
+
+
+def test_failed_job_reports_error_and_bounds_pending():
+    manager = JobManager(max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    def fail(progress):
+        release.wait(5)
+        raise ValueError("no data")
+
+    job = manager.submit('a', fail)
+    with pytest.raises(RuntimeError):
+        manager.submit('b', fail)
+
+    release.set()
+    with pytest.raises(ValueError):
+        job.result(5)
+    assert job.status == 'failed' and "no data" in job.message
+    manager.shutdown()
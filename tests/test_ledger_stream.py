@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+import pandas as pd
+from agent import ledger_stream, tools
+
+# --- Fixtures ---
+
+@pytest.fixture
+def ledger():
+    """A few hundred lines over six months, two entities and two currencies, plus FX rates."""
+    rng = np.random.default_rng(0)
+    n = 600
+    months = pd.period_range('2025-01', periods=6, freq='M')
+    actuals_df = pd.DataFrame({
+        'month': np.repeat(months.strftime('%Y-%m'), n // 6),
+        'entity': rng.choice(['ParentCo', 'EMEA'], n),
+        'account_category': rng.choice(['Revenue', 'COGS', 'Opex:Marketing', 'Opex:Admin'], n),
+        'amount': rng.integers(100, 10_000, n),
+        'currency': rng.choice(['USD', 'EUR'], n),
+    })
+    fx_df = pd.DataFrame({
+        'month': np.repeat(months.strftime('%Y-%m'), 2),
+        'currency': ['USD', 'EUR'] * 6,
+        'rate_to_usd': [1.0, 0.9, 1.0, 0.91, 1.0, 0.92, 1.0, 0.93, 1.0, 0.94, 1.0, 0.95],
+    })
+    return tools.standardize_sheet(actuals_df, 'actuals'), tools.standardize_sheet(fx_df, 'fx')
+
+# --- Tests ---
+
+@pytest.mark.parametrize("file_name, usd", [("ledger.csv", False), ("ledger.parquet", True)])
+def test_streamed_totals_give_the_same_answers(ledger, tmp_path, file_name, usd):
+    """
+    Tests that the tools answer the same from streamed monthly totals as from
+    the full ledger, with several chunks and with or without USD conversion.
+    Lines with a blank entity or currency still count.
+    """
+    actuals_df, fx_df = ledger
+    actuals_df.loc[[5, 550], 'entity'] = None
+    actuals_df.loc[590, 'currency'] = None
+    path = str(tmp_path / file_name)
+    raw = actuals_df.drop(columns='month_period')
+    raw.to_csv(path, index=False) if file_name.endswith('.csv') else raw.to_parquet(path)
+
+    totals = ledger_stream.aggregate_ledger(path, fx_df if usd else None, chunksize=70)
+
+    assert totals.attrs['source_rows'] == len(actuals_df)
+    assert len(totals) <= 6 * 3 * 4 * 3
+    assert list(totals.columns) == list(actuals_df.columns)
+    assert totals['currency'].eq('USD').all() == usd
+    full = tools.get_revenue_vs_budget(actuals_df, actuals_df, fx_df, 'June', 2025)
+    streamed = tools.get_revenue_vs_budget(totals, totals, fx_df, 'June', 2025)
+    assert streamed['actual'] == pytest.approx(full['actual'])
+    pd.testing.assert_frame_equal(tools.get_opex_breakdown(totals, fx_df, 'May', 2025),
+                                  tools.get_opex_breakdown(actuals_df, fx_df, 'May', 2025))
+    pd.testing.assert_frame_equal(tools.get_financial_metric_trend(totals, fx_df, 'EBITDA', 6),
+                                  tools.get_financial_metric_trend(actuals_df, fx_df, 'EBITDA', 6))
+
+
+def test_export_without_required_columns_is_rejected(tmp_path):
+    path = tmp_path / "ledger.csv"
+    pd.DataFrame({'month': ['2025-06'], 'amount': [1]}).to_csv(path, index=False)
+    with pytest.raises(ValueError, match="account_category, entity"):
+        ledger_stream.aggregate_ledger(str(path))
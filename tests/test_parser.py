@@ -0,0 +1,60 @@
+import pytest
+from agent import planner, tools
+from agent.parser import Intent, parse_query
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("What was June 2025 revenue vs budget in USD?", Intent('revenue_vs_budget', month='June', year=2025)),
+    ("Revenue vs budget for Sept. 2024", Intent('revenue_vs_budget', month='September', year=2024)),
+    ("Show Gross Margin % trend for the last 6 months.", Intent('metric_trend', metric='Gross Margin', num_months=6)),
+    ("EBITDA trend, last 12 months", Intent('metric_trend', metric='EBITDA', num_months=12)),
+    ("Break down Opex by category for 2025-05", Intent('opex_breakdown', month='May', year=2025)),
+    ("What is our cash runway right now?", Intent('cash_runway')),
+    ("Run cash runway scenarios over 36 months", Intent('runway_scenarios', num_months=36)),
+    ("Monte Carlo simulation of our runway", Intent('runway_scenarios')),
+    ("Rolling 12-month EBITDA", Intent('rolling_metric', metric='EBITDA', num_months=12)),
+    ("YTD revenue vs budget", Intent('ytd', metric='Revenue')),
+    ("Q2 vs Q1 2025 EBITDA", Intent('period_compare', metric='EBITDA', start=(2025, 4), end=(2025, 6),
+                                    compare_start=(2025, 1), compare_end=(2025, 3))),
+    ("COGS from March to June 2025", Intent('range_total', metric='COGS', start=(2025, 3), end=(2025, 6))),
+    ("Budget variance heatmap for Q2 2025", Intent('variance', year=2025, start=(2025, 4), end=(2025, 6))),
+    ("Where did we miss budget in May 2025?", Intent('variance', month='May', year=2025)),
+    ("Tell me a joke", Intent('fallback')),
+])
+def test_parse_query_intents(query, expected):
+    assert parse_query(query) == expected
+
+
+def test_parse_query_quarters_and_ranges():
+    """
+    Tests that quarters and month ranges resolve to (year, month) bounds, with
+    a range's start taking the end's year when it has none.
+    """
+    quarter = parse_query("revenue vs budget Q2 2025")
+    assert (quarter.start, quarter.end) == ((2025, 4), (2025, 6))
+
+    months = parse_query("opex breakdown from Mar to Jun 2025")
+    assert months.month == 'March'
+    assert (months.start, months.end) == ((2025, 3), (2025, 6))
+
+    no_year = parse_query("revenue vs budget q4")
+    assert (no_year.start, no_year.end) == ((None, 10), (None, 12))
+
+    across_years = parse_query("Revenue vs budget from December 2024 to March")
+    assert (across_years.start, across_years.end) == ((2024, 12), (2025, 3))
+    between = parse_query("EBITDA between Aug and Mar 2025")
+    assert (between.start, between.end) == ((2024, 8), (2025, 3))
+
+    compared = parse_query("What was June 2025 revenue vs budget compared to May 2025?")
+    assert compared == Intent('revenue_vs_budget', month='June', year=2025)
+
+
+def test_fallback_does_not_load_data(monkeypatch):
+    """
+    Tests that an unanswerable question is answered without touching the data.
+    """
+    monkeypatch.setattr(tools, 'load_data', lambda *args, **kwargs: pytest.fail("data was loaded"))
+    monkeypatch.setattr(tools, 'dataset_version', lambda *args, **kwargs: pytest.fail("data was read"))
+
+    response = planner.route_query("What's the weather like?")
+    assert response == {"text": planner.FALLBACK_TEXT, "chart": None}
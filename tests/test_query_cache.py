@@ -0,0 +1,96 @@
+import os
+import pytest
+from agent import planner, tools
+from agent.query_cache import QueryCache
+from tests.conftest import write_workbook
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+# --- QueryCache ---
+
+def test_query_cache_evicts_least_recently_used():
+    cache = QueryCache(maxsize=2, ttl=None)
+    cache.put('a', 'v1', 1)
+    cache.put('b', 'v1', 2)
+    assert cache.get('a', 'v1') == 1  # 'a' is now the most recently used
+    cache.put('c', 'v1', 3)
+
+    assert cache.get('b', 'v1') is None
+    assert cache.get('a', 'v1') == 1
+    assert cache.stats()['evictions'] == 1
+
+
+def test_query_cache_expires_entries_after_ttl():
+    clock = FakeClock()
+    cache = QueryCache(ttl=60, clock=clock)
+    cache.put('a', 'v1', 1)
+
+    clock.now = 59
+    assert cache.get('a', 'v1') == 1
+    clock.now = 61
+    assert cache.get('a', 'v1') is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_query_cache_drops_entries_from_older_versions():
+    cache = QueryCache()
+    cache.put('a', 'v1', 1)
+
+    assert cache.get('a', 'v2') is None
+    cache.put('a', 'v2', 2)
+    assert cache.get('a', 'v2') == 2
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_query_cache_keeps_each_scope_at_its_own_version():
+    cache = QueryCache()
+    cache.put('q', 'vA', 1, scope='acme')
+    cache.put('q2', 'vB', 2, scope='globex')
+
+    assert cache.get('q', 'vA', scope='acme') == 1
+    assert cache.get('q2', 'vB', scope='globex') == 2
+    assert cache.stats()['invalidations'] == 0
+    assert cache.get('q', 'vA2', scope='acme') is None
+    assert cache.get('q2', 'vB', scope='globex') == 2
+    assert cache.stats()['invalidations'] == 1
+
+
+# --- Planner memoization ---
+
+@pytest.fixture
+def planner_workbook(workbook, monkeypatch):
+    monkeypatch.setattr(tools, 'DATA_FILE', workbook)
+    monkeypatch.setattr(planner, 'QUERY_CACHE', QueryCache())
+    return workbook
+
+
+def test_route_query_memoizes_equivalent_questions(planner_workbook, monkeypatch):
+    """
+    Tests that differently worded questions with the same intent and parameters
+    are answered once, and that editing the workbook invalidates the answer.
+    """
+    calls = []
+    original = tools.get_revenue_vs_budget
+    monkeypatch.setattr(tools, 'get_revenue_vs_budget', lambda *args: calls.append(args) or original(*args))
+
+    first = planner.route_query("What was June 2025 revenue vs budget?")
+    second = planner.route_query("revenue vs budget for june 2025")
+    assert first['text'] == second['text']
+    assert len(calls) == 1
+    assert planner.QUERY_CACHE.stats()['hits'] == 1
+
+    write_workbook(planner_workbook, revenue=2000)
+    stat = os.stat(planner_workbook)
+    os.utime(planner_workbook, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    third = planner.route_query("revenue vs budget for june 2025")
+    assert len(calls) == 2
+    assert first['chart'].data[0].y[0] == 1000
+    assert third['chart'].data[0].y[0] == 2000
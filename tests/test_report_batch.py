@@ -0,0 +1,78 @@
+import os
+import zipfile
+import pytest
+from agent import report_batch, reporting
+from tests.conftest import StubRenderer, write_workbook
+
+
+def test_generate_reports_resumes_and_zips(workbook, tmp_path, monkeypatch):
+    """
+    Tests that a failed report leaves the others in place and no zip, and that
+    the rerun builds only the missing report before writing the archive.
+    """
+    write_workbook(workbook, opex=200)
+    monkeypatch.setattr(reporting, 'get_renderer', lambda: StubRenderer())
+    original_render = reporting.render_report
+    failing = {'ParentCo'}
+
+    def flaky_render(data, timings=None):
+        if data['entity'] in failing:
+            raise RuntimeError("renderer crashed")
+        return original_render(data, timings)
+
+    monkeypatch.setattr(reporting, 'render_report', flaky_render)
+    output = str(tmp_path / "pack.zip")
+
+    first = report_batch.generate_reports(output, months=1, entities=[None, 'ParentCo'], workers=0, path=workbook)
+    assert (first['written'], first['failed']) == (1, 1)
+    assert "renderer crashed" in first['errors']['report_2025-06_parentco.pdf']
+    assert not os.path.exists(output)
+
+    failing.clear()
+    second = report_batch.generate_reports(output, months=1, entities=[None, 'ParentCo'], workers=0, path=workbook)
+    assert (second['written'], second['skipped'], second['failed']) == (1, 1, 0)
+    with zipfile.ZipFile(output) as archive:
+        assert archive.namelist() == ['report_2025-06_consolidated.pdf', 'report_2025-06_parentco.pdf']
+    assert not os.path.exists(output + ".parts")
+
+
+def test_generate_reports_skips_existing_files(workbook, tmp_path, monkeypatch):
+    write_workbook(workbook, opex=200)
+    monkeypatch.setattr(reporting, 'get_renderer', lambda: StubRenderer())
+    out_dir = str(tmp_path / "reports")
+
+    first = report_batch.generate_reports(out_dir, months=1, workers=0, path=workbook)
+    second = report_batch.generate_reports(out_dir, months=1, workers=0, path=workbook)
+
+    assert first['written'] == 1 and first['reports_per_second'] > 0
+    assert (second['written'], second['skipped']) == (0, 1)
+    assert os.listdir(out_dir) == ['report_2025-06_consolidated.pdf']
+
+
+def test_rerun_skips_reports_already_in_the_zip(workbook, tmp_path, monkeypatch):
+    write_workbook(workbook, opex=200)
+    monkeypatch.setattr(reporting, 'get_renderer', lambda: StubRenderer())
+    output = str(tmp_path / "pack.zip")
+
+    report_batch.generate_reports(output, months=1, workers=0, path=workbook)
+    rerun = report_batch.generate_reports(output, months=1, entities=[None, 'ParentCo'], workers=0, path=workbook)
+
+    assert (rerun['written'], rerun['skipped']) == (1, 1)
+    with zipfile.ZipFile(output) as archive:
+        assert archive.namelist() == ['report_2025-06_consolidated.pdf', 'report_2025-06_parentco.pdf']
+
+
+@pytest.mark.parametrize("entities, message", [
+    ([None, 'EMEA', 'emea'], "'emea' would write the same report files as entity 'EMEA'"),
+    (['North America', 'North-America'], "'North-America' would write the same report files as entity 'North America'"),
+    (['Consolidated'], "'Consolidated' would write the same report files as the consolidated report"),
+    (['&'], "'&' has no letter or digit"),
+])
+def test_entities_sharing_report_files_are_rejected(entities, message):
+    with pytest.raises(ValueError, match=message):
+        report_batch.check_filenames(entities)
+
+
+def test_at_least_one_month_is_required(workbook, tmp_path):
+    with pytest.raises(ValueError, match="months must be at least 1"):
+        report_batch.generate_reports(str(tmp_path / "reports"), months=0, workers=0, path=workbook)
@@ -0,0 +1,94 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+import pytest
+from agent import reporting, rendering, tools
+from agent.report_cache import ReportCache, cache_key
+from tests.conftest import StubRenderer, write_workbook
+
+
+def test_generate_pdf_report_renders_in_memory(workbook, monkeypatch):
+    """
+    Tests that all charts are rendered in one batch and embedded from memory,
+    without temporary files, and that stage timings are reported.
+    """
+    write_workbook(workbook, opex=200)
+    monkeypatch.setattr(tools, 'DATA_FILE', workbook)
+    renderer = StubRenderer()
+    monkeypatch.setattr(reporting, 'get_renderer', lambda: renderer)
+    monkeypatch.setattr(tempfile, 'NamedTemporaryFile', lambda *a, **k: pytest.fail("temporary file created"))
+
+    timings = {}
+    report = reporting.generate_pdf_report(timings=timings)
+
+    assert report.startswith(b'%PDF')
+    assert len(renderer.batches) == 1 and len(renderer.batches[0]) == 3
+    assert list(timings) == ['cache_lookup', 'load_data', 'compute', 'build_figures', 'render_charts', 'build_pdf']
+    assert all(seconds >= 0 for seconds in timings.values())
+
+
+def test_generate_pdf_report_is_cached_per_dataset_version(workbook, monkeypatch):
+    """
+    Tests that a repeat export is served from the report cache, and that
+    editing the workbook builds a new report but reuses unchanged charts.
+    """
+    write_workbook(workbook, opex=200)
+    monkeypatch.setattr(tools, 'DATA_FILE', workbook)
+    renderer = StubRenderer()
+    monkeypatch.setattr(reporting, 'get_renderer', lambda: renderer)
+
+    first = reporting.generate_pdf_report()
+    timings = {}
+    second = reporting.generate_pdf_report(timings=timings)
+    assert second == first
+    assert list(timings) == ['cache_lookup']
+    assert len(renderer.batches) == 1
+
+    # Only the Opex amount changes, so only the Opex chart is rendered again.
+    write_workbook(workbook, opex=300)
+    os.utime(workbook, ns=(1, 1))
+    reporting.generate_pdf_report()
+    assert [len(batch) for batch in renderer.batches] == [3, 1]
+
+
+def test_report_cache_evicts_least_recently_used(tmp_path):
+    cache = ReportCache(tmp_path / "cache", max_bytes=25)
+    for name in ('a', 'b'):
+        cache.put(cache_key(name), b'x' * 10)
+        time.sleep(0.01)
+    assert cache.get(cache_key('a')) is not None  # 'a' is now the most recently used
+    time.sleep(0.01)
+    cache.put(cache_key('c'), b'x' * 10)
+
+    assert cache.get(cache_key('b')) is None
+    assert cache.get(cache_key('a')) == b'x' * 10
+    assert cache.stats()['bytes'] == 20 and cache.evictions == 1
+
+
+def test_get_renderer_is_shared():
+    assert rendering.get_renderer() is rendering.get_renderer()
+
+
+def test_failed_renderer_start_stops_its_loop_and_is_not_retried(monkeypatch):
+    """Tests that a kaleido that cannot start (e.g. no Chrome) leaves no event-loop thread behind."""
+    starts = []
+
+    class NoChrome:
+        def __init__(self, **kwargs):
+            starts.append(kwargs)
+
+        async def __aenter__(self):
+            raise OSError("Chrome not found")
+
+    monkeypatch.setitem(sys.modules, 'kaleido', types.SimpleNamespace(Kaleido=NoChrome))
+    renderer = rendering.ChartRenderer(timeout=5)
+    for _ in range(3):
+        with pytest.raises((OSError, RuntimeError), match="Chrome not found"):
+            renderer.render_pngs([object()])
+
+    assert len(starts) == 1
+    time.sleep(0.1)
+    assert not any(thread.name == "chart-renderer" for thread in threading.enumerate())
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+import pandas as pd
+from agent import planner, runway, tools
+
+# --- Fixtures ---
+
+@pytest.fixture
+def burning_frames():
+    """Three months burning 200 a month with 1,000 of cash: a 5-month runway."""
+    actuals_df = pd.DataFrame({
+        'month': ['2025-04', '2025-04', '2025-05', '2025-05', '2025-06', '2025-06'],
+        'account_category': ['Revenue', 'Opex:Payroll'] * 3,
+        'amount': [100, 300] * 3,
+        'currency': ['USD', 'USD', 'EUR', 'USD', 'USD', 'USD'],
+    })
+    cash_df = pd.DataFrame({'month': ['2025-06'], 'cash_usd': [1000]})
+    fx_df = pd.DataFrame({'month': ['2025-05'], 'currency': ['EUR'], 'rate_to_usd': [1.0]})
+    for df in (actuals_df, cash_df, fx_df):
+        df['month_period'] = pd.to_datetime(df['month']).dt.to_period('M')
+    return actuals_df, cash_df, fx_df
+
+# --- Tests ---
+
+def test_scenario_without_uncertainty_matches_cash_runway(burning_frames):
+    """
+    Tests that with every volatility at zero all paths follow the
+    deterministic runway of get_cash_runway().
+    """
+    actuals_df, cash_df, fx_df = burning_frames
+    flat = runway.Scenario(burn_growth_vol=0.0, revenue_vol=0.0, fx_vol=0.0)
+    result = runway.simulate_runway(actuals_df, cash_df, fx_df, flat, paths=50, horizon=12)
+
+    expected = tools.get_cash_runway(actuals_df, cash_df, fx_df)['runway_months']
+    assert result['runway_percentiles'] == {10: pytest.approx(expected), 50: pytest.approx(expected), 90: pytest.approx(expected)}
+    assert result['prob_out_of_cash'] == 1.0
+    assert result['cash_bands']['month_str'].iloc[0] == 'Jul 2025'
+    assert result['cash_bands']['p50'].tolist()[:2] == pytest.approx([800, 600])
+
+
+def test_scenarios_shift_the_runway_bands(burning_frames):
+    """Tests that the bands are ordered and that a revenue shock or faster burn shortens the runway."""
+    actuals_df, cash_df, fx_df = burning_frames
+    base = runway.simulate_runway(actuals_df, cash_df, fx_df, paths=2_000)
+    p10, p50, p90 = base['runway_percentiles'].values()
+    assert p10 <= p50 <= p90
+
+    for scenario in (runway.Scenario(revenue_shock=-0.5), runway.Scenario(burn_growth=0.05)):
+        stressed = runway.simulate_runway(actuals_df, cash_df, fx_df, scenario, paths=2_000)
+        assert stressed['runway_percentiles'][50] < p50
+
+
+def test_result_does_not_depend_on_blocks_or_workers(burning_frames, monkeypatch):
+    """Tests that a seed gives the same paths in-process and spread over a process pool."""
+    actuals_df, cash_df, fx_df = burning_frames
+    monkeypatch.setattr(runway, 'BLOCK_PATHS', 300)
+    in_process = runway.simulate_runway(actuals_df, cash_df, fx_df, paths=1_000, seed=7)
+    pooled = runway.simulate_runway(actuals_df, cash_df, fx_df, paths=1_000, seed=7, workers=2)
+
+    assert in_process['runway_percentiles'] == pooled['runway_percentiles']
+    pd.testing.assert_frame_equal(in_process['cash_bands'], pooled['cash_bands'])
+    assert np.isfinite(in_process['cash_bands'][['p10', 'p50', 'p90']].to_numpy()).all()
+
+
+def test_at_least_one_path_is_required(burning_frames):
+    with pytest.raises(ValueError, match="paths must be at least 1"):
+        runway.simulate_runway(*burning_frames, paths=0)
+
+
+@pytest.mark.parametrize("horizon", [0, -3, runway.MAX_HORIZON + 1])
+def test_horizon_must_be_in_range(burning_frames, horizon):
+    with pytest.raises(ValueError, match="horizon must be between 1 and"):
+        runway.simulate_runway(*burning_frames, horizon=horizon)
+
+
+def test_planner_answers_runway_scenarios(workbook, monkeypatch):
+    monkeypatch.setattr(tools, 'DATA_FILE', workbook)
+    planner.QUERY_CACHE.clear()
+    result = planner.route_query("Run cash runway scenarios over 24 months")
+    planner.QUERY_CACHE.clear()
+
+    assert "Cash Runway Scenarios" in result["text"]
+    assert "within 24 months" in result["text"]
+    assert len(result["chart"].data) == 3  # one P10-P90 band (two traces) and the median line
+
+
+@pytest.mark.parametrize("query", ["Run cash runway scenarios over 0 months",
+                                   "Run cash runway scenarios over 100000 months"])
+def test_planner_rejects_runway_horizon_out_of_range(workbook, monkeypatch, query):
+    monkeypatch.setattr(tools, 'DATA_FILE', workbook)
+    planner.QUERY_CACHE.clear()
+    result = planner.route_query(query)
+    planner.QUERY_CACHE.clear()
+
+    assert result == {"text": "Please give a runway horizon between 1 and 240 months.", "chart": None}
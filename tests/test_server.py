@@ -0,0 +1,42 @@
+import json
+import pytest
+from agent import planner, server, tools
+from agent.query_cache import QueryCache
+from tests.conftest import request_app
+
+
+@pytest.fixture
+def server_workbook(workbook, monkeypatch):
+    monkeypatch.setattr(tools, 'DATA_FILE', workbook)
+    monkeypatch.setattr(planner, 'QUERY_CACHE', QueryCache())
+    return workbook
+
+
+def test_query_endpoint_returns_answer_and_headers(server_workbook):
+    status, headers, content = request_app("POST", "/query", {"query": "June 2025 revenue vs budget"},
+                                        headers=[("X-Request-ID", "abc123")])
+    record = json.loads(content)
+
+    assert status == 200
+    assert headers["x-request-id"] == "abc123"
+    assert float(headers["x-response-time-ms"]) >= 0
+    assert record["intent"]["intent"] == "revenue_vs_budget"
+    assert "Revenue vs. Budget for June 2025" in record["text"]
+    assert record["chart"]["data"][0]["type"] == "bar"
+
+
+def test_batch_endpoint_keeps_order_and_rejects_bad_bodies(server_workbook):
+    status, headers, content = request_app("POST", "/batch", {"queries": ["cash runway", "Who is the CFO?"]})
+    results = json.loads(content)["results"]
+
+    assert status == 200 and len(headers["x-request-id"]) == 32
+    assert [r["intent"]["intent"] for r in results] == ["cash_runway", "fallback"]
+    assert request_app("POST", "/batch", {"queries": "cash runway"})[0] == 400
+    assert request_app("POST", "/query", {})[0] == 400
+
+
+def test_metrics_endpoint_serves_prometheus_text(server_workbook):
+    status, headers, content = request_app("GET", "/metrics")
+
+    assert status == 200 and headers["content-type"].startswith("text/plain")
+    assert content.startswith(b"# HELP cfo_span_duration_seconds")
@@ -0,0 +1,85 @@
+import os
+import pytest
+import pandas as pd
+from agent import tools, snapshot
+from tests.conftest import write_workbook
+
+# --- Tests ---
+
+def test_snapshot_round_trip_matches_workbook(workbook):
+    """
+    Tests that snapshot frames hold the same data as a direct workbook parse,
+    with the string dimensions stored as categoricals.
+    """
+    snapshot.compile_snapshot(workbook)
+    from_snapshot = snapshot.load_if_fresh(workbook)
+    from_excel = tools._read_workbook(workbook)
+
+    assert from_snapshot is not None
+    for snap_df, excel_df in zip(from_snapshot, from_excel):
+        assert list(snap_df.columns) == list(excel_df.columns)
+        pd.testing.assert_frame_equal(snap_df, excel_df, check_dtype=False, check_categorical=False)
+    assert isinstance(from_snapshot[0]['account_category'].dtype, pd.CategoricalDtype)
+    assert from_snapshot[0]['month_period'].dtype == excel_df['month_period'].dtype
+
+
+def test_load_data_prefers_fresh_snapshot(workbook, monkeypatch):
+    """
+    Tests that load_data() skips the Excel parse when the snapshot is fresh.
+    """
+    snapshot.compile_snapshot(workbook)
+    monkeypatch.setattr(tools, '_read_workbook', lambda path: pytest.fail("workbook was parsed"))
+
+    actuals_df, _, _, _ = tools.load_data(workbook)
+    assert actuals_df['amount'].tolist() == [1000, 1000]
+
+
+def test_stale_snapshot_falls_back_to_excel(workbook):
+    """
+    Tests that editing the workbook after compiling makes the snapshot stale.
+    """
+    snapshot.compile_snapshot(workbook)
+    write_workbook(workbook, revenue=123456)
+    stat = os.stat(workbook)
+    os.utime(workbook, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert snapshot.load_if_fresh(workbook) is None
+    actuals_df, _, _, _ = tools.load_data(workbook)
+    assert actuals_df['amount'].tolist() == [123456, 123456]
+
+
+def test_load_data_reads_snapshot_directory(tmp_path):
+    """
+    Tests that a snapshot written straight from frames loads as a dataset of
+    its own, and that rewriting it changes the dataset version.
+    """
+    from benchmarks.synthetic import make_dataset
+
+    snapshot_dir = str(tmp_path / "ledger.snapshot")
+    snapshot.write_snapshot(make_dataset(months=3, lines_per_month=10, entities=3, currencies=3), snapshot_dir)
+    version = tools.dataset_version(snapshot_dir)
+    actuals_df, _, _, fx_df = tools.load_data(snapshot_dir)
+
+    assert len(actuals_df) == 30 and sorted(fx_df['currency'].unique()) == ['EUR', 'GBP', 'USD']
+    assert snapshot.load_if_fresh(snapshot_dir) is None  # no source workbook to be fresh against
+
+    snapshot.write_snapshot(make_dataset(months=4, lines_per_month=10), snapshot_dir)
+    os.utime(os.path.join(snapshot_dir, snapshot.MANIFEST_NAME), ns=(1, 1))
+    assert tools.dataset_version(snapshot_dir) != version
+    assert len(tools.load_data(snapshot_dir)[0]) == 40
+
+
+def test_rewrite_leaves_mapped_frames_intact(tmp_path):
+    """Tests that rewriting a snapshot replaces its files instead of overwriting the mapped ones."""
+    from benchmarks.synthetic import make_dataset
+
+    snapshot_dir = str(tmp_path / "ledger.snapshot")
+    snapshot.write_snapshot(make_dataset(months=3, lines_per_month=10), snapshot_dir)
+    actuals_df = snapshot.load_snapshot(snapshot_dir)[0]
+    expected = actuals_df.copy(deep=True)
+    inode = os.stat(os.path.join(snapshot_dir, "actuals.arrow")).st_ino
+
+    snapshot.write_snapshot(make_dataset(months=3, lines_per_month=10, seed=1), snapshot_dir)
+    assert os.stat(os.path.join(snapshot_dir, "actuals.arrow")).st_ino != inode
+    assert sorted(os.listdir(snapshot_dir)) == sorted(f"{name}.arrow" for name in snapshot.SHEETS) + [snapshot.MANIFEST_NAME]
+    pd.testing.assert_frame_equal(actuals_df, expected)
@@ -0,0 +1,151 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+import pandas as pd
+from agent import backends, planner, sql_backend, tools
+from agent.parser import parse_query
+
+# --- Fixtures ---
+
+def make_frames(seed=0):
+    """
+    A small dataset exercising the edge cases: two currencies, a month with no
+    EUR rate, lines with a blank currency, mixed-case category spellings and
+    float and integer amounts.
+    """
+    rng = np.random.default_rng(seed)
+    months = pd.period_range('2024-11', periods=8, freq='M')
+    n = 400
+
+    def ledger():
+        return pd.DataFrame({
+            'month': np.repeat(months.strftime('%Y-%m'), n // 8),
+            'entity': rng.choice(['ParentCo', 'EMEA'], n),
+            'account_category': rng.choice(['Revenue', 'revenue', 'COGS', 'Opex:Marketing', 'opex:R&D', 'Other'], n),
+            'amount': rng.integers(100, 10_000, n),
+            'currency': rng.choice(['USD', 'EUR'], n),
+        })
+
+    actuals_df, budget_df = ledger(), ledger()
+    actuals_df.loc[::97, 'currency'] = None
+    budget_df['amount'] = budget_df['amount'] * 1.5
+    cash_df = pd.DataFrame({'month': months.strftime('%Y-%m'), 'entity': 'Consolidated',
+                            'cash_usd': np.linspace(90_000, 20_000, len(months))})
+    fx_months = months[:-1]  # the last month has no EUR rate
+    fx_df = pd.DataFrame({
+        'month': np.repeat(fx_months.strftime('%Y-%m'), 2),
+        'currency': ['USD', 'EUR'] * len(fx_months),
+        'rate_to_usd': np.ravel([[1.0, 0.9 + i / 100] for i in range(len(fx_months))]),
+    })
+    return tuple(tools.standardize_sheet(df, sheet) for df, sheet in zip((actuals_df, budget_df, cash_df, fx_df), tools.SHEETS))
+
+
+@pytest.fixture(params=['synthetic', 'workbook'])
+def backends_pair(request, tmp_path, workbook):
+    """The pandas reference backend and a SQLite backend over the same frames."""
+    frames = make_frames() if request.param == 'synthetic' else tools.load_data(workbook)
+    path = sql_backend.write_database(frames, str(tmp_path / "data.sqlite"))
+    return backends.PandasBackend(frames), backends.get_backend(path)
+
+
+def assert_same(expected, actual):
+    if isinstance(expected, pd.DataFrame):
+        pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+    else:
+        assert actual == expected
+
+# --- Tests ---
+
+@pytest.mark.filterwarnings("ignore:No FX rate")
+@pytest.mark.parametrize("call", [
+    lambda b: b.latest_year(),
+    lambda b: b.get_revenue_vs_budget('June', 2025),
+    lambda b: b.get_revenue_vs_budget('December', 2024),
+    lambda b: b.get_revenue_vs_budget('June', 2030),
+    lambda b: b.get_opex_breakdown('May', 2025),
+    lambda b: b.get_opex_breakdown('June', 2025),
+    lambda b: b.get_financial_metric_trend('Gross Margin', 6),
+    lambda b: b.get_financial_metric_trend('EBITDA', 3),
+    lambda b: b.get_financial_metric_trend('EBITDA', 48),
+    lambda b: b.get_cash_runway(),
+    lambda b: b.get_cash_trend(4),
+    lambda b: b.get_runway_scenarios(paths=500)['cash_bands'],
+    lambda b: b.get_range_total('Gross Margin', pd.Period('2025-01', freq='M'), pd.Period('2025-06', freq='M')),
+    lambda b: b.get_rolling_metric('EBITDA', 3, 12),
+    lambda b: b.get_opex_breakdown_range(pd.Period('2024-12', freq='M'), pd.Period('2025-02', freq='M')),
+    lambda b: b.get_variance_report()['heatmap'],
+    lambda b: b.get_variance_report(pd.Period('2025-01', freq='M'), pd.Period('2025-06', freq='M'), 20)['misses'],
+    lambda b: b.missing_fx_rates(),
+])
+def test_sqlite_backend_matches_pandas(backends_pair, call):
+    """
+    Tests that every tool question gives identical numbers from SQLite and
+    from the pandas reference.
+    """
+    reference, sqlite = backends_pair
+    assert_same(call(reference), call(sqlite))
+
+
+@pytest.mark.filterwarnings("ignore:No FX rate")
+def test_answers_note_amounts_converted_without_a_rate(backends_pair):
+    intent = parse_query("What was May 2025 revenue vs budget?")
+    for backend in backends_pair:
+        text = planner._answer(intent, backend, include_chart=False)["text"]
+        if backend.missing_fx_rates().empty:
+            assert "Note:" not in text
+        else:
+            assert text.endswith("_Note: 6 month/currency pair(s) in the ledgers have no FX rate to USD "
+                                 "(e.g. no currency in Nov 2024); those amounts were converted at 1.0._")
+
+
+def test_rewritten_database_closes_old_connections_in_their_own_thread(tmp_path):
+    """
+    Tests that a new version of the file leaves other threads' connections to
+    the old one open until those threads open a connection to the new one.
+    """
+    path = sql_backend.write_database(make_frames(), str(tmp_path / "data.sqlite"))
+    old = backends.get_backend(path)
+    with ThreadPoolExecutor(max_workers=1) as worker:
+        worker_conn = worker.submit(old._conn).result()
+
+        sql_backend.write_database(make_frames(seed=1), path)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        new = backends.get_backend(path)
+        assert new is not old
+        assert worker.submit(lambda: worker_conn.execute("SELECT COUNT(*) FROM actuals").fetchone()).result() == (400,)
+
+        worker.submit(new.latest_year).result()
+        with pytest.raises(sqlite3.ProgrammingError, match="closed"):
+            worker.submit(worker_conn.execute, "SELECT 1").result()
+    backends.close_backend(path)
+
+
+def test_invalid_month_is_rejected(backends_pair):
+    with pytest.raises(ValueError, match="Invalid month name"):
+        backends_pair[1].get_opex_breakdown('Juneish', 2025)
+
+
+def test_planner_answers_from_database(workbook, tmp_path, monkeypatch):
+    """
+    Tests that pointing DATA_FILE at a database routes questions through the
+    SQLite backend with the same answers, and that load_data() reads it too.
+    """
+    questions = ["What was June 2025 revenue vs budget in USD?", "What is our cash runway right now?"]
+    monkeypatch.setattr(tools, 'DATA_FILE', workbook)
+    planner.QUERY_CACHE.clear()
+    expected = [planner.route_query(q, include_chart=False)["text"] for q in questions]
+
+    path = sql_backend.write_database(tools.load_data(), str(tmp_path / "data.sqlite"))
+    monkeypatch.setattr(tools, 'DATA_FILE', path)
+    monkeypatch.setattr(tools, 'load_data', lambda *a, **k: pytest.fail("ledger loaded into pandas"))
+    assert isinstance(backends.get_backend(), sql_backend.SQLiteBackend)
+    assert [planner.route_query(q, include_chart=False)["text"] for q in questions] == expected
+    monkeypatch.undo()
+
+    actuals_df = tools.load_data(path)[0]
+    assert actuals_df['amount'].tolist() == [1000, 1000]
+    assert str(actuals_df['month_period'].iloc[0]) == '2025-05'
+    planner.QUERY_CACHE.clear()
@@ -0,0 +1,14 @@
+from benchmarks import bench_startup
+
+
+def test_text_answers_do_not_import_rendering_dependencies(workbook):
+    """
+    Tests, in a fresh interpreter, that importing the entry modules and
+    answering a text-only question loads none of plotly, fpdf or kaleido.
+    """
+    code = ("import agent.server, agent.batch, agent.report_batch, agent.history\n"
+            + bench_startup._answer("What is our cash runway right now?"))
+    assert bench_startup.run_step(code, workbook)['heavy'] == []
+
+    charted = bench_startup.run_step(bench_startup._answer("What was June 2025 revenue vs budget in USD?"), workbook)
+    assert charted['heavy'] == ['plotly']
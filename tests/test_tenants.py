@@ -0,0 +1,95 @@
+import json
+import os
+import pytest
+from agent import planner, reporting, snapshot, tenants, tools
+from tests.conftest import StubRenderer, request_app, write_workbook
+
+QUESTION = "Budget variance for June 2025"
+
+# --- Fixtures ---
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """Two tenants with their own workbooks, read from a TENANTS_FILE with relative paths."""
+    for name, revenue in (('acme', 800), ('globex', 500)):
+        os.makedirs(tmp_path / name)
+        write_workbook(tmp_path / name / "data.xlsx", revenue=revenue, opex=200)
+    tenants_file = tmp_path / "tenants.json"
+    tenants_file.write_text(json.dumps({'acme': 'acme/data.xlsx', 'globex': 'globex/data.xlsx'}))
+    monkeypatch.setenv('TENANTS_FILE', str(tenants_file))
+    tenants.set_registry(None)
+    planner.QUERY_CACHE.clear()
+    yield tenants.get_registry()
+    tenants.set_registry(None)
+    planner.QUERY_CACHE.clear()
+    tools.clear_data_cache()
+
+# --- Tests ---
+
+def test_route_query_answers_from_each_tenant(registry):
+    acme = planner.route_query(QUESTION, include_chart=False, tenant='acme')["text"]
+    globex = planner.route_query(QUESTION, include_chart=False, tenant='globex')["text"]
+
+    assert "| Jun 2025 | Revenue | ParentCo | $800 | $900 | -$100 |" in acme
+    assert "| Jun 2025 | Revenue | ParentCo | $500 | $900 | -$400 |" in globex
+    assert planner.route_query(QUESTION, tenant='initech')["text"] == "Error loading data: Unknown tenant: initech"
+
+
+def test_least_recently_used_tenant_is_evicted_over_budget(registry):
+    """
+    Tests that loading a tenant over the memory budget evicts the least
+    recently used one, cached frames and aggregates included, and that the
+    evicted tenant loads again on its next question.
+    """
+    acme_path = os.path.abspath(registry.data_file('acme'))
+    frames = registry.load_data('acme')
+    registry.max_bytes = tenants.private_bytes(frames) + 1
+    tools._ledger_cube(frames[0], frames[3])
+
+    registry.load_data('globex')
+    usage = registry.usage()
+    assert list(usage['loaded']) == ['globex'] and usage['evictions'] == 1
+    assert not any(key[0] == acme_path for key in tools._DATA_CACHE)
+    assert not any(key[1] == frames[0].attrs['dataset_version'] for key in tools._DERIVED_CACHE)
+
+    assert "$800" in planner.route_query(QUESTION, include_chart=False, tenant='acme')["text"]
+    assert list(registry.usage()['loaded']) == ['acme']
+
+
+def test_tenant_memory_is_measured_once_per_load(registry, monkeypatch):
+    """Tests that a loaded tenant's bytes are measured when it loads, not on every question."""
+    calls = []
+    original = tenants.private_bytes
+    monkeypatch.setattr(tenants, 'private_bytes', lambda frames: calls.append(1) or original(frames))
+
+    for _ in range(3):
+        registry.load_data('acme')
+    assert len(calls) == 1
+
+    registry.evict('acme')
+    registry.load_data('acme')
+    assert len(calls) == 2
+
+
+def test_tenant_workbook_is_served_from_a_shared_snapshot(registry):
+    """Tests that a tenant's workbook is compiled to a memory-mapped snapshot that the budget does not count."""
+    frames = registry.load_data('acme')
+
+    assert snapshot.read_manifest(snapshot.default_snapshot_dir(registry.data_file('acme'))) is not None
+    deep = sum(int(df.memory_usage(deep=True, index=True).sum()) for df in frames)
+    assert tenants.private_bytes(frames) < deep
+    assert registry.usage()['bytes'] == tenants.private_bytes(frames)
+
+
+def test_report_and_api_take_a_tenant(registry, monkeypatch):
+    renderer = StubRenderer()
+    monkeypatch.setattr(reporting, 'get_renderer', lambda: renderer)
+    assert reporting.generate_pdf_report(tenant='acme').startswith(b'%PDF')
+    assert reporting.generate_pdf_report(tenant='globex').startswith(b'%PDF')
+    # The revenue chart of each report shows that tenant's actuals.
+    assert [batch[0].data[0].y[0] for batch in renderer.batches] == [800, 500]
+
+    status, _, body = request_app("POST", "/query", {"query": QUESTION, "include_chart": False, "tenant": "globex"})
+    assert status == 200 and "$500 | $900" in json.loads(body)["text"]
+    status, _, body = request_app("GET", "/report?tenant=initech")
+    assert status == 400 and json.loads(body)["error"] == "Unknown tenant: initech"
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+import pandas as pd
+from agent import planner, timeseries, tools
+
+# --- Fixtures ---
+
+@pytest.fixture
+def ledger():
+    """Fourteen months of actuals and budget with a gap month and two currencies."""
+    rng = np.random.default_rng(3)
+    months = [m for m in pd.period_range('2024-01', '2025-03', freq='M').strftime('%Y-%m') if m != '2024-07']
+    n = len(months) * 12
+
+    def frame():
+        df = pd.DataFrame({
+            'month': np.repeat(months, 12),
+            'account_category': rng.choice(['Revenue', 'COGS', 'Opex:Marketing', 'Opex:Admin', 'Other'], n),
+            'amount': rng.integers(100, 10_000, n).astype(float),
+            'currency': rng.choice(['USD', 'EUR'], n),
+        })
+        df['month_period'] = pd.to_datetime(df['month']).dt.to_period('M')
+        return df
+
+    fx_df = pd.DataFrame({'month': months, 'currency': 'EUR', 'rate_to_usd': np.linspace(0.8, 0.95, len(months))})
+    fx_df['month_period'] = pd.to_datetime(fx_df['month']).dt.to_period('M')
+    return frame(), frame(), fx_df
+
+
+def direct_line_totals(cube, start, end):
+    """The reference: filter the cube to the range and sum each line."""
+    rows = tools._cube_periods(cube, start, end)
+    return {line: rows.loc[rows['line'] == line, 'amount_usd'].sum() for line in timeseries.LINES}
+
+# --- Tests ---
+
+@pytest.mark.parametrize("start, end", [('2024-01', '2025-03'), ('2024-04', '2024-06'), ('2024-07', '2024-07'),
+                                        ('2023-06', '2024-02'), ('2025-03', '2026-01'), ('2026-01', '2026-03')])
+def test_range_totals_match_direct_sums(ledger, start, end):
+    """Tests that every range total, including ranges past either end of the data, matches a filter-and-sum."""
+    actuals_df, _, fx_df = ledger
+    start, end = pd.Period(start, freq='M'), pd.Period(end, freq='M')
+    index = timeseries.prefix_index(actuals_df, fx_df)
+
+    expected = direct_line_totals(tools._ledger_cube(actuals_df, fx_df), start, end)
+    assert index.line_totals(start, end) == pytest.approx(expected)
+
+
+def test_rolling_metric_matches_trailing_sums(ledger):
+    actuals_df, _, fx_df = ledger
+    cube = tools._ledger_cube(actuals_df, fx_df)
+    rolling = timeseries.get_rolling_metric(actuals_df, fx_df, 'EBITDA', 3, 4)
+
+    assert rolling['month_str'].tolist() == ['Dec 2024', 'Jan 2025', 'Feb 2025', 'Mar 2025']
+    for month_str, value in zip(rolling['month_str'], rolling['Metric']):
+        end = pd.Period(pd.to_datetime(month_str), freq='M')
+        lines = direct_line_totals(cube, end - 2, end)
+        assert value == pytest.approx(lines['revenue'] - lines['cogs'] - lines['opex'])
+
+
+def test_range_breakdown_of_one_month_matches_opex_breakdown(ledger):
+    actuals_df, _, fx_df = ledger
+    june = pd.Period('2024-06', freq='M')
+    by_range = timeseries.get_opex_breakdown_range(actuals_df, fx_df, june, june)
+    by_month = tools.get_opex_breakdown(actuals_df, fx_df, 'June', 2024)
+    pd.testing.assert_frame_equal(by_range.reset_index(drop=True), by_month.reset_index(drop=True), check_exact=False)
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Revenue vs budget from May to June 2025", "- **Actual Revenue:** $0.00M\n- **Budgeted Revenue:** $0.00M"),
+    ("YTD revenue vs budget", "Revenue vs. Budget for 2025 year to date (Jan – Jun)"),
+    ("June 2025 vs May 2025 revenue", "- **Change:** +$0.00M (+0.0%)"),
+    ("Revenue for Q3 2030", "No Revenue data found for Q3 2030."),
+    # Two months without range wording are not a range; an end month without a year follows the start.
+    ("What was June 2025 revenue vs budget compared to May 2025?", "### Revenue vs. Budget for June 2025:"),
+    ("Opex by category from August to March 2025", "No Opex data found for Aug 2024 – Mar 2025."),
+    ("Revenue vs budget from December 2024 to March", "No Revenue data found for Dec 2024 – Mar 2025."),
+    ("Revenue vs budget from June 2025 to May 2025", "The period Jun 2025 – May 2025 ends before it starts."),
+])
+def test_planner_answers_range_questions(workbook, monkeypatch, query, expected):
+    monkeypatch.setattr(tools, 'DATA_FILE', workbook)
+    planner.QUERY_CACHE.clear()
+    assert expected in planner.route_query(query, include_chart=False)["text"]
+    planner.QUERY_CACHE.clear()
@@ -2,47 +2,6 @@ import pytest
 import pandas as pd
 from agent import tools
 
-# --- Mock Data Fixtures ---
-
-@pytest.fixture
-def mock_data_frames():
-    """Creates a dictionary of mock DataFrames for use in tests."""
-    actuals_data = {
-        'month': ['2025-06-30', '2025-06-30', '2025-05-31', '2025-05-31', '2025-04-30', '2025-04-30'],
-        'account_category': ['revenue', 'cogs', 'revenue', 'cogs', 'revenue', 'cogs'],
-        'amount': [2000, 800, 1800, 700, 1600, 600],
-        'currency': ['USD', 'USD', 'CAD', 'CAD', 'USD', 'USD']
-    }
-    budget_data = {
-        'month': ['2025-06-30'],
-        'account_category': ['revenue'],
-        'amount': [1900],
-        'currency': ['USD']
-    }
-    cash_data = {
-        'month': ['2025-06-30'],
-        'cash_usd': [5000]
-    }
-    fx_data = {
-        'month': ['2025-05-31'],
-        'currency': ['CAD'],
-        'rate_to_usd': [1.25]
-    }
-    
-    dfs = {
-        "actuals_df": pd.DataFrame(actuals_data),
-        "budget_df": pd.DataFrame(budget_data),
-        "cash_df": pd.DataFrame(cash_data),
-        "fx_df": pd.DataFrame(fx_data)
-    }
-
-    # Convert month columns to period objects, similar to load_data()
-    for name, df in dfs.items():
-        df['month_period'] = pd.to_datetime(df['month']).dt.to_period('M')
-
-    return dfs
-
-
 # --- Tests ---
 
 def test_get_revenue_vs_budget(mock_data_frames):
@@ -95,4 +54,80 @@ def test_get_cash_runway(mock_data_frames):
     )
     
     assert result['runway_months'] == float('inf')
-    assert result['avg_burn'] < 0
\ No newline at end of file
+    assert result['avg_burn'] < 0
+
+def test_build_ledger_cube(mock_data_frames):
+    """
+    Tests that the P&L cube aggregates by month, lower-cased category and
+    currency, with USD amounts already converted.
+    """
+    cube = tools.build_ledger_cube(mock_data_frames['actuals_df'], mock_data_frames['fx_df'])
+
+    assert cube.index.names == ['month_period', 'category', 'currency']
+    may_revenue = cube.loc[(pd.Period('2025-05', freq='M'), 'revenue', 'CAD')]
+    assert may_revenue['amount'] == 1800
+    assert may_revenue['amount_usd'] == pytest.approx(1440)
+    assert cube['amount'].sum() == mock_data_frames['actuals_df']['amount'].sum()
+
+    # A line without a currency has no rate (converted at par); it is not booked as CAD.
+    actuals_df = mock_data_frames['actuals_df'].copy()
+    actuals_df.loc[2, 'currency'] = None
+    with pytest.warns(RuntimeWarning, match="No FX rate"):
+        cube = tools.build_ledger_cube(actuals_df, mock_data_frames['fx_df'])
+    may = cube.xs(pd.Period('2025-05', freq='M'), level='month_period')
+    assert may['amount_usd'].tolist() == pytest.approx([560, 1800])
+    assert cube['amount'].sum() == actuals_df['amount'].sum()
+
+def test_get_financial_metric_trend(mock_data_frames):
+    """
+    Tests gross margin and EBITDA trends, including a month with no revenue.
+    - April: Rev=1600, COGS=600 -> GM = 62.5%
+    - May: Rev=1440 USD, COGS=560 USD -> GM = 61.11%
+    - June: Rev=2000, COGS=800 -> GM = 60%
+    - July: COGS only -> GM reported as 0
+    """
+    july_cogs = pd.DataFrame({
+        'month': ['2025-07-31'], 'account_category': ['COGS'], 'amount': [100], 'currency': ['USD'],
+        'month_period': [pd.Period('2025-07', freq='M')],
+    })
+    actuals_df = pd.concat([mock_data_frames['actuals_df'], july_cogs], ignore_index=True)
+
+    margin = tools.get_financial_metric_trend(actuals_df, mock_data_frames['fx_df'], 'Gross Margin', 4)
+    assert margin['month_str'].tolist() == ['Apr 2025', 'May 2025', 'Jun 2025', 'Jul 2025']
+    assert margin['Metric'].tolist() == pytest.approx([62.5, 61.1111, 60.0, 0.0], rel=1e-4)
+
+    ebitda = tools.get_financial_metric_trend(actuals_df, mock_data_frames['fx_df'], 'EBITDA', 2)
+    assert ebitda['Metric'].tolist() == pytest.approx([1200, -100])
+
+def test_fx_table_lookup_and_missing_rates(mock_data_frames):
+    """
+    Tests the FX lookup table: known rates are gathered, USD is always 1.0,
+    and missing rates follow the requested policy.
+    """
+    fx = tools.FxTable(mock_data_frames['fx_df'])
+    periods = pd.Series(pd.PeriodIndex(['2025-05', '2025-05', '2025-06'], freq='M'))
+    currencies = ['CAD', 'USD', 'CAD']
+
+    usd, missing = fx.convert([125, 100, 125], periods, currencies)
+    assert usd.tolist() == pytest.approx([100, 100, 125])
+    assert missing.tolist() == [False, False, True]
+
+    usd, _ = fx.convert([125, 100, 125], periods, currencies, on_missing='nan')
+    assert pd.isna(usd[2])
+    _, missing = fx.convert([125, 125], periods[:2], ['CAD', None])
+    assert missing.tolist() == [False, True]
+    with pytest.raises(ValueError, match="CAD"):
+        fx.convert([125, 100, 125], periods, currencies, on_missing='raise')
+
+
+def test_missing_fx_rates_are_reported(mock_data_frames):
+    """
+    Tests that ledger months without an FX rate are listed and warned about
+    instead of being silently converted at par.
+    """
+    actuals_df = mock_data_frames['actuals_df'].copy()
+    actuals_df.loc[0, 'currency'] = 'EUR'  # June revenue, no EUR rate
+
+    with pytest.warns(RuntimeWarning, match="No FX rate"):
+        missing = tools.missing_fx_rates(actuals_df, mock_data_frames['fx_df'])
+    assert missing.to_dict('records') == [{'month_period': pd.Period('2025-06', freq='M'), 'currency': 'EUR'}]
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+import pandas as pd
+from agent import planner, tools, variance
+from tests.conftest import write_workbook
+
+# --- Fixtures ---
+
+@pytest.fixture
+def ledgers():
+    """Six months of actuals and budget for two entities in two currencies; EMEA has no May budget."""
+    rng = np.random.default_rng(7)
+    months = pd.period_range('2025-01', '2025-06', freq='M').strftime('%Y-%m')
+    n = len(months) * 20
+
+    def frame():
+        df = pd.DataFrame({
+            'month': np.repeat(months, 20),
+            'entity': rng.choice(['ParentCo', 'EMEA'], n),
+            'account_category': rng.choice(['Revenue', 'revenue', 'COGS', 'Opex:Marketing', 'Opex:Admin'], n),
+            'amount': rng.integers(100, 10_000, n).astype(float),
+            'currency': rng.choice(['USD', 'EUR'], n),
+        })
+        return tools.standardize_sheet(df, 'actuals')
+
+    actuals_df, budget_df = frame(), frame()
+    budget_df = budget_df[~((budget_df['entity'] == 'EMEA') & (budget_df['month'] == '2025-05'))]
+    fx_df = tools.standardize_sheet(pd.DataFrame({'month': months, 'currency': 'EUR',
+                                                  'rate_to_usd': np.linspace(0.85, 0.95, len(months))}), 'fx')
+    return actuals_df, budget_df, fx_df
+
+
+def direct_cell_totals(ledger_df, fx_df):
+    """The reference: convert every row to USD, then group-sum per cell."""
+    amount_usd, _ = tools._fx_table(fx_df).convert(ledger_df['amount'], ledger_df['month_period'], ledger_df['currency'])
+    return pd.Series(amount_usd, index=ledger_df.index).groupby([
+        ledger_df['month_period'], ledger_df['account_category'].str.lower(), ledger_df['entity']]).sum()
+
+# --- Tests ---
+
+def test_matrix_matches_direct_cell_sums(ledgers):
+    """Tests that every actual and budget cell equals a filter-and-sum of its ledger rows."""
+    actuals_df, budget_df, fx_df = ledgers
+    matrix = variance.build_variance_matrix(actuals_df, budget_df, fx_df)
+    assert matrix.actual.shape == (6, 4, 2)
+
+    for values, ledger_df in ((matrix.actual, actuals_df), (matrix.budget, budget_df)):
+        for (period, category, entity), total in direct_cell_totals(ledger_df, fx_df).items():
+            cell = values[period.ordinal - matrix.periods[0].ordinal,
+                          matrix.categories.get_loc(category), matrix.entities.get_loc(entity)]
+            assert cell == pytest.approx(total)
+    np.testing.assert_array_equal(matrix.variance, matrix.actual - matrix.budget)
+
+
+def test_variance_pct_is_nan_without_budget(ledgers):
+    actuals_df, budget_df, fx_df = ledgers
+    matrix = variance.build_variance_matrix(actuals_df, budget_df, fx_df)
+    may, emea = 4, matrix.entities.get_loc('EMEA')
+
+    assert np.isnan(matrix.variance_pct[may, :, emea]).all()
+    budgeted = matrix.budget != 0
+    np.testing.assert_allclose(matrix.variance_pct[budgeted],
+                               matrix.variance[budgeted] / np.abs(matrix.budget[budgeted]) * 100)
+
+
+def test_report_ranks_largest_misses_and_signs_heatmap(ledgers):
+    """
+    Tests that the misses are the largest unfavorable variances in the range,
+    and that the heatmap counts Opex and COGS overspend as unfavorable.
+    """
+    actuals_df, budget_df, fx_df = ledgers
+    start, end = pd.Period('2025-02', freq='M'), pd.Period('2025-04', freq='M')
+    report = variance.get_variance_report(actuals_df, budget_df, fx_df, start, end, top_n=5)
+
+    cells = variance.variance_matrix(actuals_df, budget_df, fx_df).to_frame(start, end)
+    expected = cells.loc[~cells['favorable'], 'variance'].abs().sort_values(ascending=False).head(5)
+    assert report['misses']['variance'].abs().tolist() == expected.tolist()
+    assert not report['misses']['favorable'].any()
+    assert report['misses']['month_period'].between(start, end).all()
+
+    assert report['heatmap'].columns.tolist() == ['Feb 2025', 'Mar 2025', 'Apr 2025']
+    opex = cells[cells['category'] == 'opex:marketing'].groupby('month_period')['variance'].sum()
+    np.testing.assert_allclose(report['heatmap'].loc['Opex:Marketing'].to_numpy(), -opex.to_numpy())
+    assert report['cells'] == len(cells)
+    assert variance.get_variance_report(actuals_df, budget_df, fx_df, pd.Period('2030-01', freq='M')) is None
+
+
+def test_lines_without_entity_are_consolidated(ledgers):
+    actuals_df, budget_df, fx_df = ledgers
+    blank = pd.DataFrame({'month': ['2025-06'], 'entity': [None], 'account_category': ['Revenue'],
+                          'amount': [5000.0], 'currency': ['USD']})
+    actuals_df = pd.concat([actuals_df, tools.standardize_sheet(blank, 'actuals')], ignore_index=True)
+    matrix = variance.build_variance_matrix(actuals_df, budget_df, fx_df)
+
+    assert matrix.entities.tolist() == ['Consolidated', 'EMEA', 'ParentCo']
+    assert matrix.actual[5, matrix.categories.get_loc('revenue'), 0] == 5000
+    assert matrix.actual.sum() == pytest.approx(direct_cell_totals(actuals_df.dropna(), fx_df).sum() + 5000)
+
+
+def test_matrix_is_memoized_per_dataset_version(ledgers):
+    frames = ledgers
+    for df, sheet in zip(frames, ('actuals', 'budget', 'fx')):
+        df.attrs.update(dataset_version='v1', dataset_sheet=sheet)
+        tools._dataset_frame(df)
+    assert variance.variance_matrix(*frames) is variance.variance_matrix(*frames)
+    edited = frames[0].assign(amount=frames[0]['amount'] * 2)
+    assert variance.variance_matrix(edited, *frames[1:]) is not variance.variance_matrix(*frames)
+
+
+def test_planner_answers_variance_question(workbook, monkeypatch):
+    """Tests that the misses table lists Opex overspend but not revenue above budget."""
+    write_workbook(workbook, opex=200)
+    monkeypatch.setattr(tools, 'DATA_FILE', workbook)
+    planner.QUERY_CACHE.clear()
+    text = planner.route_query("Budget variance for June 2025", include_chart=False)["text"]
+    assert "### Budget Variance for June 2025" in text
+    assert "**Largest 1 miss:**" in text
+    assert "| Jun 2025 | Opex:Marketing | ParentCo | $200 | $0 | +$200 | n/a |" in text
+    assert "| Revenue |" not in text
+    planner.QUERY_CACHE.clear()